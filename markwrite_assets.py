@@ -0,0 +1,130 @@
+"""In-memory store for the editor page and its assets.
+
+The editor page and everything it loads at startup are read once per process
+and then served from memory over the markwrite:// scheme (see
+AssetSchemeHandler in markwrite_gui.py). Every new tab or pooled page therefore
+loads without touching the disk. Assets that the page only needs later are read
+on first request and kept as well.
+
+This module does not import Qt so that it can be used and tested on its own.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import sys
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+EDITOR_PAGE = "editor_offline.html"
+# What the editor page loads before it becomes editable
+PRELOAD = (
+    EDITOR_PAGE,
+    "assets/css/toastui-editor.min.css",
+    "assets/js/toastui-editor-all.min.js",
+)
+# Compression only pays off for assets of at least this size
+COMPRESS_MIN_BYTES = 64 << 10
+
+_MIME_TYPES = {
+    ".html": "text/html",
+    ".js": "text/javascript",
+    ".css": "text/css",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".json": "application/json",
+}
+
+
+def mime_type(name: str) -> str:
+    suffix = Path(name).suffix.lower()
+    if suffix in _MIME_TYPES:
+        return _MIME_TYPES[suffix]
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+@dataclass(frozen=True)
+class Asset:
+    data: bytes
+    mime: str
+    compressed: bool = False
+
+    def body(self) -> bytes:
+        return zlib.decompress(self.data) if self.compressed else self.data
+
+
+class AssetStore:
+    """Assets keyed by their path relative to root ("assets/js/...").
+
+    With compress=True, large assets are kept zlib-compressed and inflated on
+    each request, trading a little CPU per page load for resident memory.
+    """
+
+    def __init__(self, root: Path, compress: bool = False):
+        self.root = Path(root).resolve()
+        self._compress = compress
+        self._assets: dict[str, Asset] = {}
+
+    def add(self, name: str, data: bytes, mime: str | None = None) -> Asset:
+        compressed = self._compress and len(data) >= COMPRESS_MIN_BYTES
+        asset = Asset(zlib.compress(data) if compressed else data, mime or mime_type(name), compressed)
+        self._assets[name] = asset
+        return asset
+
+    def discard(self, name: str):
+        self._assets.pop(name, None)
+
+    def preload(self, names=PRELOAD):
+        """Read the given assets now; missing files are left to fail on request."""
+        for name in names:
+            self.get(name)
+
+    def get(self, name: str) -> Asset | None:
+        """The asset at name, reading it from disk on first use; None if there is none."""
+        name = name.lstrip("/")
+        asset = self._assets.get(name)
+        if asset is not None:
+            return asset
+        path = (self.root / name).resolve()
+        # Only files below root may be served
+        if not path.is_relative_to(self.root) or not path.is_file():
+            return None
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        return self.add(name, data)
+
+    def fingerprint(self, names=PRELOAD) -> str:
+        """Hash of the given assets; changes whenever the editor page or bundle does."""
+        digest = hashlib.blake2b(digest_size=16)
+        for name in names:
+            asset = self.get(name)
+            digest.update(name.encode("utf-8") + b"\0")
+            digest.update(asset.body() if asset is not None else b"")
+        return digest.hexdigest()
+
+    def resident_bytes(self) -> int:
+        return sum(len(asset.data) for asset in self._assets.values())
+
+
+def asset_root() -> Path:
+    """Directory holding editor_offline.html and assets/ for this build (app bundle or source tree)."""
+    if getattr(sys, 'frozen', False):
+        # Running in built app
+        if sys.platform == "darwin":  # macOS
+            return Path(sys.executable).parent / ".." / "Resources"
+        # Windows/Linux: try multiple possible locations for the HTML file
+        possible_dirs = [
+            Path(sys.executable).parent,  # Same directory as exe
+            Path(sys.executable).parent / "_internal",  # _internal subdirectory
+        ]
+        for directory in possible_dirs:
+            if (directory / EDITOR_PAGE).exists():
+                return directory
+        # Fallback to the first location
+        return possible_dirs[0]
+    # Running from source: next to this module, whatever the working directory
+    return Path(__file__).resolve().parent
@@ -0,0 +1,93 @@
+"""Chromium resource profiles for the editor pages: `--engine-profile lean`.
+
+The default profile is tuned for speed: a persistent WebEngine profile whose
+disk cache keeps compiled editor code across restarts, a warm page ready for
+the next tab, and Chromium's usual process model (a renderer per page, a GPU
+process). The lean profile trades some of that for memory, for machines where
+every window's processes add up, such as thin clients:
+
+- one renderer process for all editor pages, in Chromium's low-end device
+  mode, with V8 optimising for size;
+- no GPU process: compositing in software, on a thread of the browser process;
+- an off-the-record profile with a small in-memory HTTP cache;
+- WebGL, 2D canvas acceleration, the PDF viewer and background networking
+  switched off (the editor needs none of them);
+- no warm page pool, and fewer live tabs before background tabs are discarded.
+
+The profile is chosen by --engine-profile, else MARKWRITE_ENGINE_PROFILE, else
+View > Lean Memory Mode, and takes effect at startup: Chromium reads its flags
+once. `markwrite memory-report` (markwrite_memory) compares both profiles.
+
+This module does not import Qt.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping, MutableMapping
+from dataclasses import dataclass
+
+ENV_VAR = "MARKWRITE_ENGINE_PROFILE"
+SETTINGS_KEY = "engine/profile"
+CHROMIUM_FLAGS_VAR = "QTWEBENGINE_CHROMIUM_FLAGS"
+
+
+@dataclass(frozen=True)
+class EngineProfile:
+    name: str
+    chromium_flags: tuple[str, ...] = ()
+    off_the_record: bool = False
+    http_cache_bytes: int = 0  # 0: Chromium's default
+    # QWebEngineSettings.WebAttribute names switched off for every page
+    disabled_attributes: tuple[str, ...] = ()
+    # None: the application's defaults (WARM_PAGE_POOL_SIZE, MAX_LIVE_TABS)
+    warm_pages: int | None = None
+    max_live_tabs: int | None = None
+
+
+DEFAULT_PROFILE = EngineProfile("default")
+LEAN_PROFILE = EngineProfile(
+    "lean",
+    chromium_flags=(
+        "--renderer-process-limit=1",
+        "--process-per-site",
+        "--enable-low-end-device-mode",
+        "--js-flags=--optimize-for-size",
+        "--disable-gpu",
+        "--disable-gpu-compositing",
+        "--in-process-gpu",
+        "--disable-background-networking",
+        "--disable-features=BackForwardCache,SpareRendererForSitePerProcess,MediaRouter",
+    ),
+    off_the_record=True,
+    http_cache_bytes=4 << 20,
+    disabled_attributes=(
+        "WebGLEnabled",
+        "Accelerated2dCanvasEnabled",
+        "PdfViewerEnabled",
+        "PluginsEnabled",
+        "AutoLoadIconsForPage",
+    ),
+    warm_pages=0,
+    max_live_tabs=3,
+)
+ENGINE_PROFILES = {profile.name: profile for profile in (DEFAULT_PROFILE, LEAN_PROFILE)}
+
+
+def select_engine_profile(requested: str | None, environ: Mapping[str, str], setting: str | None) -> EngineProfile:
+    """The command-line choice, else the environment's, else the saved setting; unknown names mean default."""
+    for name in (requested, environ.get(ENV_VAR), setting):
+        if name:
+            return ENGINE_PROFILES.get(str(name).strip().lower(), DEFAULT_PROFILE)
+    return DEFAULT_PROFILE
+
+
+def apply_chromium_flags(profile: EngineProfile, environ: MutableMapping[str, str]):
+    """Add the profile's flags to QTWEBENGINE_CHROMIUM_FLAGS; must run before WebEngine starts.
+
+    Flags already set there come last, so a user's own value of a switch wins.
+    """
+    if not profile.chromium_flags:
+        return
+    existing = environ.get(CHROMIUM_FLAGS_VAR, "").split()
+    flags = [flag for flag in profile.chromium_flags if flag not in existing] + existing
+    environ[CHROMIUM_FLAGS_VAR] = " ".join(flags)
@@ -0,0 +1,396 @@
+"""Headless batch export: `markwrite export`.
+
+Converts Markdown files and whole directory trees to HTML or PDF without
+showing a window. The HTML comes from the same editor page the GUI uses and is wrapped
+the same way (see markwrite_html), so output is identical to File > Export as
+HTML; several offscreen pages, each with its own renderer process, convert
+files in parallel (see markwrite_export_pages). PDFs are printed from those
+documents by a PdfScheduler (see markwrite_pdf).
+
+With `--engine python` HTML is rendered by markwrite_markdown instead: Qt is
+not even imported, no browser is started, and large batches are spread over
+worker processes. The Markdown follows the editor's renderer, but the output
+is not byte-for-byte the editor page's.
+
+A manifest in each output root remembers the source state every output was
+made from. Unchanged sources are skipped: first by a stat comparison, then by
+content hash. A change of the editor page or bundle invalidates the manifest.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from markwrite_assets import asset_root
+from markwrite_files import IO_CHUNK_SIZE, FileState, atomic_write_bytes, atomic_write_chunks, content_digest
+from markwrite_html import (
+    DOCUMENT_VERSION, EDITOR_STYLESHEET, StyleSheet, document_wrapper, html_document, used_elements
+)
+from markwrite_images import copy_images
+from markwrite_markdown import PARSER_VERSION, HtmlRenderer, parse, prescan_references, to_html
+from markwrite_trace import ENV_VAR, enable as enable_trace, span
+
+MANIFEST_NAME = ".markwrite-export.json"
+MANIFEST_VERSION = 1
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+# The manifest is also written every so many exports, keeping progress across interruptions
+MANIFEST_FLUSH_EVERY = 100
+# The python engine exports hundreds of files a second; it writes the manifest by time instead
+MANIFEST_FLUSH_INTERVAL_S = 5.0
+MAX_DEFAULT_JOBS = 8
+ENGINES = ("page", "python")
+# Python-engine batches smaller than this are not worth starting worker processes for
+PYTHON_POOL_MIN_JOBS = 64
+# Markdown longer than this is rendered block by block through a temporary file
+STREAM_EXPORT_BYTES = 1 << 20
+
+
+class ExportManifest:
+    """Source states of the outputs below one output root, and why the others failed."""
+
+    def __init__(self, path: Path, renderer: str):
+        self.path = path
+        self.renderer = renderer
+        self.files: dict[str, FileState] = {}
+        # Error message of each source whose last export failed; it is retried every run
+        self.errors: dict[str, str] = {}
+
+    def record_export(self, name: str, state: FileState):
+        self.files[name] = state
+        self.errors.pop(name, None)
+
+    def record_failure(self, name: str, message: str):
+        self.files.pop(name, None)
+        self.errors[name] = message
+
+    @classmethod
+    def load(cls, path: Path, renderer: str) -> "ExportManifest":
+        manifest = cls(path, renderer)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return manifest
+        # Output made by another editor version is not reused
+        if data.get("version") != MANIFEST_VERSION or data.get("renderer") != renderer:
+            return manifest
+        for name, state in data.get("files", {}).items():
+            try:
+                manifest.files[name] = FileState(**state)
+            except TypeError:
+                continue
+        manifest.errors = {name: str(message) for name, message in data.get("errors", {}).items()}
+        return manifest
+
+    def save(self):
+        data = {
+            "version": MANIFEST_VERSION,
+            "renderer": self.renderer,
+            "files": {name: asdict(state) for name, state in sorted(self.files.items())},
+            "errors": dict(sorted(self.errors.items())),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(self.path, json.dumps(data, indent=1).encode("utf-8"))
+
+
+@dataclass
+class ExportJob:
+    source: Path
+    output: Path
+    name: str  # key in the manifest: source path relative to its root
+    manifest: ExportManifest
+    state: FileState | None = None  # of the source as read for rendering
+
+
+def markdown_files(root: Path):
+    for dirpath, dirnames, filenames in os.walk(root):
+        # Hidden directories (.git, ...) are never published
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for filename in sorted(filenames):
+            if filename.lower().endswith(MARKDOWN_SUFFIXES):
+                yield Path(dirpath) / filename
+
+
+def plan_export(sources: list[Path], output: Path | None, renderer: str, force: bool = False,
+                suffix: str = ".html"):
+    """Return (jobs, manifests, skipped) for the given files and directories.
+
+    A job is skipped here when its output exists and the source stat still
+    matches the manifest; the content hash check happens when it is read.
+    """
+    jobs: list[ExportJob] = []
+    manifests: dict[Path, ExportManifest] = {}
+    skipped = 0
+    for source in sources:
+        source = source.resolve()
+        if source.is_dir():
+            root, files = source, list(markdown_files(source))
+        else:
+            root, files = source.parent, [source]
+        if output is None:
+            out_root = root
+        elif source.is_dir() and len(sources) > 1:
+            out_root = output.resolve() / source.name
+        else:
+            out_root = output.resolve()
+        manifest_path = out_root / MANIFEST_NAME
+        if manifest_path not in manifests:
+            manifests[manifest_path] = ExportManifest.load(manifest_path, renderer)
+        manifest = manifests[manifest_path]
+        for path in files:
+            name = path.relative_to(root).as_posix()
+            out = (out_root / name).with_suffix(suffix)
+            previous = manifest.files.get(name)
+            if not force and previous is not None and previous.matches_disk(path) and out.exists():
+                skipped += 1
+                continue
+            if force:
+                manifest.files.pop(name, None)
+            jobs.append(ExportJob(path, out, name, manifest))
+    return jobs, list(manifests.values()), skipped
+
+
+def read_source(source: Path, output: Path, previous: FileState | None) -> tuple[str | None, FileState]:
+    """The source text and its state; the text is None when output was made from the same content."""
+    with span("read", "export", path=str(source)):
+        data = source.read_bytes()
+        st = source.stat()
+        text = data.decode("utf-8")
+    state = FileState(content_digest(data), st.st_size, st.st_mtime_ns)
+    if previous is not None and previous.digest == state.digest and output.exists():
+        return None, state
+    return text, state
+
+
+def write_markdown_html(source: str | Path, output: Path, title: str, stylesheet: StyleSheet | None,
+                        image_dir: Path, check_cancelled=None):
+    """Render Markdown (text, or the path of a file) with markwrite_markdown into a document at output.
+
+    Long documents are rendered block by block into a temporary file, so
+    memory is bounded by the largest block rather than the document; the
+    pruned stylesheet is put in front once every block is known. Pasted
+    images are copied from image_dir next to the output.
+    """
+    if isinstance(source, str) and len(source) < STREAM_EXPORT_BYTES:
+        fragment = to_html(source)
+        atomic_write_bytes(output, html_document(fragment, title, stylesheet).encode("utf-8"))
+        copy_images(fragment, image_dir, output.parent)
+        return
+
+    def lines():
+        return io.StringIO(source) if isinstance(source, str) else open(source, encoding="utf-8")
+
+    with lines() as fh:
+        references = prescan_references(fh)
+    renderer = HtmlRenderer(references)
+    used = used_elements("")
+    with tempfile.TemporaryFile("w+", encoding="utf-8", dir=output.parent) as body:
+        with lines() as fh:
+            pending: list[str] = []
+            size = 0
+            for block in parse(fh, references):
+                piece = renderer.render(block)
+                pending.append(piece)
+                size += len(piece)
+                if size >= IO_CHUNK_SIZE:
+                    if check_cancelled is not None:
+                        check_cancelled()
+                    used |= _write_fragment(body, "".join(pending), image_dir, output.parent)
+                    pending.clear()
+                    size = 0
+            used |= _write_fragment(body, "".join(pending), image_dir, output.parent)
+        head, tail = document_wrapper(used, title, stylesheet)
+        body.seek(0)
+
+        def chunks():
+            yield head.encode("utf-8")
+            while True:
+                chunk = body.read(IO_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk.encode("utf-8")
+            yield tail.encode("utf-8")
+
+        atomic_write_chunks(output, chunks(), check_cancelled)
+
+
+def _write_fragment(body, fragment: str, image_dir: Path, out_dir: Path):
+    body.write(fragment)
+    copy_images(fragment, image_dir, out_dir)
+    return used_elements(fragment)
+
+
+# The stylesheet of a Python-engine worker process, set by _init_python_worker
+_python_stylesheet: StyleSheet | None = None
+
+
+def _init_python_worker(stylesheet_path: Path | None):
+    global _python_stylesheet
+    _python_stylesheet = None
+    # A stylesheet that was asked for and cannot be read is an error, not a plain document
+    if stylesheet_path is not None:
+        _python_stylesheet = StyleSheet(stylesheet_path.read_text(encoding="utf-8"))
+
+
+def _python_export(task: tuple[Path, Path, FileState | None]) -> tuple[str, FileState | None, str]:
+    """("exported", "unchanged" or "failed", source state, error message) of one job."""
+    source, output, previous = task
+    try:
+        text, state = read_source(source, output, previous)
+        if text is None:
+            return "unchanged", state, ""
+        with span("render", "export", path=str(source)):
+            output.parent.mkdir(parents=True, exist_ok=True)
+            write_markdown_html(text, output, source.stem, _python_stylesheet, source.parent)
+    except (OSError, UnicodeDecodeError) as e:
+        return "failed", None, str(e)
+    return "exported", state, ""
+
+
+class PythonExporter:
+    """Exports jobs to HTML with markwrite_markdown: no Qt application, no editor pages.
+
+    With several workers and enough jobs, documents are rendered in worker
+    processes; sources are read and manifests updated as in BatchExporter,
+    but only this process touches the manifests.
+    """
+
+    def __init__(self, jobs: list[ExportJob], manifests: list[ExportManifest], stylesheet_path: Path | None,
+                 workers: int, log=None):
+        self._jobs = jobs
+        self._manifests = manifests
+        self._stylesheet_path = stylesheet_path
+        self._workers = max(1, min(workers, len(jobs)))
+        self._log = log or (lambda _message: None)
+        self.exported = 0
+        self.unchanged = 0
+        self.failed = 0
+
+    def run(self):
+        tasks = [(job.source, job.output, job.manifest.files.get(job.name)) for job in self._jobs]
+        if self._workers > 1 and len(tasks) >= PYTHON_POOL_MIN_JOBS:
+            chunksize = max(1, len(tasks) // (self._workers * 8))
+            with ProcessPoolExecutor(self._workers, initializer=_init_python_worker,
+                                     initargs=(self._stylesheet_path,)) as pool:
+                self._collect(pool.map(_python_export, tasks, chunksize=chunksize))
+        else:
+            _init_python_worker(self._stylesheet_path)
+            self._collect(map(_python_export, tasks))
+        for manifest in self._manifests:
+            manifest.save()
+
+    def _collect(self, results):
+        flushed = time.monotonic()
+        for job, (status, state, message) in zip(self._jobs, results):
+            if status == "failed":
+                self.failed += 1
+                job.manifest.record_failure(job.name, message)
+                print(f"{job.source}: {message}", file=sys.stderr)
+                continue
+            job.manifest.record_export(job.name, state)
+            if status == "unchanged":
+                self.unchanged += 1
+                continue
+            self.exported += 1
+            self._log(f"{job.source} -> {job.output}")
+            if time.monotonic() - flushed >= MANIFEST_FLUSH_INTERVAL_S:
+                flushed = time.monotonic()
+                for manifest in self._manifests:
+                    manifest.save()
+
+
+def build_parser(pdf: bool = True) -> argparse.ArgumentParser:
+    """The export command line; the PDF options (and Qt with them) only with pdf."""
+    PdfSettings = None
+    if pdf:
+        try:
+            from markwrite_pdf import PAGE_SIZES, PDF_MEMORY_LIMIT_BYTES, PdfSettings
+        except ImportError:
+            # Without QtWebEngine only the python engine can run, and it writes no PDFs
+            pass
+
+    parser = argparse.ArgumentParser(
+        prog="markwrite export",
+        description="Convert Markdown files and directory trees to HTML or PDF without opening a window.",
+    )
+    parser.add_argument("sources", nargs="+", type=Path, help="Markdown files or directories")
+    parser.add_argument("-o", "--output", type=Path,
+                        help="output directory (default: next to each source)")
+    parser.add_argument("-j", "--jobs", type=int, default=min(os.cpu_count() or 1, MAX_DEFAULT_JOBS),
+                        help="number of documents rendered in parallel")
+    parser.add_argument("--format", choices=("html", "pdf"), default="html", help="output format")
+    parser.add_argument("--engine", choices=ENGINES, default="page",
+                        help="render with editor pages (default) or with the Python Markdown renderer, "
+                             "which needs no browser and only writes HTML")
+    if PdfSettings is not None:
+        parser.add_argument("--page-size", choices=sorted(PAGE_SIZES), default=PdfSettings.page_size,
+                            type=str.lower, help="PDF page size")
+        parser.add_argument("--margins", type=float, default=PdfSettings.margins_mm, metavar="MM",
+                            help="PDF page margins in millimetres")
+        parser.add_argument("--landscape", action="store_true", help="PDF pages in landscape orientation")
+        parser.add_argument("--memory-limit", type=int, default=PDF_MEMORY_LIMIT_BYTES >> 20, metavar="MB",
+                            help="estimated memory the PDF renderers may use together")
+    parser.add_argument("--force", action="store_true", help="export unchanged files too")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only report errors and the summary")
+    parser.add_argument("--startup-profile", action="store_true", help="print the time spent in each phase")
+    parser.add_argument("--trace", metavar="FILE",
+                        help=f"write a Chrome trace of the export to FILE (or set {ENV_VAR}=FILE)")
+    return parser
+
+
+def _requested_engine(argv: list[str]) -> str:
+    peek = argparse.ArgumentParser(add_help=False)
+    peek.add_argument("--engine", default="page")  # validated by the full parser
+    args, _rest = peek.parse_known_args(argv)
+    return args.engine
+
+
+def run_export(argv: list[str], profile) -> int:
+    # The python engine writes no PDFs: its command line does not need to import Qt for their options
+    args = build_parser(pdf=_requested_engine(argv) != "python").parse_args(argv)
+    if args.trace:
+        enable_trace(args.trace)
+    missing = [str(p) for p in args.sources if not p.exists()]
+    if missing:
+        print(f"markwrite export: no such file or directory: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    if args.engine == "python":
+        if args.format != "html":
+            print("markwrite export: the python engine only writes HTML", file=sys.stderr)
+            return 2
+        return _run_python_export(args, profile)
+
+    # Only the page engine needs Qt and a browser
+    from markwrite_export_pages import run_page_export
+    return run_page_export(args, profile)
+
+
+def _run_python_export(args, profile) -> int:
+    started = time.perf_counter()
+    renderer = f"python-{PARSER_VERSION}.{DOCUMENT_VERSION}"
+    stylesheet_path = asset_root() / EDITOR_STYLESHEET
+    if not stylesheet_path.is_file():
+        # Output without the editor's CSS would not look like the editor's
+        print(f"markwrite export: editor stylesheet not found: {stylesheet_path}", file=sys.stderr)
+        return 2
+    jobs, manifests, skipped = plan_export(args.sources, args.output, renderer, args.force, ".html")
+    profile.mark("plan export")
+    exporter = PythonExporter(jobs, manifests, stylesheet_path, args.jobs, log=None if args.quiet else print)
+    exporter.run()
+    profile.finish("export")
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Exported {exporter.exported}, unchanged {skipped + exporter.unchanged}, "
+        f"failed {exporter.failed} in {elapsed:.1f} s",
+        file=sys.stderr,
+    )
+    return 1 if exporter.failed else 0
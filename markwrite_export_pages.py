@@ -0,0 +1,262 @@
+"""The page engine of `markwrite export`: HTML and PDF from offscreen editor pages.
+
+Each page is a full editor (see markwrite_gui.EditorPage) with its own renderer
+process; BatchExporter hands it one document at a time and wraps the HTML it
+returns exactly like File > Export as HTML does. markwrite_export imports this
+module only when the page engine runs, so `--engine python` never loads Qt.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from collections import deque
+from functools import partial
+
+from PySide6.QtCore import QObject, Qt, QTimer, Signal
+
+from markwrite_assets import EDITOR_PAGE
+from markwrite_export import MANIFEST_FLUSH_EVERY, ExportJob, ExportManifest, plan_export, read_source
+from markwrite_files import atomic_write_bytes
+from markwrite_html import DOCUMENT_VERSION, EDITOR_STYLESHEET, StyleSheet, html_document
+from markwrite_images import DocumentDirectories, copy_images
+from markwrite_trace import clock, complete, span
+
+# Pages are reloaded after this many documents so editor history cannot pile up
+PAGE_RECYCLE_AFTER = 200
+# Documents converted ahead of the PDF printer, per editor page; beyond that pages wait
+PDF_BACKLOG_PER_PAGE = 2
+# A page that has not returned a document's HTML after this long is replaced, and the document fails
+PAGE_JOB_TIMEOUT_MS = 120 * 1000
+
+
+class BatchExporter(QObject):
+    """Feeds export jobs to a pool of editor pages, one job per page at a time.
+
+    With a PdfScheduler, documents are printed to PDF instead of written as
+    HTML; editor pages pause while the printer has enough work queued. Pasted
+    images (see markwrite_images) are copied next to HTML output, and PDFs
+    load them through documents.
+
+    A page that fails to load, crashes or takes longer than PAGE_JOB_TIMEOUT_MS
+    fails its document (recorded in the manifest) and is replaced, so a broken
+    page never stalls the batch.
+    """
+
+    finished = Signal()
+
+    def __init__(self, jobs: list[ExportJob], manifests: list[ExportManifest], page_factory, workers: int,
+                 stylesheet: StyleSheet | None = None, pdf=None, documents: DocumentDirectories | None = None,
+                 log=None, parent: QObject | None = None):
+        super().__init__(parent)
+        self._stylesheet = stylesheet
+        self._pdf = pdf
+        self._documents = documents
+        self._printing = 0
+        self._waiting: list = []  # editor pages held back until the printer catches up
+        self._queue = deque(jobs)
+        self._manifests = manifests
+        self._page_factory = page_factory
+        self._workers = max(1, min(workers, len(jobs)))
+        self._log = log or (lambda _message: None)
+        self._pages: dict[object, int] = {}  # page -> documents rendered since its last load
+        self._busy: dict[object, ExportJob] = {}
+        self._deadlines: dict[object, QTimer] = {}  # page -> timer of the document it renders
+        self.exported = 0
+        self.unchanged = 0
+        self.failed = 0
+        self._since_flush = 0
+        self._done = False
+
+    def start(self):
+        if not self._queue:
+            self._finish()
+            return
+        for _ in range(self._workers):
+            self._add_page()
+
+    def _add_page(self):
+        page = self._page_factory()
+        page.renderProcessTerminated.connect(partial(self._drop_page, page, "renderer process terminated"))
+        page.loadFinished.connect(partial(self._on_page_loaded, page))
+        deadline = QTimer(self)
+        deadline.setSingleShot(True)
+        deadline.setInterval(PAGE_JOB_TIMEOUT_MS)
+        deadline.timeout.connect(partial(self._drop_page, page, f"no result within {PAGE_JOB_TIMEOUT_MS // 1000} s"))
+        self._deadlines[page] = deadline
+        self._pages[page] = 0
+        self._next(page)
+
+    def _next(self, page):
+        if self._pdf is not None and self._queue and self._pdf.backlog() >= PDF_BACKLOG_PER_PAGE * self._workers:
+            self._waiting.append(page)
+            return
+        while self._queue:
+            job = self._queue.popleft()
+            text = self._read(job)
+            if text is None:
+                continue
+            if self._pages[page] >= PAGE_RECYCLE_AFTER:
+                self._pages[page] = 0
+                page.bridge.reset()
+                page.triggerAction(page.WebAction.Reload)
+            self._pages[page] += 1
+            self._busy[page] = job
+            self._deadlines[page].start()
+            page.bridge.set_markdown(text)
+            page.bridge.request_content("html", partial(self._on_html, page, job, clock()))
+            return
+        self._finish_if_idle()
+
+    def _finish_if_idle(self):
+        if not self._queue and not self._busy and not self._printing:
+            self._finish()
+
+    def _read(self, job: ExportJob) -> str | None:
+        """The source text, or None when the job is done without rendering."""
+        try:
+            text, state = read_source(job.source, job.output, job.manifest.files.get(job.name))
+        except (OSError, UnicodeDecodeError) as e:
+            self._fail(job, str(e))
+            return None
+        if text is None:
+            # Touched but not changed: remember the new stat, keep the output
+            job.manifest.record_export(job.name, state)
+            self.unchanged += 1
+            return None
+        job.state = state
+        return text
+
+    def _on_html(self, page, job: ExportJob, started: float, html: str):
+        if self._busy.get(page) is not job:
+            return  # the page was dropped and its document already failed
+        del self._busy[page]
+        self._deadlines[page].stop()
+        complete("render", started, "export", path=str(job.source), page=page.bridge.page_id)
+        html = html or ""
+        if self._pdf is not None:
+            base_url = self._documents.url(job.source.parent) if self._documents is not None else None
+            document = html_document(html, job.source.stem, self._stylesheet, base_url)
+            self._printing += 1
+            self._pdf.submit(document, job.output, partial(self._on_printed, job))
+        else:
+            try:
+                with span("write", "export", path=str(job.output)):
+                    document = html_document(html, job.source.stem, self._stylesheet)
+                    job.output.parent.mkdir(parents=True, exist_ok=True)
+                    atomic_write_bytes(job.output, document.encode("utf-8"))
+                    copy_images(html, job.source.parent, job.output.parent)
+            except OSError as e:
+                self._fail(job, str(e))
+            else:
+                self._exported(job)
+        self._next(page)
+
+    def _on_printed(self, job: ExportJob, error: str | None):
+        self._printing -= 1
+        if error:
+            self._fail(job, error)
+        else:
+            self._exported(job)
+        waiting, self._waiting = self._waiting, []
+        for page in waiting:
+            self._next(page)
+        self._finish_if_idle()
+
+    def _exported(self, job: ExportJob):
+        job.manifest.record_export(job.name, job.state)
+        self.exported += 1
+        self._log(f"{job.source} -> {job.output}")
+        self._since_flush += 1
+        if self._since_flush >= MANIFEST_FLUSH_EVERY:
+            self._flush()
+
+    def _on_page_loaded(self, page, ok: bool):
+        if not ok:
+            self._drop_page(page, "editor page failed to load")
+
+    def _drop_page(self, page, reason: str, *_args):
+        """Fail the page's document, if any, and carry on with a new page."""
+        if page not in self._pages:
+            return
+        job = self._busy.pop(page, None)
+        if job is not None:
+            self._fail(job, reason)
+        del self._pages[page]
+        self._deadlines.pop(page).deleteLater()
+        if page in self._waiting:
+            self._waiting.remove(page)
+        page.deleteLater()
+        if self._queue:
+            self._add_page()
+        else:
+            self._finish_if_idle()
+
+    def _fail(self, job: ExportJob, message: str):
+        job.manifest.record_failure(job.name, message)
+        self.failed += 1
+        print(f"{job.source}: {message}", file=sys.stderr)
+
+    def _flush(self):
+        self._since_flush = 0
+        for manifest in self._manifests:
+            manifest.save()
+
+    def _finish(self):
+        if self._done:
+            return
+        self._done = True
+        self._flush()
+        self.finished.emit()
+
+
+def run_page_export(args, profile) -> int:
+    # No window is ever shown; this also allows running without a display
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import markwrite_gui
+    from markwrite_pdf import PdfScheduler, PdfSettings
+    profile.mark("import markwrite_gui")
+
+    started = time.perf_counter()
+    markwrite_gui.register_asset_scheme()
+    app = markwrite_gui.QApplication([sys.argv[0]])
+    assets = markwrite_gui.load_asset_store()
+    documents = DocumentDirectories(
+        f"{markwrite_gui.ASSET_SCHEME.decode()}://{markwrite_gui.DOCUMENT_HOST}/"
+    )
+    web_profile = markwrite_gui.create_web_profile(assets, documents)
+    renderer = f"{assets.fingerprint()}.{DOCUMENT_VERSION}"
+    stylesheet_asset = assets.get(EDITOR_STYLESHEET)
+    missing = [name for name in (EDITOR_PAGE, EDITOR_STYLESHEET) if assets.get(name) is None]
+    if missing:
+        print(f"markwrite export: not found in {assets.root}: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    stylesheet = StyleSheet(stylesheet_asset.body().decode("utf-8"))
+    pdf = None
+    if args.format == "pdf":
+        settings = PdfSettings(args.page_size, max(0.0, args.margins), args.landscape)
+        renderer += f".pdf-{settings.key()}"
+        base_url = f"{markwrite_gui.ASSET_SCHEME.decode()}://app/"
+        pdf = PdfScheduler(web_profile, assets, base_url, settings, max_pages=args.jobs,
+                           memory_limit=args.memory_limit << 20)
+
+    jobs, manifests, skipped = plan_export(args.sources, args.output, renderer, args.force, f".{args.format}")
+    profile.mark("plan export")
+    exporter = BatchExporter(
+        jobs, manifests, lambda: markwrite_gui.EditorPage(web_profile), args.jobs,
+        stylesheet=stylesheet, pdf=pdf, documents=documents, log=None if args.quiet else print,
+    )
+    # Queued, so that a batch finishing inside start() still ends the loop
+    exporter.finished.connect(app.quit, Qt.ConnectionType.QueuedConnection)
+    QTimer.singleShot(0, exporter.start)
+    app.exec()
+    profile.finish("export")
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Exported {exporter.exported}, unchanged {skipped + exporter.unchanged}, "
+        f"failed {exporter.failed} in {elapsed:.1f} s",
+        file=sys.stderr,
+    )
+    return 1 if exporter.failed else 0
@@ -0,0 +1,105 @@
+"""Atomic writes and file states, without Qt.
+
+The I/O tasks of markwrite_io run these on their worker thread; tools that do
+not start Qt at all (`markwrite export --engine python`) call them directly.
+
+This module does not import Qt.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import stat
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+# Size of a single read()/write() call; progress is reported once per chunk.
+IO_CHUNK_SIZE = 1 << 20
+
+# Read once at import: os.umask() can only be queried by setting it, which is
+# not safe to do from the worker thread while other threads create files.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@dataclass(frozen=True)
+class FileState:
+    """What MarkWrite last read from or wrote to a file."""
+
+    digest: str
+    size: int
+    mtime_ns: int
+
+    def matches_disk(self, path: Path) -> bool:
+        """True if the file still looks exactly as we left it (cheap stat check)."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return st.st_size == self.size and st.st_mtime_ns == self.mtime_ns
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _fsync_directory(directory: Path):
+    # Make the rename itself durable; not supported (nor needed) on Windows
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_bytes(path: Path, data: bytes, progress=None, check_cancelled=None):
+    """Write data to a temp file next to path, fsync it, then rename it over path.
+
+    Readers (and sync clients) only ever see the old or the new file, never a
+    truncated one. The permissions of an existing target are preserved and a
+    symlinked target is updated through the link.
+    """
+    view = memoryview(data)
+    total = len(view)
+
+    def chunks():
+        for start in range(0, total, IO_CHUNK_SIZE):
+            yield view[start:start + IO_CHUNK_SIZE]
+            if progress is not None:
+                progress(min(start + IO_CHUNK_SIZE, total), total)
+
+    atomic_write_chunks(path, chunks(), check_cancelled)
+
+
+def atomic_write_chunks(path: Path, chunks, check_cancelled=None):
+    """atomic_write_bytes() for content produced piece by piece: an iterable of bytes."""
+    path = Path(path)
+    if path.is_symlink():
+        path = path.resolve()
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            for chunk in chunks:
+                if check_cancelled is not None:
+                    check_cancelled()
+                fh.write(chunk)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(path.parent)
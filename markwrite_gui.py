@@ -0,0 +1,2372 @@
+"""Qt user interface of MarkWrite.
+
+Kept separate from markwrite.py so that command-line entry points (for example
+`--version`) never pay for importing Qt and QtWebEngine; this module is only
+imported once a window is actually needed.
+"""
+
+import base64
+import binascii
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from functools import partial
+from pathlib import Path
+
+from PySide6.QtCore import (
+    Qt, QUrl, Signal, Slot, QEvent, QObject, QTimer, QStandardPaths, QBuffer, QByteArray, QFile, QIODevice,
+    QSettings
+)
+from PySide6.QtGui import QAction, QActionGroup, QKeySequence, QIcon, QTextCursor
+from PySide6.QtWidgets import (
+    QApplication, QMainWindow, QFileDialog, QMessageBox, QWidget, QVBoxLayout, QToolBar, QStyle,
+    QProgressBar, QToolButton, QTabWidget, QInputDialog, QHBoxLayout, QLabel, QPushButton, QTextBrowser,
+    QPlainTextEdit, QDockWidget, QLineEdit, QListWidget, QListWidgetItem
+)
+from PySide6.QtWebEngineWidgets import QWebEngineView
+from PySide6.QtWebEngineCore import (
+    QWebEnginePage, QWebEngineProfile, QWebEngineSettings, QWebEngineUrlRequestJob, QWebEngineUrlScheme,
+    QWebEngineUrlSchemeHandler
+)
+from PySide6.QtWebChannel import QWebChannel
+from PySide6.QtNetwork import QLocalServer, QLocalSocket
+
+from markwrite import APP_NAME, APP_VERSION_FULL
+from markwrite_assets import EDITOR_PAGE, AssetStore, asset_root
+from markwrite_io import (
+    CallableTask, FileIOQueue, FileState, IOTask, ReadTextTask, SaveEngine, SaveResult, WriteTextTask
+)
+from markwrite_instance import MAX_REQUEST_BYTES, decode_request, server_name
+from markwrite_html import EDITOR_STYLESHEET, StyleSheet, html_document
+from markwrite_images import DocumentDirectories, copy_images, store_image, thumbnail
+from markwrite_export import write_markdown_html
+from markwrite_engine import (
+    DEFAULT_PROFILE, LEAN_PROFILE, SETTINGS_KEY, EngineProfile, apply_chromium_flags, select_engine_profile
+)
+from markwrite_journal import Journal, JournalStore, RecoveryEntry, replay
+from markwrite_large import LARGE_FILE_THRESHOLD_BYTES, MappedDocument, OpenDocumentTask
+from markwrite_links import BrokenLink, check_links
+from markwrite_merge import MergeResult, merge3
+from markwrite_outline import DocumentOutline
+from markwrite_pdf import PAGE_SIZES, PdfScheduler, PdfSettings
+from markwrite_trace import clock, complete, instant, is_enabled as tracing, page_events, span
+from markwrite_watch import DEBOUNCE_MS, DocumentWatcher, check_file
+from markwrite_workspace import (
+    MARKDOWN_SUFFIXES, IndexReader, SearchHit, UpdateStats, WorkspaceIndex, index_path
+)
+
+# Documents cross the QWebChannel in pieces of this many characters so that no
+# single IPC message (and no single JSON payload) grows with the document size.
+BRIDGE_CHUNK_SIZE = 1 << 20
+
+# File operations on files at least this large show progress and a Cancel button
+IO_PROGRESS_MIN_BYTES = 4 << 20
+
+# While a document is dirty, its edits are journaled this often
+AUTOSAVE_INTERVAL_MS = 5000
+
+# Large-file mode adds this many characters per event loop turn when switching to editing
+EDIT_FILL_CHARS = 1 << 19
+
+# Editor pages kept loaded in the background so that a new tab opens instantly
+WARM_PAGE_POOL_SIZE = 1
+PAGE_POOL_REFILL_DELAY_MS = 1500
+# Tabs keeping a live page per window; older background tabs are discarded.
+# Together with the idle limit this bounds renderer memory with many documents open.
+MAX_LIVE_TABS = 6
+TAB_IDLE_DISCARD_SECONDS = 10 * 60
+TAB_IDLE_CHECK_MS = 60 * 1000
+
+# Workspace sidebar: typing pause before searching, and results shown per kind
+WORKSPACE_QUERY_DELAY_MS = 80
+WORKSPACE_NAME_RESULTS = 20
+WORKSPACE_SEARCH_RESULTS = 50
+
+# Editor pages and their assets are served from memory under this scheme
+ASSET_SCHEME = b"markwrite"
+EDITOR_URL = f"{ASSET_SCHEME.decode()}://app/{EDITOR_PAGE}"
+# ... and images of documents under this host (see markwrite_images)
+DOCUMENT_HOST = "doc"
+# Downscaled document images kept for the editor
+THUMBNAIL_CACHE_BYTES = 64 << 20
+WEB_PROFILE_NAME = "MarkWrite"
+
+
+def app_settings() -> QSettings:
+    return QSettings(APP_NAME, APP_NAME)
+
+
+def large_file_threshold_mb() -> int:
+    """Files of at least this many MB open in large-file mode."""
+    try:
+        mb = int(app_settings().value("editor/large_file_threshold_mb", LARGE_FILE_THRESHOLD_BYTES >> 20))
+    except (TypeError, ValueError):
+        mb = LARGE_FILE_THRESHOLD_BYTES >> 20
+    return max(1, mb)
+
+
+class EditorBridge(QObject):
+    """Python side of the QWebChannel connection to editor_offline.html.
+
+    Document text travels as plain string arguments of signals (Python -> JS)
+    and slots (JS -> Python). Nothing is evaluated as JavaScript source, so the
+    cost of a transfer is a linear copy instead of escaping plus a V8 parse.
+
+    The page calls ready() once the editor has been constructed and the channel
+    is connected. Operations issued before that are queued and sent in order
+    then, so callers never have to wait for the page themselves.
+    """
+
+    # Python -> JS: replace the editor content, streamed in chunks
+    markdownBegin = Signal(int)
+    markdownChunk = Signal(int, str)
+    markdownEnd = Signal(int, bool)  # request id, content matches the file on disk
+    # Python -> JS: ask for the editor content ("markdown" or "html")
+    contentRequested = Signal(int, str)
+    # Python -> JS: the markdown served for this request id is now on disk
+    contentSaved = Signal(int)
+    # Python -> JS: ask for the edits since the last journaled state (or all of it)
+    deltaRequested = Signal(int, bool)
+    # Python -> JS: base URL for relative image paths of the document
+    baseChanged = Signal(str)
+    # Python -> JS: where a pasted image was stored (relative path, "" on failure)
+    imageStored = Signal(int, str)
+    # Python -> JS: move the cursor to the heading with this index in the outline
+    headingRequested = Signal(int)
+    # Python -> JS: record spans and send them with reportTrace(), see --trace
+    traceRequested = Signal()
+    # Python-side notifications
+    editorReady = Signal()
+    dirtyChanged = Signal(bool)
+    timingsReported = Signal(dict)  # startup milestones of the page, see --startup-profile
+    imageReceived = Signal(int, str, object)  # image request id, MIME type, bytes
+    outlineSpliced = Signal(int, int, list)  # see outlineSplice()
+    outlineShownChanged = Signal(bool)  # see reportOutlineShown()
+
+    def __init__(self, parent: QObject | None = None):
+        super().__init__(parent)
+        self._next_request_id = 0
+        self._callbacks: dict[int, object] = {}
+        self._incoming: dict[int, list[str]] = {}
+        self._saved_callbacks: dict[int, object] = {}
+        self._delta_ranges: dict[int, tuple[int, int]] = {}
+        self._images: dict[int, list[str]] = {}  # pasted images arriving from JS, base64
+        self.base_url = ""
+        self.is_ready = False
+        self._queued: list = []  # operations waiting for ready()
+        self.page_id = 0  # names the page's track in a trace
+        # When tracing: request id -> (kind, clock()) of content requests, and clock() of save confirmations
+        self._started: dict[int, tuple[str, float]] = {}
+        self._save_started: dict[int, float] = {}
+
+    def _when_ready(self, op):
+        if self.is_ready:
+            op()
+        else:
+            self._queued.append(op)
+
+    def reset(self):
+        """The page is (re)loading: hold operations until it reports ready again."""
+        self.is_ready = False
+
+    def _new_request_id(self) -> int:
+        self._next_request_id += 1
+        return self._next_request_id
+
+    def set_base(self, url: str):
+        """Resolve relative image paths against url; resent whenever the page (re)loads."""
+        self.base_url = url
+        if self.is_ready:
+            self.baseChanged.emit(url)
+
+    def image_stored(self, request_id: int, path: str):
+        self.imageStored.emit(request_id, path)
+
+    def set_markdown(self, text: str, clean: bool = True):
+        self._when_ready(partial(self._send_markdown, self._new_request_id(), text, clean))
+
+    def jump_to_heading(self, index: int):
+        self._when_ready(partial(self.headingRequested.emit, index))
+
+    def _send_markdown(self, request_id: int, text: str, clean: bool):
+        with span("send markdown", "bridge", page=self.page_id, chars=len(text)):
+            self.markdownBegin.emit(request_id)
+            for start in range(0, len(text), BRIDGE_CHUNK_SIZE):
+                self.markdownChunk.emit(request_id, text[start:start + BRIDGE_CHUNK_SIZE])
+            self.markdownEnd.emit(request_id, clean)
+
+    def _expect_content(self, kind: str, callback) -> int:
+        request_id = self._new_request_id()
+        self._callbacks[request_id] = callback
+        self._incoming[request_id] = []
+        if tracing():
+            self._started[request_id] = (kind, clock())
+        return request_id
+
+    def request_content(self, kind: str, callback) -> int:
+        """Fetch the editor content of the given kind and pass it to callback."""
+        request_id = self._expect_content(kind, callback)
+        self._when_ready(partial(self.contentRequested.emit, request_id, kind))
+        return request_id
+
+    def request_delta(self, full: bool, callback) -> int:
+        """Fetch the edits made since the previous delta request.
+
+        callback(start, end, text) means: replace the UTF-16 code unit range
+        [start, end) of the previously delivered text with text. start == -1
+        means text is the whole document (sent when full is requested, or when
+        the page has no previous state to diff against).
+        """
+        request_id = self._expect_content(
+            "delta", lambda text: callback(*self._delta_ranges.pop(request_id, (-1, -1)), text)
+        )
+        self._when_ready(partial(self.deltaRequested.emit, request_id, full))
+        return request_id
+
+    def mark_saved(self, request_id: int, callback):
+        """Make the markdown served for request_id the editor's clean baseline.
+
+        callback receives whether the editor is still dirty, i.e. whether it
+        was edited after that content was fetched.
+        """
+        self._saved_callbacks[request_id] = callback
+        if tracing():
+            self._save_started[request_id] = clock()
+        self._when_ready(partial(self.contentSaved.emit, request_id))
+
+    # -------- Slots called from JS --------
+    @Slot()
+    def ready(self):
+        self.is_ready = True
+        instant("page ready", "page", page=self.page_id)
+        if tracing():
+            self.traceRequested.emit()
+        if self.base_url:
+            self.baseChanged.emit(self.base_url)
+        queued, self._queued = self._queued, []
+        for op in queued:
+            op()
+        self.editorReady.emit()
+
+    @Slot(str)
+    def reportTimings(self, timings_json: str):
+        self.timingsReported.emit(json.loads(timings_json))
+
+    @Slot(str)
+    def reportTrace(self, events_json: str):
+        page_events(self.page_id, json.loads(events_json))
+
+    @Slot(int, str)
+    def pushChunk(self, request_id: int, chunk: str):
+        parts = self._incoming.get(request_id)
+        if parts is not None:
+            parts.append(chunk)
+
+    @Slot(int)
+    def finishContent(self, request_id: int):
+        parts = self._incoming.pop(request_id, None)
+        callback = self._callbacks.pop(request_id, None)
+        if callback is None:
+            return
+        text = "".join(parts or ())
+        started = self._started.pop(request_id, None)
+        if started is not None:
+            kind, start = started
+            complete(f"fetch {kind}", start, "bridge", page=self.page_id, chars=len(text))
+        callback(text)
+
+    @Slot(int, int, int)
+    def deltaRange(self, request_id: int, start: int, end: int):
+        self._delta_ranges[request_id] = (start, end)
+
+    @Slot(int, str)
+    def imageChunk(self, request_id: int, chunk: str):
+        self._images.setdefault(request_id, []).append(chunk)
+
+    @Slot(int, str)
+    def storeImage(self, request_id: int, mime: str):
+        try:
+            data = base64.b64decode("".join(self._images.pop(request_id, ())), validate=True)
+        except (binascii.Error, ValueError):
+            self.image_stored(request_id, "")
+            return
+        self.imageReceived.emit(request_id, mime, data)
+
+    @Slot(int, int, str)
+    def outlineSplice(self, start: int, removed: int, headings_json: str):
+        """Headings [start, start + removed) of the outline were replaced (removed == -1: all of it)."""
+        headings = [(level, text) for level, text in json.loads(headings_json)]
+        self.outlineSpliced.emit(start, removed, headings)
+
+    @Slot(bool)
+    def reportOutlineShown(self, shown: bool):
+        """False in Markdown mode, which keeps no outline; the whole outline is resent on return."""
+        self.outlineShownChanged.emit(shown)
+
+    @Slot(bool)
+    def reportDirty(self, dirty: bool):
+        self.dirtyChanged.emit(dirty)
+
+    @Slot(int, bool)
+    def confirmSaved(self, request_id: int, dirty: bool):
+        callback = self._saved_callbacks.pop(request_id, None)
+        started = self._save_started.pop(request_id, None)
+        if started is not None:
+            complete("confirm saved", started, "bridge", page=self.page_id)
+        if callback is not None:
+            callback(dirty)
+
+
+def register_asset_scheme():
+    """Declare markwrite://; must happen before the QApplication is created."""
+    scheme = QWebEngineUrlScheme(ASSET_SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.Flag.SecureScheme | QWebEngineUrlScheme.Flag.CorsEnabled)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+def load_asset_store() -> AssetStore:
+    store = AssetStore(asset_root())
+    # Serve Qt's WebChannel client from the same origin as the page
+    qwebchannel = QFile(":/qtwebchannel/qwebchannel.js")
+    if qwebchannel.open(QIODevice.OpenModeFlag.ReadOnly):
+        store.add("qwebchannel.js", bytes(qwebchannel.readAll()))
+        qwebchannel.close()
+    store.preload()
+    return store
+
+
+class AssetSchemeHandler(QWebEngineUrlSchemeHandler):
+    """Answers markwrite:// requests.
+
+    markwrite://app/... comes from an AssetStore, without touching the disk.
+    markwrite://doc/... are images of open documents (see markwrite_images);
+    they are downscaled on a worker thread and kept in a small cache.
+    """
+
+    def __init__(self, store: AssetStore, documents: DocumentDirectories | None = None,
+                 parent: QObject | None = None):
+        super().__init__(parent)
+        self.store = store
+        self.documents = documents
+        self._thumbnails: OrderedDict[tuple[Path, int], tuple[bytes, str]] = OrderedDict()
+        self._thumbnail_bytes = 0
+        self._io = FileIOQueue()
+
+    def requestStarted(self, job: QWebEngineUrlRequestJob):
+        url = job.requestUrl()
+        if url.host() == DOCUMENT_HOST and self.documents is not None:
+            self._serve_image(job, url.path())
+            return
+        asset = self.store.get(url.path())
+        if asset is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        self._reply(job, asset.body(), asset.mime)
+
+    def _serve_image(self, job: QWebEngineUrlRequestJob, url_path: str):
+        path = self.documents.resolve(url_path)
+        try:
+            key = (path, path.stat().st_mtime_ns) if path is not None else None
+        except OSError:
+            key = None
+        if key is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        cached = self._thumbnails.get(key)
+        if cached is not None:
+            self._thumbnails.move_to_end(key)
+            self._reply(job, *cached)
+            return
+        task = CallableTask(path, thumbnail, path)
+        task.signals.finished.connect(partial(self._on_thumbnail, job, key))
+        task.signals.failed.connect(lambda _msg: self._fail(job))
+        self._io.submit(task)
+
+    def _on_thumbnail(self, job: QWebEngineUrlRequestJob, key: tuple[Path, int], result: tuple[bytes, str]):
+        self._thumbnails[key] = result
+        self._thumbnail_bytes += len(result[0])
+        while self._thumbnail_bytes > THUMBNAIL_CACHE_BYTES and len(self._thumbnails) > 1:
+            _key, (data, _mime) = self._thumbnails.popitem(last=False)
+            self._thumbnail_bytes -= len(data)
+        self._reply(job, *result)
+
+    @staticmethod
+    def _reply(job: QWebEngineUrlRequestJob, data: bytes, mime: str):
+        try:
+            # The job owns the buffer, so it lives exactly as long as the reply
+            buffer = QBuffer(job)
+            buffer.setData(QByteArray(data))
+            buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+            job.reply(mime.encode(), buffer)
+        except RuntimeError:
+            pass  # the page dropped the request while the image was prepared
+
+    @staticmethod
+    def _fail(job: QWebEngineUrlRequestJob):
+        try:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+        except RuntimeError:
+            pass
+
+
+def create_web_profile(store: AssetStore, documents: DocumentDirectories | None = None,
+                       parent: QObject | None = None, engine: EngineProfile = DEFAULT_PROFILE) -> QWebEngineProfile:
+    """The profile shared by all editor pages.
+
+    By default it is persistent (named) with an on-disk HTTP cache, so whatever
+    Chromium caches for the editor scripts, including compiled code, survives
+    restarts. The lean engine profile uses an off-the-record profile instead,
+    which keeps a small cache in memory and writes nothing to disk.
+    """
+    if engine.off_the_record:
+        profile = QWebEngineProfile(parent)
+        profile.setHttpCacheType(QWebEngineProfile.HttpCacheType.MemoryHttpCache)
+    else:
+        profile = QWebEngineProfile(WEB_PROFILE_NAME, parent)
+        cache_dir = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.CacheLocation)
+        profile.setCachePath(os.path.join(cache_dir, "webengine"))
+        profile.setHttpCacheType(QWebEngineProfile.HttpCacheType.DiskHttpCache)
+    if engine.http_cache_bytes:
+        profile.setHttpCacheMaximumSize(engine.http_cache_bytes)
+    settings = profile.settings()
+    for name in engine.disabled_attributes:
+        settings.setAttribute(getattr(QWebEngineSettings.WebAttribute, name), False)
+    profile.installUrlSchemeHandler(ASSET_SCHEME, AssetSchemeHandler(store, documents, profile))
+    return profile
+
+
+class EditorPage(QWebEnginePage):
+    """editor_offline.html together with its bridge."""
+
+    _count = 0
+
+    def __init__(self, profile: QWebEngineProfile, parent: QObject | None = None):
+        super().__init__(profile, parent)
+        self.bridge = EditorBridge(self)
+        EditorPage._count += 1
+        self.bridge.page_id = EditorPage._count
+        self.channel = QWebChannel(self)
+        self.channel.registerObject("markwrite", self.bridge)
+        self.setWebChannel(self.channel)
+        # A (re)load drops the channel connection until the page reports ready again
+        self.loadStarted.connect(self.bridge.reset)
+        if tracing():
+            self.loadStarted.connect(partial(instant, "page load started", "page", page=self.bridge.page_id))
+            self.loadFinished.connect(lambda ok: instant("page load finished", "page", page=self.bridge.page_id, ok=ok))
+        self.load(QUrl(EDITOR_URL))
+
+    @property
+    def is_ready(self) -> bool:
+        return self.bridge.is_ready
+
+
+class PagePool(QObject):
+    """A few editor pages kept loaded in the background for new and restored tabs.
+
+    Loading editor_offline.html means parsing and compiling the whole Toast UI
+    bundle, which is what makes a fresh page slow; a pooled page has already
+    done that. All pages share one QWebEngineProfile, so there is a single
+    network/disk cache and one set of profile services for every tab.
+    """
+
+    def __init__(self, profile: QWebEngineProfile, size: int = WARM_PAGE_POOL_SIZE, parent: QObject | None = None):
+        super().__init__(parent)
+        self.profile = profile
+        self._size = size
+        self._warm: list[EditorPage] = []
+        self._refill_timer = QTimer(self)
+        self._refill_timer.setSingleShot(True)
+        self._refill_timer.setInterval(PAGE_POOL_REFILL_DELAY_MS)
+        self._refill_timer.timeout.connect(self._refill)
+
+    def take(self, parent: QObject) -> EditorPage:
+        """Hand out a page, preferring one whose editor is already up."""
+        page = next((p for p in self._warm if p.is_ready), None)
+        if page is None and self._warm:
+            page = self._warm[0]
+        if page is None:
+            page = EditorPage(self.profile)
+        else:
+            self._warm.remove(page)
+        page.setParent(parent)
+        # Refill a little later so the pool never competes with the page in use
+        self._refill_timer.start()
+        return page
+
+    def _refill(self):
+        while len(self._warm) < self._size:
+            self._warm.append(EditorPage(self.profile, self))
+
+
+class ExportHtmlTask(WriteTextTask):
+    """Wrap an editor HTML fragment into a standalone document and write it.
+
+    The stylesheet is fetched and pruned on the I/O worker, off the GUI thread.
+    Pasted images the fragment shows are copied next to the document.
+    """
+
+    def __init__(self, path: Path, fragment: str, title: str, stylesheet, image_dir: Path):
+        super().__init__(path, "")
+        self.fragment = fragment
+        self.title = title
+        self.stylesheet = stylesheet
+        self.image_dir = image_dir
+
+    def work(self) -> int:
+        self.text = html_document(self.fragment, self.title, self.stylesheet())
+        written = super().work()
+        copy_images(self.fragment, self.image_dir, Path(self.path).parent)
+        return written
+
+
+class ExportMarkdownHtmlTask(IOTask):
+    """Render Markdown (text, or a file path) to a standalone document with markwrite_markdown.
+
+    For files in large-file mode, which never reach an editor page; see
+    write_markdown_html.
+    """
+
+    def __init__(self, path: Path, source: str | Path, title: str, stylesheet, image_dir: Path):
+        super().__init__(path)
+        self.source = source
+        self.title = title
+        self.stylesheet = stylesheet
+        self.image_dir = image_dir
+
+    def work(self):
+        write_markdown_html(self.source, Path(self.path), self.title, self.stylesheet(), self.image_dir,
+                            self._check_cancelled)
+
+
+class IndexWorkspaceTask(IOTask):
+    """Bring a workspace index up to date (see WorkspaceIndex.update). Cancellable between batches."""
+
+    def __init__(self, index: WorkspaceIndex, paths=None):
+        super().__init__(index.root)
+        self.index = index
+        self.paths = paths
+
+    def work(self) -> UpdateStats:
+        return self.index.update(self.paths, progress=self.signals.progress.emit,
+                                 check_cancelled=self._check_cancelled)
+
+
+class WorkspaceQueryTask(IOTask):
+    """Quick-open names and full-text hits for one workspace query."""
+
+    def __init__(self, reader: IndexReader, text: str):
+        super().__init__(reader.root)
+        self.reader = reader
+        self.text = text
+
+    def work(self) -> tuple[list[Path], list[SearchHit]]:
+        self._check_cancelled()
+        names = self.reader.find_files(self.text, WORKSPACE_NAME_RESULTS)
+        self._check_cancelled()
+        return names, self.reader.search(self.text, WORKSPACE_SEARCH_RESULTS)
+
+
+class CheckLinksTask(IndexWorkspaceTask):
+    """Update a workspace index, then check its links (see markwrite_links)."""
+
+    def work(self) -> list[BrokenLink]:
+        super().work()
+        self._check_cancelled()
+        return check_links(self.index)
+
+
+class LargeFileView(QWidget):
+    """Read-only view of a file in large-file mode (see markwrite_large).
+
+    Sections of the memory-mapped file are rendered as Markdown as the user
+    scrolls towards the end of what is shown. "Edit as Markdown" replaces the
+    view with a plain-text editor holding the whole file.
+    """
+
+    editRequested = Signal()
+    modificationChanged = Signal(bool)  # edits since the last save, once editing
+
+    _ACTIONS = {
+        QWebEnginePage.Undo: "undo",
+        QWebEnginePage.Redo: "redo",
+        QWebEnginePage.Cut: "cut",
+        QWebEnginePage.Copy: "copy",
+        QWebEnginePage.Paste: "paste",
+        QWebEnginePage.SelectAll: "selectAll",
+    }
+
+    def __init__(self, document: MappedDocument, parent: QWidget | None = None):
+        super().__init__(parent)
+        self.document = document
+        self.editor: QPlainTextEdit | None = None
+        self._filling: str | None = None  # text still being added to the editor
+        self._filled = 0
+        self._loaded = 0
+        self._load_scheduled = False
+        self._base_point_size = self.font().pointSizeF()
+        self._zoom_factor = 1.0
+
+        self._banner = QLabel(self)
+        self._edit_button = QPushButton("Edit as Markdown", self)
+        self._edit_button.clicked.connect(self.editRequested)
+        bar = QHBoxLayout()
+        bar.setContentsMargins(8, 4, 8, 4)
+        bar.addWidget(self._banner, 1)
+        bar.addWidget(self._edit_button)
+
+        self.preview = QTextBrowser(self)
+        self.preview.setOpenExternalLinks(True)
+        self.preview.verticalScrollBar().valueChanged.connect(self._maybe_load_more)
+
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        self._layout.addLayout(bar)
+        self._layout.addWidget(self.preview)
+        self._load_more()
+
+    @property
+    def is_editing(self) -> bool:
+        return self.editor is not None
+
+    def _maybe_load_more(self, *_args):
+        if self._load_scheduled or self.editor is not None or self._loaded >= self.document.size:
+            return
+        bar = self.preview.verticalScrollBar()
+        if bar.value() >= bar.maximum() - bar.pageStep():
+            self._load_scheduled = True
+            QTimer.singleShot(0, self._load_more)
+
+    def _load_more(self):
+        self._load_scheduled = False
+        if self.document.closed:
+            return
+        try:
+            text, end = self.document.read_section(self._loaded)
+        except OSError as e:
+            self._loaded = self.document.size
+            self._banner.setText(f"Large file: {e}")
+            return
+        cursor = QTextCursor(self.preview.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertMarkdown(text)
+        self._loaded = end
+        size_mb = self.document.size / (1 << 20)
+        percent = 100 * self._loaded // max(1, self.document.size)
+        self._banner.setText(f"Large file ({size_mb:.1f} MB), read-only preview: {percent}% shown")
+        # Keep going until the viewport is filled
+        self._maybe_load_more()
+
+    def start_editing(self, text: str):
+        """Swap the preview for a plain-text editor holding text.
+
+        The text is added in pieces, one per event loop turn, so that the window
+        stays responsive; the editor is read-only until all of it is in.
+        """
+        self.editor = QPlainTextEdit(self)
+        self.editor.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.editor.setReadOnly(True)
+        self.editor.setUndoRedoEnabled(False)
+        self._layout.replaceWidget(self.preview, self.editor)
+        self.preview.deleteLater()
+        self.preview = None
+        self._edit_button.hide()
+        self.set_zoom(self._zoom_factor)
+        # The whole text is in memory now; the mapping would only keep the file busy
+        self.document.close()
+        self._filling = text
+        self._filled = 0
+        self._fill()
+
+    def _fill(self):
+        text = self._filling
+        cursor = QTextCursor(self.editor.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text[self._filled:self._filled + EDIT_FILL_CHARS])
+        self._filled += EDIT_FILL_CHARS
+        if self._filled < len(text):
+            self._banner.setText(f"Large file: loading for editing, {100 * self._filled // len(text)}%")
+            QTimer.singleShot(0, self._fill)
+            return
+        self._filling = None
+        self.editor.setUndoRedoEnabled(True)
+        self.editor.setReadOnly(False)
+        self.editor.document().setModified(False)
+        self.editor.document().modificationChanged.connect(self.modificationChanged)
+        self._banner.setText("Large file: editing as plain Markdown")
+        self.editor.setFocus()
+
+    def snapshot(self) -> tuple[str, int | None]:
+        """The text to save and a token for mark_saved()."""
+        if self._filling is not None:
+            return self._filling, None
+        return self.editor.toPlainText(), self.editor.document().revision()
+
+    def mark_saved(self, token: int | None) -> bool:
+        """Record that the snapshot with token was saved; return whether edits remain."""
+        if token is None:
+            return False
+        document = self.editor.document()
+        # Edits made while the save was in flight keep the document modified
+        if document.revision() == token:
+            document.setModified(False)
+        return document.isModified()
+
+    def trigger(self, action: QWebEnginePage.WebAction):
+        widget = self.editor or self.preview
+        name = self._ACTIONS.get(action)
+        if name is not None:
+            getattr(widget, name)()
+
+    def set_zoom(self, factor: float):
+        self._zoom_factor = factor
+        widget = self.editor or self.preview
+        font = widget.font()
+        font.setPointSizeF(self._base_point_size * factor)
+        widget.setFont(font)
+
+    def close_document(self):
+        self.document.close()
+
+
+class DocumentTab(QWidget):
+    """One open document: its file, dirty state, autosave journal and editor page.
+
+    A tab that has been in the background for a while can be discarded: its
+    markdown is kept as a snapshot and the page (with its renderer memory) is
+    released. The tab gets a page from the pool again when it is shown.
+    """
+
+    titleChanged = Signal()
+    editorReady = Signal()
+    outlineChanged = Signal(int, int, list)  # as EditorBridge.outlineSpliced
+    outlineShownChanged = Signal(bool)  # as EditorBridge.outlineShownChanged
+
+    def __init__(self, window: "MainWindow"):
+        super().__init__()
+        self.main_window = window
+        self.current_path: Path | None = None
+        # The file being read into this tab, until it is shown (or fails to open)
+        self.opening: Path | None = None
+        self._dirty = False
+        self._zoom_factor: float = 1.0
+        self.last_active = time.monotonic()
+        self.page: EditorPage | None = None
+        self.view: QWebEngineView | None = None
+        # Files above the large-file threshold are shown here instead of in a page
+        self.large: LargeFileView | None = None
+        # Where pasted images are stored and relative image paths resolve
+        self._image_dir: Path = QApplication.instance().unsaved_image_dir
+        # The file's text as last read or saved: the base for merging changes made on disk
+        self._disk_text: str | None = None
+        self._disk_prompt_open = False
+        # While discarded: the markdown and whether it matches the file on disk
+        self._snapshot: tuple[str, bool] | None = None
+        self._discarding = False
+        # (level, text) of every heading, kept in step with the page's outline
+        self._outline = DocumentOutline()
+
+        # Autosave journal: deltas of unsaved edits, written on the window's journal worker
+        self._journal: Journal | None = None
+        self._journal_needs_checkpoint = False
+        self._autosave_timer = QTimer(self)
+        self._autosave_timer.setInterval(AUTOSAVE_INTERVAL_MS)
+        self._autosave_timer.timeout.connect(self._autosave)
+
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        self._attach_page()
+
+    # -------- Page lifecycle --------
+    def _attach_page(self):
+        self.page = self.main_window.page_pool.take(self)
+        instant("attach page", "tab", page=self.page.bridge.page_id, ready=self.page.is_ready)
+        self.page.bridge.dirtyChanged.connect(self._set_dirty)
+        self.page.bridge.editorReady.connect(self.editorReady)
+        self.page.bridge.imageReceived.connect(self._store_image)
+        self.page.bridge.outlineSpliced.connect(self._splice_outline)
+        self.page.bridge.outlineShownChanged.connect(self._set_outline_shown)
+        self.page.bridge.set_base(QApplication.instance().documents.url(self._image_dir))
+        self.view = QWebEngineView(self)
+        self.view.setPage(self.page)
+        self.view.setZoomFactor(self._zoom_factor)
+        self._layout.addWidget(self.view)
+        if self.page.is_ready:
+            QTimer.singleShot(0, self.editorReady.emit)
+
+    def is_live(self) -> bool:
+        return self.page is not None
+
+    def discard(self):
+        """Release the editor page, keeping the document as a snapshot."""
+        if self.page is None or not self.page.is_ready or self._discarding:
+            return
+        self._discarding = True
+        instant("discard tab", "tab", page=self.page.bridge.page_id)
+        self.page.bridge.request_content("markdown", self._on_discard_snapshot)
+
+    def _on_discard_snapshot(self, md: str):
+        self._discarding = False
+        if self.page is None or self.main_window.current_tab() is self:
+            return  # shown again while the content was on its way
+        self._snapshot = (md, not self._dirty)
+        if self._dirty:
+            # The journal's diff base lived in the page; continue from the snapshot
+            self._journal_delta(-1, -1, md)
+        self._release_page()
+
+    def _release_page(self):
+        view, page = self.view, self.page
+        if page is None:
+            return
+        instant("release page", "tab", page=page.bridge.page_id)
+        # Whatever the page still reports is about a document this tab no longer shows
+        page.bridge.blockSignals(True)
+        self.view = self.page = None
+        self._layout.removeWidget(view)
+        view.deleteLater()
+        page.deleteLater()
+        # The next page reports its outline from scratch
+        shown = self._outline.shown
+        self._outline.page_released()
+        if not shown:
+            self.outlineShownChanged.emit(True)
+        self.outlineChanged.emit(0, -1, [])
+
+    def ensure_live(self):
+        """Give a discarded tab a page again and restore its content."""
+        if self.page is not None or self.large is not None:
+            return
+        snapshot, self._snapshot = self._snapshot, None
+        self._attach_page()
+        if snapshot is not None:
+            self.set_markdown(*snapshot)
+        if self._dirty:
+            self._journal_needs_checkpoint = True
+
+    def shutdown(self):
+        """Stop autosaving; called when the tab is closed for good."""
+        self._autosave_timer.stop()
+        self._discard_journal()
+        if self.large is not None:
+            self.large.close_document()
+
+    def trigger(self, action: QWebEnginePage.WebAction):
+        if self.large is not None:
+            self.large.trigger(action)
+        elif self.view is not None:
+            self.view.triggerPageAction(action)
+
+    # -------- State --------
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def title(self) -> str:
+        return self.current_path.name if self.current_path else "Untitled"
+
+    def is_pristine(self) -> bool:
+        """True for an untouched Untitled tab that a newly opened file may take over."""
+        return self.current_path is None and self.opening is None and not self._dirty
+
+    def _set_dirty(self, dirty: bool):
+        # Driven by the editor's debounced change events (see editor_offline.html)
+        if dirty == self._dirty:
+            return
+        self._dirty = dirty
+        self.titleChanged.emit()
+        if dirty:
+            self._autosave_timer.start()
+        else:
+            self._autosave_timer.stop()
+            self._discard_journal()
+
+    def set_markdown(self, text: str, clean: bool = True):
+        if self.page is None:
+            self._snapshot = (text, clean)
+            return
+        self.page.bridge.set_markdown(text, clean)
+
+    @property
+    def outline(self) -> list[tuple[int, str]]:
+        return self._outline.headings
+
+    @property
+    def outline_shown(self) -> bool:
+        return self._outline.shown
+
+    def _splice_outline(self, start: int, removed: int, headings: list):
+        self._outline.splice(start, removed, headings)
+        self.outlineChanged.emit(start, removed, headings)
+
+    def _set_outline_shown(self, shown: bool):
+        if self._outline.set_shown(shown):
+            self.outlineShownChanged.emit(shown)
+
+    def jump_to_heading(self, index: int):
+        if self.page is not None and self.outline_shown:
+            self.page.bridge.jump_to_heading(index)
+            self.view.setFocus()
+
+    # -------- Changes on disk --------
+    def check_disk(self):
+        """Reload, or offer to merge, if the file changed on disk since it was read or saved."""
+        path = self.current_path
+        saver = self.main_window.saver
+        if path is None:
+            return
+        if saver.is_saving(path):
+            # Most likely our own write; look again once it is recorded
+            QTimer.singleShot(DEBOUNCE_MS, self.check_disk)
+            return
+        task = CallableTask(path, check_file, path, saver.state(path), self.large is None)
+        task.signals.finished.connect(partial(self._on_disk_checked, path))
+        task.signals.failed.connect(
+            lambda msg: self.main_window.statusBar().showMessage(f"{path.name} changed on disk: {msg}", 5000)
+        )
+        self.main_window.io.submit(task)
+
+    def _on_disk_checked(self, path: Path, result: tuple[FileState, bytes | None] | None):
+        if result is None or path != self.current_path:
+            return
+        state, data = result
+        saver = self.main_window.saver
+        known = saver.state(path)
+        saver.remember(path, state)
+        if known is not None and state.digest == known.digest:
+            return  # touched, not changed
+        if self.large is not None:
+            self._on_large_changed_on_disk(path)
+            return
+        try:
+            theirs = data.decode("utf-8")
+        except UnicodeDecodeError as e:
+            self.main_window.statusBar().showMessage(f"{path.name} changed on disk: {e}", 5000)
+            return
+        if not self._dirty:
+            self._disk_text = theirs
+            self.set_markdown(theirs)
+            self.main_window.statusBar().showMessage(f"Reloaded {path.name}: it changed on disk", 5000)
+            return
+        self._offer_merge(path, theirs)
+
+    def _offer_merge(self, path: Path, theirs: str):
+        if self._disk_prompt_open:
+            return
+        self._disk_prompt_open = True
+        box = QMessageBox(self)
+        box.setIcon(QMessageBox.Icon.Warning)
+        box.setWindowTitle("File changed on disk")
+        box.setText(f"“{path.name}” was changed by another program while it has unsaved edits here.")
+        box.setInformativeText(
+            "Merge combines both versions and marks lines changed on both sides. "
+            "Keep Mine leaves your edits as they are; saving will overwrite the file."
+        )
+        merge = box.addButton("Merge", QMessageBox.ButtonRole.AcceptRole)
+        reload = box.addButton("Reload from Disk", QMessageBox.ButtonRole.DestructiveRole)
+        box.addButton("Keep Mine", QMessageBox.ButtonRole.RejectRole)
+        box.setDefaultButton(merge)
+        box.exec()
+        self._disk_prompt_open = False
+        base, self._disk_text = self._disk_text or "", theirs
+        if box.clickedButton() is reload:
+            self.set_markdown(theirs)
+        elif box.clickedButton() is merge:
+            if self.page is None:
+                self._merge(base, self._snapshot[0], theirs)
+            else:
+                self.page.bridge.request_content("markdown", lambda ours: self._merge(base, ours or "", theirs))
+
+    def _merge(self, base: str, ours: str, theirs: str):
+        task = CallableTask(self.current_path, merge3, base, ours, theirs)
+        task.signals.finished.connect(self._on_merged)
+        self.main_window.io.submit(task)
+
+    def _on_merged(self, result: MergeResult):
+        self.set_markdown(result.text, clean=False)
+        self._set_dirty(True)
+        message = "Merged the changes made on disk"
+        if result.conflicts:
+            message += f"; {result.conflicts} conflicting change(s) are marked with <<<<<<<"
+        self.main_window.statusBar().showMessage(message, 10000)
+
+    def _on_large_changed_on_disk(self, path: Path):
+        if self._dirty:
+            answer = QMessageBox.question(
+                self, "File changed on disk",
+                f"“{path.name}” was changed by another program. Reload it and discard your edits?",
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                return
+        self.open_path(path)
+
+    # -------- Pasted images --------
+    def _set_image_dir(self, directory: Path):
+        self._image_dir = directory
+        if self.page is not None:
+            self.page.bridge.set_base(QApplication.instance().documents.url(directory))
+
+    def _store_image(self, request_id: int, mime: str, data: bytes):
+        bridge = self.page.bridge
+        task = CallableTask(self._image_dir, store_image, self._image_dir, data, mime)
+        task.signals.finished.connect(partial(bridge.image_stored, request_id))
+        task.signals.failed.connect(partial(self._on_image_failed, bridge, request_id))
+        self.main_window.io.submit(task)
+
+    def _on_image_failed(self, bridge: EditorBridge, request_id: int, message: str):
+        bridge.image_stored(request_id, "")
+        self.main_window.statusBar().showMessage(f"Could not store image: {message}", 5000)
+
+    def _carry_images(self, text: str, directory: Path):
+        """Queue copying the pasted images text refers to into directory, ahead of a save there."""
+        if directory == self._image_dir:
+            return
+        task = CallableTask(directory, copy_images, text, self._image_dir, directory)
+        task.signals.failed.connect(
+            lambda msg: self.main_window.statusBar().showMessage(f"Could not copy images: {msg}", 5000)
+        )
+        self.main_window.io.submit(task)
+        self._set_image_dir(directory)
+
+    # -------- Autosave journal --------
+    def _autosave(self):
+        # A discarded tab journaled its snapshot on the way out and cannot change
+        if not self._dirty or self.page is None:
+            return
+        full = self._journal is None or self._journal_needs_checkpoint
+        self.page.bridge.request_delta(full, self._journal_delta)
+
+    def _journal_delta(self, start: int, end: int, text: str):
+        if not self._dirty:
+            return
+        if start >= 0 and start == end and not text:
+            return  # nothing changed since the last tick
+        journals = self.main_window.journals
+        if self._journal is None:
+            self._journal = journals.create(self.current_path)
+        journal = self._journal
+        if start < 0:
+            self._journal_needs_checkpoint = False
+            task = CallableTask(journal.path, self._write_journal_checkpoint, journals, journal, text)
+        else:
+            task = CallableTask(journal.path, self._append_journal_delta, journal, start, end, text)
+        task.signals.failed.connect(self._on_journal_failed)
+        self.main_window.journal_io.submit(task)
+
+    @staticmethod
+    def _write_journal_checkpoint(journals: JournalStore, journal: Journal, text: str):
+        # Runs on the journal worker
+        journal.write_checkpoint(text)
+        journals.enforce_limits(keep={journal.path})
+
+    @staticmethod
+    def _append_journal_delta(journal: Journal, start: int, end: int, text: str):
+        # Runs on the journal worker
+        journal.append_replace(start, end, text)
+        if journal.needs_compaction():
+            journal.compact()
+
+    def _on_journal_failed(self, message: str):
+        # The page has moved on; the next tick must not build on the lost delta
+        self._journal_needs_checkpoint = True
+        self.main_window.statusBar().showMessage(f"Autosave failed: {message}", 5000)
+
+    def _discard_journal(self):
+        if self._journal is None:
+            return
+        self.main_window.journal_io.submit(CallableTask(self._journal.path, self._journal.discard))
+        self._journal = None
+        self._journal_needs_checkpoint = False
+
+    def restore_journal(self, entry: RecoveryEntry):
+        task = CallableTask(entry.path, replay, entry.path)
+        task.signals.finished.connect(lambda result: self._on_journal_replayed(entry, result[1]))
+        task.signals.failed.connect(
+            lambda msg: QMessageBox.critical(self, "Recovery failed", f"Could not restore:\n{msg}")
+        )
+        self.main_window.journal_io.submit(task)
+
+    def _on_journal_replayed(self, entry: RecoveryEntry, text: str):
+        self.current_path = entry.source
+        if entry.source is not None:
+            self._set_image_dir(entry.source.parent)
+        self.set_markdown(text, clean=False)
+        # Keep journaling into the recovered file; its first write is a fresh checkpoint
+        self._journal = Journal(entry.path, entry.source)
+        self._journal_needs_checkpoint = True
+        self._set_dirty(True)
+        self.titleChanged.emit()
+
+    # -------- Zoom controls --------
+    def zoom_by(self, step: float):
+        # Clamp zoom factor to a reasonable range
+        self._zoom_factor = max(0.5, min(3.0, self._zoom_factor + step))
+        if self.view is not None:
+            self.view.setZoomFactor(self._zoom_factor)
+        if self.large is not None:
+            self.large.set_zoom(self._zoom_factor)
+
+    def zoom_reset(self):
+        self.zoom_by(1.0 - self._zoom_factor)
+
+    # -------- File ops --------
+    def open_path(self, path: Path):
+        task = OpenDocumentTask(path, large_file_threshold_mb() << 20)
+        started = clock()
+        self.opening = path
+        task.signals.finished.connect(lambda result: self._on_path_read(path, result, task.state, started))
+        task.signals.failed.connect(partial(self._on_open_failed, path))
+        task.signals.cancelled.connect(partial(self._open_done, path))
+        self.main_window._start_io(task, f"Opening {path.name}…")
+
+    def _open_done(self, path: Path):
+        if self.opening == path:
+            self.opening = None
+
+    def _on_open_failed(self, path: Path, msg: str):
+        self._open_done(path)
+        QMessageBox.critical(self, "Open failed", f"Could not open:\n{msg}")
+
+    def _on_path_read(self, path: Path, result: str | MappedDocument, state: FileState | None, started: float):
+        self._open_done(path)
+        self.main_window.saver.remember(path, state)
+        self.current_path = path
+        if isinstance(result, MappedDocument):
+            self._disk_text = None
+            self._show_large(result)
+        else:
+            self._disk_text = result
+            self._set_image_dir(path.parent)
+            self.set_markdown(result)
+        self._set_dirty(False)
+        self.titleChanged.emit()
+        complete("open document", started, "tab", path=str(path), large=self.large is not None)
+
+    def _show_large(self, document: MappedDocument):
+        # Large-file mode replaces the editor page for good
+        self._release_page()
+        self._snapshot = None
+        if self.large is not None:
+            self.large.close_document()
+            self._layout.removeWidget(self.large)
+            self.large.deleteLater()
+        self.large = LargeFileView(document, self)
+        self.large.set_zoom(self._zoom_factor)
+        self.large.editRequested.connect(self._edit_large)
+        self._layout.addWidget(self.large)
+
+    def _edit_large(self):
+        path = self.large.document.path
+        task = ReadTextTask(path)
+        task.signals.finished.connect(lambda md: self._on_large_text_read(path, md, task.state))
+        task.signals.failed.connect(
+            lambda msg: QMessageBox.critical(self, "Open failed", f"Could not open:\n{msg}")
+        )
+        self.main_window._start_io(task, f"Opening {path.name} for editing…")
+
+    def _on_large_text_read(self, path: Path, md: str, state: FileState | None):
+        if self.large is None or self.large.is_editing:
+            return
+        self.main_window.saver.remember(path, state)
+        self.large.modificationChanged.connect(self._set_dirty)
+        self.large.start_editing(md)
+
+    def save(self, on_saved=None):
+        if self.current_path is None:
+            return self.save_as(on_saved)
+        self._get_markdown_and_write(self.current_path, on_saved)
+
+    def save_as(self, on_saved=None):
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save Markdown",
+            str(self.current_path or Path.home() / "Untitled.md"),
+            "Markdown (*.md *.markdown);;All files (*)",
+        )
+        if not path:
+            return
+        self.current_path = Path(path)
+        self.titleChanged.emit()
+        self._get_markdown_and_write(self.current_path, on_saved)
+
+    def _large_export_unavailable(self) -> bool:
+        if self.large is None:
+            return False
+        QMessageBox.information(self, "Export", "PDF export is not available for files open in large-file mode.")
+        return True
+
+    def export_html(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Export HTML",
+            str((self.current_path or Path.home() / "Untitled").with_suffix(".html")),
+            "HTML (*.html);;All files (*)",
+        )
+        if not path:
+            return
+        if self.large is not None:
+            self._export_large_html(Path(path))
+            return
+        self.ensure_live()
+        self.page.bridge.request_content("html", self._write_html_cb(Path(path)))
+
+    def _export_large_html(self, path: Path):
+        # Too large for an editor page: markwrite_markdown renders the file (or the edited text) block by block
+        source = self.large.snapshot()[0] if self.large.is_editing else self.large.document.path
+        title = (self.current_path or path).stem
+        task = ExportMarkdownHtmlTask(path, source, title, QApplication.instance().export_stylesheet, self._image_dir)
+        task.signals.failed.connect(
+            lambda msg: QMessageBox.critical(self, "Export failed", f"Could not export:\n{msg}")
+        )
+        self.main_window._start_io(task, f"Exporting {path.name}…")
+
+    def export_pdf(self):
+        if self._large_export_unavailable():
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Export PDF",
+            str((self.current_path or Path.home() / "Untitled").with_suffix(".pdf")),
+            "PDF (*.pdf);;All files (*)",
+        )
+        if not path:
+            return
+        out = Path(path)
+        self.ensure_live()
+        self.page.bridge.request_content("html", lambda html: self._render_pdf(out, html or ""))
+
+    def _render_pdf(self, path: Path, fragment: str):
+        # The same document as HTML export, built on the I/O worker, then printed offscreen
+        app = QApplication.instance()
+        title = (self.current_path or path).stem
+        base_url = app.documents.url(self._image_dir)
+        task = CallableTask(path, lambda: html_document(fragment, title, app.export_stylesheet(), base_url))
+        task.signals.finished.connect(lambda document: app.pdf_scheduler().submit(
+            document, path, partial(self._on_pdf_done, path)
+        ))
+        task.signals.failed.connect(partial(self._on_pdf_done, path))
+        self.main_window.statusBar().showMessage(f"Exporting {path.name}…")
+        self.main_window._start_io(task, f"Exporting {path.name}…")
+
+    def _on_pdf_done(self, path: Path, error: str | None):
+        if error:
+            self.main_window.statusBar().clearMessage()
+            QMessageBox.critical(self, "Export failed", f"Could not export:\n{error}")
+        else:
+            self.main_window.statusBar().showMessage(f"Exported {path.name}", 3000)
+
+    def _get_markdown_and_write(self, path: Path, on_saved=None):
+        if tracing():
+            on_saved = partial(self._trace_saved, path, clock(), on_saved)
+        if self.large is not None:
+            self._write_large(path, on_saved)
+            return
+        if self.page is None:
+            md, _clean = self._snapshot
+            self._carry_images(md, path.parent)
+            self.main_window.saver.save(path, md, lambda: self._on_snapshot_written(md, on_saved))
+            return
+        request_id = self.page.bridge.request_content(
+            "markdown", lambda md: self._write_markdown(path, md, request_id, on_saved)
+        )
+
+    def _write_markdown(self, path: Path, md: str, request_id: int, on_saved=None):
+        md = md or ""
+        self._carry_images(md, path.parent)
+        self.main_window.saver.save(
+            path, md, partial(self._on_page_text_saved, self.page.bridge, request_id, md, on_saved)
+        )
+
+    def _on_page_text_saved(self, bridge: EditorBridge, request_id: int, md: str, on_saved=None):
+        self._disk_text = md
+        bridge.mark_saved(request_id, lambda dirty: self._on_markdown_written(dirty, on_saved))
+
+    def _write_large(self, path: Path, on_saved=None):
+        if not self.large.is_editing:
+            # The preview cannot change anything: saving elsewhere copies the file
+            task = ReadTextTask(self.large.document.path)
+            task.signals.finished.connect(
+                lambda md: self.main_window.saver.save(path, md, lambda: self._on_markdown_written(False, on_saved))
+            )
+            task.signals.failed.connect(
+                lambda msg: QMessageBox.critical(self, "Save failed", f"Could not save:\n{msg}")
+            )
+            self.main_window._start_io(task, f"Saving {path.name}…")
+            return
+        text, token = self.large.snapshot()
+        self.main_window.saver.save(
+            path, text, lambda: self._on_markdown_written(self.large.mark_saved(token), on_saved)
+        )
+
+    def _on_snapshot_written(self, md: str, on_saved=None):
+        self._disk_text = md
+        if self.page is None:
+            self._snapshot = (md, True)
+        # A page restored meanwhile loaded the snapshot as unsaved and stays so
+        self._on_markdown_written(self.page is not None and self._dirty, on_saved)
+
+    def _on_markdown_written(self, dirty: bool, on_saved=None):
+        # Edits made while the save was in flight keep the document dirty
+        self._set_dirty(dirty)
+        if on_saved is not None:
+            on_saved()
+
+    @staticmethod
+    def _trace_saved(path: Path, started: float, on_saved=None):
+        complete("save document", started, "tab", path=str(path))
+        if on_saved is not None:
+            on_saved()
+
+    def _write_html_cb(self, path: Path):
+        def _cb(html):
+            title = (self.current_path or path).stem
+            task = ExportHtmlTask(
+                path, html or "", title, QApplication.instance().export_stylesheet, self._image_dir
+            )
+            task.signals.failed.connect(
+                lambda msg: QMessageBox.critical(self, "Export failed", f"Could not export:\n{msg}")
+            )
+            self.main_window._start_io(task, f"Exporting {path.name}…")
+        return _cb
+
+
+class WorkspacePanel(QDockWidget):
+    """Sidebar for a folder of Markdown files: quick open by name and full-text search.
+
+    The folder's index lives in the user data directory and is updated on its
+    own worker, so indexing never delays opening or saving documents. Queries
+    run on a second worker with a read connection of their own, so they never
+    wait for indexing nor block typing; a newer query stops the one in flight
+    and only the latest one's results are shown.
+    """
+
+    def __init__(self, window: "MainWindow"):
+        super().__init__("Workspace", window)
+        self.setObjectName("workspace")
+        self.window_ = window
+        self.index: WorkspaceIndex | None = None
+        self._io = FileIOQueue()
+        self._task: IndexWorkspaceTask | None = None
+        self._links_task: CheckLinksTask | None = None
+        self._query_io = FileIOQueue()
+        self._reader: IndexReader | None = None
+        self._query_task: WorkspaceQueryTask | None = None
+        self._pending: set[Path] | None = None  # files saved while the index was being updated
+
+        self._query = QLineEdit(self)
+        self._query.setPlaceholderText("Search file names and text")
+        self._query.setClearButtonEnabled(True)
+        self._query.textChanged.connect(lambda _text: self._query_timer.start())
+        self._query.returnPressed.connect(lambda: self._open_item(self._results.currentItem()))
+        self._query_timer = QTimer(self)
+        self._query_timer.setSingleShot(True)
+        self._query_timer.setInterval(WORKSPACE_QUERY_DELAY_MS)
+        self._query_timer.timeout.connect(self._run_query)
+        self._results = QListWidget(self)
+        self._results.setWordWrap(True)
+        self._results.itemActivated.connect(self._open_item)
+        self._status = QLabel(self)
+        self._rescan = QToolButton(self)
+        self._rescan.setText("Rescan")
+        self._rescan.clicked.connect(lambda: self.refresh())
+        self._check = QToolButton(self)
+        self._check.setText("Check Links")
+        self._check.clicked.connect(self.check_links)
+
+        bar = QHBoxLayout()
+        bar.addWidget(self._status, 1)
+        bar.addWidget(self._rescan)
+        bar.addWidget(self._check)
+        body = QWidget(self)
+        layout = QVBoxLayout(body)
+        layout.setContentsMargins(4, 4, 4, 4)
+        layout.addWidget(self._query)
+        layout.addWidget(self._results, 1)
+        layout.addLayout(bar)
+        self.setWidget(body)
+
+    def open_folder(self, root: Path):
+        self.shutdown()
+        root = root.resolve()
+        data_dir = Path(QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation))
+        try:
+            index = WorkspaceIndex(root, index_path(data_dir, root))
+            reader = index.reader()
+        except (OSError, sqlite3.Error) as e:
+            QMessageBox.critical(self, "Open folder failed", f"Could not open the workspace index:\n{e}")
+            return
+        self.index, self._reader = index, reader
+        self.setWindowTitle(root.name or str(root))
+        self.show()
+        self._query.setFocus()
+        self._run_query()
+        self.refresh()
+
+    def refresh(self, paths=None):
+        """Update the index for the whole folder, or just for the given files."""
+        if self.index is None:
+            return
+        if self._task is not None:
+            # One update at a time; what is saved meanwhile is indexed right after
+            if self._pending is not None and paths is not None:
+                self._pending.update(paths)
+            elif paths is None:
+                self._pending = None
+                self._io.cancel(self._task)
+            return
+        self._pending = set()
+        task = IndexWorkspaceTask(self.index, paths)
+        task.signals.progress.connect(lambda done, total: self._status.setText(f"Indexing {done:,} of {total:,}…"))
+        task.signals.finished.connect(partial(self._on_indexed, task))
+        task.signals.failed.connect(partial(self._on_index_failed, task))
+        task.signals.cancelled.connect(partial(self._on_indexed, task, None))
+        self._task = self._io.submit(task)
+
+    def _on_indexed(self, task: IndexWorkspaceTask, stats: UpdateStats | None):
+        if task is not self._task:
+            return
+        self._task = None
+        pending, self._pending = self._pending, None
+        if stats is None and pending is None:
+            self.refresh()  # cancelled for a full rescan
+            return
+        self._status.setText(f"{self.index.file_count():,} files")
+        if stats is not None and stats.indexed + stats.removed:
+            self._run_query()
+        if pending:
+            self.refresh(pending)
+
+    def _on_index_failed(self, task: IndexWorkspaceTask, msg: str):
+        if task is self._task:
+            self._task = None
+            self._pending = None
+            self._status.setText(f"Indexing failed: {msg}")
+
+    def file_saved(self, path: Path):
+        if self.index is not None and path.resolve().is_relative_to(self.index.root) \
+                and path.name.lower().endswith(MARKDOWN_SUFFIXES):
+            self.refresh([path])
+
+    def check_links(self):
+        """Check the links of every file in the folder; the results go to the window's link panel."""
+        if self.index is None or self._links_task is not None:
+            return
+        task = CheckLinksTask(self.index)
+        root = self.index.root
+        task.signals.progress.connect(lambda done, total: self._status.setText(f"Indexing {done:,} of {total:,}…"))
+        task.signals.finished.connect(partial(self._on_links_checked, task, root))
+        task.signals.failed.connect(partial(self._on_links_failed, task))
+        task.signals.cancelled.connect(partial(self._on_links_failed, task, None))
+        self._status.setText("Checking links…")
+        self._links_task = self._io.submit(task)
+
+    def _on_links_checked(self, task: CheckLinksTask, root: Path, broken: list[BrokenLink]):
+        if task is self._links_task:
+            self._links_task = None
+            self._status.setText(f"{self.index.file_count():,} files")
+            self.window_.links.show_results(root, broken)
+
+    def _on_links_failed(self, task: CheckLinksTask, msg: str | None):
+        if task is self._links_task:
+            self._links_task = None
+            self._status.setText(f"Link check failed: {msg}" if msg else "")
+
+    def _run_query(self):
+        self._cancel_query()
+        text = self._query.text().strip()
+        if self.index is None or not text:
+            self._results.clear()
+            return
+        task = WorkspaceQueryTask(self._reader, text)
+        task.signals.finished.connect(partial(self._on_query_results, task))
+        task.signals.failed.connect(partial(self._on_query_failed, task))
+        self._query_task = self._query_io.submit(task)
+
+    def _cancel_query(self):
+        """Drop the query in flight: taken off the queue if waiting, interrupted if running."""
+        if self._query_task is not None:
+            self._query_io.cancel(self._query_task)
+            self._reader.interrupt()
+            self._query_task = None
+
+    def _on_query_results(self, task: WorkspaceQueryTask, results: tuple[list[Path], list[SearchHit]]):
+        if task is not self._query_task:
+            return  # superseded by a newer query
+        self._query_task = None
+        names, hits = results
+        root = self.index.root
+        self._results.clear()
+        for path in names:
+            item = QListWidgetItem(f"{path.name}\n{path.parent.relative_to(root).as_posix()}")
+            item.setData(Qt.ItemDataRole.UserRole, path)
+            self._results.addItem(item)
+        shown = set(names)
+        for hit in hits:
+            if hit.path in shown:
+                continue
+            item = QListWidgetItem(f"{hit.title} — {hit.path.relative_to(root).as_posix()}\n{hit.snippet}")
+            item.setData(Qt.ItemDataRole.UserRole, hit.path)
+            self._results.addItem(item)
+        if self._results.count():
+            self._results.setCurrentRow(0)
+
+    def _on_query_failed(self, task: WorkspaceQueryTask, msg: str):
+        if task is self._query_task:
+            self._query_task = None
+            self._status.setText(f"Search failed: {msg}")
+
+    def _open_item(self, item: QListWidgetItem | None):
+        if item is not None:
+            QApplication.instance().open_path(item.data(Qt.ItemDataRole.UserRole))
+
+    def shutdown(self):
+        """Stop indexing and release the index; waits for the worker to let go of it."""
+        for task in (self._task, self._links_task):
+            if task is not None:
+                self._io.cancel(task)
+        self._task = self._links_task = None
+        self._cancel_query()
+        self._io.wait_for_done()
+        self._query_io.wait_for_done()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+
+class LinkCheckPanel(QDockWidget):
+    """Broken links found by the workspace link check; activating one opens its file."""
+
+    def __init__(self, window: "MainWindow"):
+        super().__init__("Broken Links", window)
+        self.setObjectName("links")
+        self._list = QListWidget(self)
+        self._list.itemActivated.connect(self._open_item)
+        self.setWidget(self._list)
+
+    def show_results(self, root: Path, broken: list[BrokenLink]):
+        self._list.clear()
+        for link in broken:
+            item = QListWidgetItem(
+                f"{link.path.relative_to(root).as_posix()}:{link.line}: {link.target} — {link.reason}"
+            )
+            item.setData(Qt.ItemDataRole.UserRole, link.path)
+            self._list.addItem(item)
+        if not broken:
+            self._list.addItem(QListWidgetItem("No broken links"))
+        self.setWindowTitle(f"Broken Links ({len(broken):,})")
+        self.show()
+        self.raise_()
+
+    def _open_item(self, item: QListWidgetItem):
+        path = item.data(Qt.ItemDataRole.UserRole)
+        if path is not None:
+            QApplication.instance().open_path(path)
+
+
+class OutlinePanel(QDockWidget):
+    """Headings of the current document; clicking one moves the cursor there.
+
+    Tabs report changes of their outline as splices of the heading list (see
+    the outline plugin in editor_offline.html), which are applied row by row.
+    The outline follows the WYSIWYG view, so the pane is disabled while a
+    document is in Markdown mode.
+    """
+
+    headingActivated = Signal(int)  # index in the outline
+
+    def __init__(self, parent: QWidget | None = None):
+        super().__init__("Outline", parent)
+        self.setObjectName("outline")
+        self._list = QListWidget(self)
+        self._list.itemClicked.connect(lambda item: self.headingActivated.emit(self._list.row(item)))
+        self._list.itemActivated.connect(lambda item: self.headingActivated.emit(self._list.row(item)))
+        self.setWidget(self._list)
+
+    def set_outline(self, headings: list[tuple[int, str]], shown: bool = True):
+        """Show headings; without shown (Markdown mode) the pane is cleared and disabled."""
+        self._list.clear()
+        self._list.setEnabled(shown)
+        if not shown:
+            self._list.addItem("No outline in Markdown mode")
+            return
+        for heading in headings:
+            self._list.addItem(self._item(heading))
+
+    def splice(self, start: int, removed: int, headings: list[tuple[int, str]]):
+        if removed < 0:
+            self.set_outline(headings)
+            return
+        self._list.setUpdatesEnabled(False)
+        for _ in range(removed):
+            self._list.takeItem(start)
+        for offset, heading in enumerate(headings):
+            self._list.insertItem(start + offset, self._item(heading))
+        self._list.setUpdatesEnabled(True)
+
+    @staticmethod
+    def _item(heading: tuple[int, str]) -> QListWidgetItem:
+        level, text = heading
+        item = QListWidgetItem("    " * (level - 1) + (text.strip() or "(empty heading)"))
+        if level == 1:
+            font = item.font()
+            font.setBold(True)
+            item.setFont(font)
+        return item
+
+
+class MainWindow(QMainWindow):
+    def __init__(self, page_pool: PagePool):
+        super().__init__()
+        self.setWindowTitle(APP_NAME)
+        self.resize(1100, 800)
+        self.page_pool = page_pool
+        self.io = FileIOQueue()
+        self._progress_task: IOTask | None = None
+        self.saver = SaveEngine(lambda task: self._start_io(task, f"Saving {task.path.name}…"), self)
+        self.saver.saved.connect(self._on_saved)
+        self.saver.failed.connect(
+            lambda _path, msg: QMessageBox.critical(self, "Save failed", f"Could not save:\n{msg}")
+        )
+
+        # Autosave journals of all tabs, written on their own worker
+        data_dir = Path(QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation))
+        self.journals = JournalStore(data_dir / "journal")
+        self.journal_io = FileIOQueue()
+
+        # Central widget: one tab per document
+        self.tabs = QTabWidget(self)
+        self.tabs.setDocumentMode(True)
+        self.tabs.setTabsClosable(True)
+        self.tabs.setMovable(True)
+        self.tabs.currentChanged.connect(self._on_current_tab_changed)
+        self.tabs.tabCloseRequested.connect(lambda index: self.close_tab(self.tabs.widget(index)))
+        self.setCentralWidget(self.tabs)
+        self._shown_tab: DocumentTab | None = None
+
+        # Open files are watched for changes made by other programs
+        self.watcher = DocumentWatcher(self)
+        self.watcher.changed.connect(self._on_file_changed)
+
+        # Folder sidebar with search, shown once a folder is opened
+        self.workspace = WorkspacePanel(self)
+        self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea, self.workspace)
+        self.workspace.hide()
+        self.outline = OutlinePanel(self)
+        self.outline.headingActivated.connect(lambda index: self.current_tab().jump_to_heading(index))
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.outline)
+        self.outline.hide()
+        self.links = LinkCheckPanel(self)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.links)
+        self.links.hide()
+
+        # Background tabs that stay unused are discarded to free their renderer
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setInterval(TAB_IDLE_CHECK_MS)
+        self._idle_timer.timeout.connect(self._discard_idle_tabs)
+        self._idle_timer.start()
+
+        # Menus / actions
+        self._build_actions()
+        self._build_menus()
+        self._connect_shortcuts()
+        self._build_toolbar()
+        self._build_statusbar()
+
+        self.new_tab()
+
+    # -------- UI setup --------
+    def _build_actions(self):
+        self.act_new = QAction("&New", self)
+        self.act_new.setShortcut(QKeySequence.New)
+        self.act_new.triggered.connect(self.file_new)
+
+        self.act_open = QAction("&Open…", self)
+        self.act_open.setShortcut(QKeySequence.Open)
+        self.act_open.triggered.connect(self.file_open)
+
+        self.act_open_folder = QAction("Open &Folder…", self)
+        self.act_open_folder.setShortcut(QKeySequence("Ctrl+Shift+O"))
+        self.act_open_folder.triggered.connect(self.file_open_folder)
+
+        self.act_save = QAction("&Save", self)
+        self.act_save.setShortcut(QKeySequence.Save)
+        self.act_save.triggered.connect(self.file_save)
+
+        self.act_save_as = QAction("Save &As…", self)
+        self.act_save_as.setShortcut(QKeySequence("Ctrl+Shift+S"))
+        self.act_save_as.triggered.connect(self.file_save_as)
+
+        self.act_close_tab = QAction("&Close Tab", self)
+        self.act_close_tab.setShortcut(QKeySequence.Close)
+        self.act_close_tab.triggered.connect(lambda: self.close_tab(self.current_tab()))
+
+        self.act_export_html = QAction("Export as &HTML…", self)
+        self.act_export_html.triggered.connect(self.export_html)
+
+        self.act_export_pdf = QAction("Export as &PDF…", self)
+        self.act_export_pdf.triggered.connect(self.export_pdf)
+
+        # PDF page setup, stored in the application settings
+        self._pdf_size_group = QActionGroup(self)
+        self.act_pdf_sizes = []
+        for key in PAGE_SIZES:
+            act = QAction(key.upper() if key.startswith("a") else key.capitalize(), self, checkable=True)
+            act.setData(key)
+            act.triggered.connect(partial(self._update_pdf_settings, page_size=key))
+            self._pdf_size_group.addAction(act)
+            self.act_pdf_sizes.append(act)
+        self.act_pdf_landscape = QAction("&Landscape", self, checkable=True)
+        self.act_pdf_landscape.triggered.connect(lambda checked: self._update_pdf_settings(landscape=checked))
+        self.act_pdf_margins = QAction("&Margins…", self)
+        self.act_pdf_margins.triggered.connect(self.pdf_margins)
+
+        self.act_quit = QAction("&Quit", self)
+        self.act_quit.setShortcut(QKeySequence.Quit)
+        self.act_quit.triggered.connect(self.close)
+
+        self.act_about = QAction("&About", self)
+        self.act_about.triggered.connect(self.show_about)
+
+        # Zoom actions
+        self.act_zoom_in = QAction("Zoom &In", self)
+        self.act_zoom_in.setShortcut(QKeySequence.ZoomIn)
+        self.act_zoom_in.triggered.connect(self.view_zoom_in)
+
+        self.act_zoom_out = QAction("Zoom &Out", self)
+        self.act_zoom_out.setShortcut(QKeySequence.ZoomOut)
+        self.act_zoom_out.triggered.connect(self.view_zoom_out)
+
+        self.act_zoom_reset = QAction("&Actual Size", self)
+        self.act_zoom_reset.setShortcut(QKeySequence("Ctrl+0"))
+        self.act_zoom_reset.triggered.connect(self.view_zoom_reset)
+
+        self.act_large_threshold = QAction("&Large File Threshold…", self)
+        self.act_large_threshold.triggered.connect(self.large_file_threshold)
+
+        self.act_lean_engine = QAction("Lean &Memory Mode", self)
+        self.act_lean_engine.setCheckable(True)
+        self.act_lean_engine.toggled.connect(self.set_lean_engine)
+
+        # Edit actions
+        self.act_undo = QAction("&Undo", self)
+        self.act_undo.setShortcut(QKeySequence.Undo)
+        self.act_undo.triggered.connect(lambda: self.current_tab().trigger(QWebEnginePage.Undo))
+
+        self.act_redo = QAction("&Redo", self)
+        self.act_redo.setShortcut(QKeySequence.Redo)
+        self.act_redo.triggered.connect(lambda: self.current_tab().trigger(QWebEnginePage.Redo))
+
+        self.act_cut = QAction("Cu&t", self)
+        self.act_cut.setShortcut(QKeySequence.Cut)
+        self.act_cut.triggered.connect(lambda: self.current_tab().trigger(QWebEnginePage.Cut))
+
+        self.act_copy = QAction("&Copy", self)
+        self.act_copy.setShortcut(QKeySequence.Copy)
+        self.act_copy.triggered.connect(lambda: self.current_tab().trigger(QWebEnginePage.Copy))
+
+        self.act_paste = QAction("&Paste", self)
+        self.act_paste.setShortcut(QKeySequence.Paste)
+        self.act_paste.triggered.connect(lambda: self.current_tab().trigger(QWebEnginePage.Paste))
+
+        self.act_select_all = QAction("Select &All", self)
+        self.act_select_all.setShortcut(QKeySequence.SelectAll)
+        self.act_select_all.triggered.connect(lambda: self.current_tab().trigger(QWebEnginePage.SelectAll))
+
+    def _build_menus(self):
+        file_menu = self.menuBar().addMenu("&File")
+        file_menu.addAction(self.act_new)
+        file_menu.addAction(self.act_open)
+        file_menu.addAction(self.act_open_folder)
+        file_menu.addSeparator()
+        file_menu.addAction(self.act_save)
+        file_menu.addAction(self.act_save_as)
+        file_menu.addSeparator()
+        file_menu.addAction(self.act_export_html)
+        file_menu.addAction(self.act_export_pdf)
+        pdf_menu = file_menu.addMenu("PDF Page &Setup")
+        for act in self.act_pdf_sizes:
+            pdf_menu.addAction(act)
+        pdf_menu.addSeparator()
+        pdf_menu.addAction(self.act_pdf_landscape)
+        pdf_menu.addAction(self.act_pdf_margins)
+        pdf_menu.aboutToShow.connect(self._sync_pdf_menu)
+        file_menu.addSeparator()
+        file_menu.addAction(self.act_close_tab)
+        file_menu.addAction(self.act_quit)
+
+        view_menu = self.menuBar().addMenu("&View")
+        view_menu.addAction(self.act_zoom_in)
+        view_menu.addAction(self.act_zoom_out)
+        view_menu.addAction(self.act_zoom_reset)
+        view_menu.addSeparator()
+        view_menu.addAction(self.outline.toggleViewAction())
+        view_menu.addAction(self.workspace.toggleViewAction())
+        view_menu.addAction(self.links.toggleViewAction())
+        view_menu.addAction(self.act_large_threshold)
+        view_menu.addAction(self.act_lean_engine)
+        view_menu.aboutToShow.connect(self._sync_view_menu)
+
+        help_menu = self.menuBar().addMenu("&Help")
+        help_menu.addAction(self.act_about)
+
+        edit_menu = self.menuBar().addMenu("&Edit")
+        edit_menu.addAction(self.act_undo)
+        edit_menu.addAction(self.act_redo)
+        edit_menu.addSeparator()
+        edit_menu.addAction(self.act_cut)
+        edit_menu.addAction(self.act_copy)
+        edit_menu.addAction(self.act_paste)
+        edit_menu.addSeparator()
+        edit_menu.addAction(self.act_select_all)
+
+    def _build_toolbar(self):
+        toolbar = QToolBar("Main Toolbar", self)
+        toolbar.setMovable(False)
+        icon_open = self.style().standardIcon(QStyle.StandardPixmap.SP_DialogOpenButton)
+        icon_save = self.style().standardIcon(QStyle.StandardPixmap.SP_DialogSaveButton)
+        self.act_open.setIcon(icon_open)
+        self.act_save.setIcon(icon_save)
+        self.act_save_as.setIcon(icon_save)
+        toolbar.addAction(self.act_open)
+        toolbar.addAction(self.act_save)
+        toolbar.addAction(self.act_save_as)
+        toolbar.addSeparator()
+        toolbar.addAction(self.act_zoom_in)
+        toolbar.addAction(self.act_zoom_out)
+        toolbar.addAction(self.act_zoom_reset)
+        self.addToolBar(toolbar)
+
+    def _build_statusbar(self):
+        self._io_progress = QProgressBar(self)
+        self._io_progress.setMaximumWidth(200)
+        self._io_progress.setTextVisible(False)
+        self._io_cancel = QToolButton(self)
+        self._io_cancel.setText("Cancel")
+        self._io_cancel.clicked.connect(self._cancel_progress_task)
+        self.statusBar().addPermanentWidget(self._io_progress)
+        self.statusBar().addPermanentWidget(self._io_cancel)
+        self._io_progress.hide()
+        self._io_cancel.hide()
+
+    def show_about(self):
+        """Display a simple About dialog for the application."""
+        QMessageBox.about(
+            self,
+            f"About {APP_NAME}",
+            (
+                f"{APP_NAME} — v{APP_VERSION_FULL}\n\n"
+                "A minimal Markdown editor using Qt WebEngine and Toast UI Editor.\n\n"
+                "Base implementation performed in Cursor with gpt-5-high,\n"
+                "based on idea and requirements by Richie Eiger.\n\n"
+                "Keyboard shortcuts:\n"
+                "- New: Cmd+N\n- Open: Cmd+O\n- Save: Cmd+S\n- Save As: Cmd+Shift+S\n"
+                "- Close Tab: Cmd+W\n"
+            ),
+        )
+
+    def _connect_shortcuts(self):
+        # Extra typical bindings
+        self.addAction(self.act_save)
+        self.addAction(self.act_open)
+
+    # -------- Tabs --------
+    def current_tab(self) -> DocumentTab:
+        return self.tabs.currentWidget()
+
+    def all_tabs(self) -> list[DocumentTab]:
+        return [self.tabs.widget(i) for i in range(self.tabs.count())]
+
+    def new_tab(self) -> DocumentTab:
+        tab = DocumentTab(self)
+        tab.titleChanged.connect(partial(self._sync_tab_title, tab))
+        tab.outlineChanged.connect(partial(self._on_outline_changed, tab))
+        tab.outlineShownChanged.connect(partial(self._on_outline_shown, tab))
+        self.tabs.addTab(tab, tab.title())
+        self.tabs.setCurrentWidget(tab)
+        return tab
+
+    def find_tab(self, path: Path) -> DocumentTab | None:
+        return next((tab for tab in self.all_tabs() if path in (tab.current_path, tab.opening)), None)
+
+    def show_tab(self, tab: DocumentTab):
+        self.tabs.setCurrentWidget(tab)
+        self.raise_()
+        self.activateWindow()
+
+    def open_path(self, path: Path):
+        """Open path in the current tab if that is pristine, else in a new one."""
+        tab = self.current_tab()
+        if tab is None or not tab.is_pristine():
+            tab = self.new_tab()
+        tab.open_path(path)
+        self.show_tab(tab)
+
+    def close_tab(self, tab: DocumentTab | None):
+        if tab is None or not self._confirm_discard_changes([tab], partial(self.close_tab, tab)):
+            return
+        tab.shutdown()
+        self.tabs.removeTab(self.tabs.indexOf(tab))
+        tab.deleteLater()
+        self._sync_watched()
+        if self.tabs.count() == 0:
+            self.close()
+
+    def _on_current_tab_changed(self, _index: int):
+        now = time.monotonic()
+        if self._shown_tab is not None:
+            self._shown_tab.last_active = now
+        tab = self.current_tab()
+        self._shown_tab = tab
+        if tab is None:
+            return
+        tab.last_active = now
+        tab.ensure_live()
+        self.outline.set_outline(tab.outline, tab.outline_shown)
+        self._sync_title()
+        self._enforce_live_tab_limit()
+
+    def _on_outline_changed(self, tab: DocumentTab, start: int, removed: int, headings: list):
+        if tab is self.current_tab():
+            self.outline.splice(start, removed, headings)
+
+    def _on_outline_shown(self, tab: DocumentTab, shown: bool):
+        if tab is self.current_tab():
+            self.outline.set_outline(tab.outline, shown)
+
+    def _enforce_live_tab_limit(self):
+        current = self.current_tab()
+        live = [tab for tab in self.all_tabs() if tab.is_live() and tab is not current]
+        live.sort(key=lambda tab: tab.last_active)
+        limit = QApplication.instance().engine.max_live_tabs or MAX_LIVE_TABS
+        for tab in live[:max(0, len(live) + 1 - limit)]:
+            tab.discard()
+
+    def _discard_idle_tabs(self):
+        cutoff = time.monotonic() - TAB_IDLE_DISCARD_SECONDS
+        current = self.current_tab()
+        for tab in self.all_tabs():
+            if tab is not current and tab.is_live() and tab.last_active < cutoff:
+                tab.discard()
+
+    def _sync_watched(self):
+        self.watcher.set_paths(tab.current_path for tab in self.all_tabs() if tab.current_path is not None)
+
+    def _on_file_changed(self, path: Path):
+        for tab in self.all_tabs():
+            if tab.current_path == path:
+                tab.check_disk()
+
+    def _sync_tab_title(self, tab: DocumentTab):
+        name = tab.title()
+        if tab.dirty:
+            name += " •"
+        index = self.tabs.indexOf(tab)
+        self.tabs.setTabText(index, name)
+        self.tabs.setTabToolTip(index, str(tab.current_path or ""))
+        # Titles change with the path, so this is where new paths get watched
+        self._sync_watched()
+        if tab is self.current_tab():
+            self._sync_title()
+
+    def _sync_title(self):
+        tab = self.current_tab()
+        if tab is None:
+            self.setWindowTitle(APP_NAME)
+            return
+        name = tab.title()
+        if tab.dirty:
+            name += " •"
+        self.setWindowTitle(f"{name} — {APP_NAME}")
+
+    # -------- Crash recovery --------
+    def offer_recovery(self):
+        """Offer to restore unsaved changes journaled by a session that did not exit cleanly."""
+        for entry in self.journals.recoverable():
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.modified))
+            box = QMessageBox(self)
+            box.setIcon(QMessageBox.Icon.Question)
+            box.setWindowTitle("Recover unsaved changes")
+            box.setText(
+                f"MarkWrite did not close properly while “{entry.display_name()}” had unsaved changes "
+                f"(last autosaved {when}).\n\nRestore them?"
+            )
+            restore = box.addButton("Restore", QMessageBox.ButtonRole.AcceptRole)
+            discard = box.addButton("Discard", QMessageBox.ButtonRole.DestructiveRole)
+            box.addButton("Later", QMessageBox.ButtonRole.RejectRole)
+            box.exec()
+            if box.clickedButton() is discard:
+                Journal(entry.path, entry.source).discard()
+            elif box.clickedButton() is restore:
+                tab = self.current_tab()
+                if not tab.is_pristine():
+                    tab = self.new_tab()
+                tab.restore_journal(entry)
+
+    def event(self, event):
+        # Robustly handle macOS Finder "Open With" events at the window level
+        if event.type() == QEvent.FileOpen:
+            try:
+                path = Path(event.file())
+                if path.exists():
+                    QApplication.instance().open_path(path)
+                return True
+            except Exception:
+                return True
+        return super().event(event)
+
+    # -------- Zoom controls --------
+    def view_zoom_in(self):
+        self.current_tab().zoom_by(0.1)
+
+    def view_zoom_out(self):
+        self.current_tab().zoom_by(-0.1)
+
+    def view_zoom_reset(self):
+        self.current_tab().zoom_reset()
+
+    def large_file_threshold(self):
+        mb, ok = QInputDialog.getInt(
+            self, "Large File Threshold",
+            "Open files of at least this size (MB) in the read-only large-file view:",
+            large_file_threshold_mb(), 1, 1 << 16,
+        )
+        if ok:
+            app_settings().setValue("editor/large_file_threshold_mb", mb)
+
+    def set_lean_engine(self, lean: bool):
+        app_settings().setValue(SETTINGS_KEY, (LEAN_PROFILE if lean else DEFAULT_PROFILE).name)
+        if lean != (QApplication.instance().engine is LEAN_PROFILE):
+            self.statusBar().showMessage("Lean memory mode takes effect when MarkWrite is restarted", 5000)
+
+    def _sync_view_menu(self):
+        # Another window may have changed the setting
+        self.act_lean_engine.blockSignals(True)
+        self.act_lean_engine.setChecked(app_settings().value(SETTINGS_KEY) == LEAN_PROFILE.name)
+        self.act_lean_engine.blockSignals(False)
+
+    # -------- Background I/O --------
+    def _start_io(self, task: IOTask, message: str):
+        """Queue a file task and surface its progress in the status bar."""
+        task.signals.progress.connect(lambda done, total: self._on_io_progress(task, message, done, total))
+        task.signals.finished.connect(lambda _result: self._on_io_done(task))
+        task.signals.failed.connect(lambda _msg: self._on_io_done(task))
+        task.signals.cancelled.connect(lambda: self._on_io_done(task, "Cancelled"))
+        self.io.submit(task)
+
+    def _on_io_progress(self, task: IOTask, message: str, done: int, total: int):
+        if total < IO_PROGRESS_MIN_BYTES:
+            return
+        if self._progress_task is not task:
+            self._progress_task = task
+            self._io_progress.setRange(0, 1000)
+            self._io_progress.show()
+            self._io_cancel.show()
+            self.statusBar().showMessage(message)
+        self._io_progress.setValue(int(done * 1000 / total))
+
+    def _on_io_done(self, task: IOTask, message: str = ""):
+        if self._progress_task is not task:
+            return
+        self._progress_task = None
+        self._io_progress.hide()
+        self._io_cancel.hide()
+        if message:
+            self.statusBar().showMessage(message, 3000)
+        else:
+            self.statusBar().clearMessage()
+
+    def _cancel_progress_task(self):
+        if self._progress_task is not None:
+            self.io.cancel(self._progress_task)
+
+    def _on_saved(self, result: SaveResult):
+        self.workspace.file_saved(result.path)
+        if result.skipped:
+            self.statusBar().showMessage(f"{result.path.name} is already up to date", 3000)
+
+    # -------- File ops --------
+    def file_new(self):
+        self.new_tab()
+
+    def file_open(self):
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "Open Markdown", str(Path.home()), "Markdown (*.md *.markdown);;All files (*)"
+        )
+        for path in paths:
+            QApplication.instance().open_path(Path(path))
+
+    def file_open_folder(self):
+        settings = app_settings()
+        start = settings.value("workspace/root", str(Path.home()))
+        root = QFileDialog.getExistingDirectory(self, "Open Folder", start)
+        if root:
+            settings.setValue("workspace/root", root)
+            self.workspace.open_folder(Path(root))
+
+    def file_save(self, on_saved=None):
+        self.current_tab().save(on_saved)
+
+    def file_save_as(self, on_saved=None):
+        self.current_tab().save_as(on_saved)
+
+    def export_html(self):
+        self.current_tab().export_html()
+
+    def export_pdf(self):
+        self.current_tab().export_pdf()
+
+    def _sync_pdf_menu(self):
+        settings = QApplication.instance().pdf_settings()
+        for act in self.act_pdf_sizes:
+            act.setChecked(act.data() == settings.page_size)
+        self.act_pdf_landscape.setChecked(settings.landscape)
+
+    def pdf_margins(self):
+        settings = QApplication.instance().pdf_settings()
+        margins, ok = QInputDialog.getDouble(
+            self, "PDF Margins", "Margins (mm):", settings.margins_mm, 0.0, 100.0, 1
+        )
+        if ok:
+            self._update_pdf_settings(margins_mm=margins)
+
+    def _update_pdf_settings(self, *_checked, **changes):
+        app = QApplication.instance()
+        app.set_pdf_settings(replace(app.pdf_settings(), **changes))
+
+    def closeEvent(self, e):
+        tabs = self.all_tabs()
+        if self._confirm_discard_changes(tabs, self.close):
+            # Let running and coalesced saves reach the disk before the process goes away
+            while self.saver.is_saving():
+                self.io.wait_for_done(50)
+                QApplication.processEvents()
+            self.io.wait_for_done()
+            self.workspace.shutdown()
+            # Closing without saving was confirmed, so the journals have served their purpose
+            for tab in tabs:
+                tab.shutdown()
+            self.journal_io.wait_for_done()
+            e.accept()
+        else:
+            e.ignore()
+
+    def _confirm_discard_changes(self, tabs: list[DocumentTab], then=None):
+        """Return True if the caller may discard the documents of tabs right away.
+
+        Saving is asynchronous: when the user picks "Save", this returns False
+        and `then` is called again once every dirty document has been saved.
+        """
+        dirty = [tab for tab in tabs if tab.dirty]
+        if not dirty:
+            return True
+        if len(dirty) == 1:
+            self.tabs.setCurrentWidget(dirty[0])
+            text = "You have unsaved changes. Save before continuing?"
+        else:
+            text = f"{len(dirty)} documents have unsaved changes. Save them before continuing?"
+        r = QMessageBox.question(
+            self,
+            "Unsaved changes",
+            text,
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel,
+            QMessageBox.StandardButton.Yes,
+        )
+        if r == QMessageBox.StandardButton.Cancel:
+            return False
+        if r == QMessageBox.StandardButton.Yes:
+            remaining = {id(tab) for tab in dirty}
+
+            def saved(tab):
+                remaining.discard(id(tab))
+                if not remaining and then is not None:
+                    then()
+
+            for tab in dirty:
+                tab.save(partial(saved, tab))
+            return False
+        return True
+
+
+class InstanceServer(QObject):
+    """Accepts open requests from later MarkWrite invocations (see markwrite_instance)."""
+
+    openRequested = Signal(list)
+
+    def __init__(self, parent: QObject | None = None):
+        super().__init__(parent)
+        self._server = QLocalServer(self)
+        self._server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self._server.newConnection.connect(self._on_new_connection)
+
+    def listen(self) -> bool:
+        name = server_name()
+        # Probe first: with UserAccessOption, listen() would silently replace the
+        # socket of a live instance instead of failing
+        probe = QLocalSocket()
+        probe.connectToServer(name)
+        if probe.waitForConnected(200):
+            probe.abort()
+            return False
+        # Nobody answers; clear whatever a crashed instance left behind
+        QLocalServer.removeServer(name)
+        return self._server.listen(name)
+
+    def _on_new_connection(self):
+        while self._server.hasPendingConnections():
+            conn = self._server.nextPendingConnection()
+            conn.readyRead.connect(partial(self._on_ready_read, conn))
+            conn.disconnected.connect(conn.deleteLater)
+
+    def _on_ready_read(self, conn: QLocalSocket):
+        if not conn.canReadLine():
+            if conn.bytesAvailable() > MAX_REQUEST_BYTES:
+                conn.abort()
+            return
+        try:
+            paths = decode_request(bytes(conn.readLine()))
+        except ValueError:
+            conn.abort()
+            return
+        conn.write(b"ok\n")
+        conn.flush()
+        conn.disconnectFromServer()
+        self.openRequested.emit(paths)
+
+
+class MarkWriteApp(QApplication):
+    fileOpened = Signal(str)
+
+    def __init__(self, argv, engine: EngineProfile = DEFAULT_PROFILE):
+        super().__init__(argv)
+        # Before anything asks QStandardPaths for a per-application location
+        self.setApplicationName(APP_NAME)
+        self.engine = engine
+        self.windows: list[MainWindow] = []
+        self.assets = load_asset_store()
+        self._export_stylesheet: StyleSheet | None = None
+        self._pdf_scheduler: PdfScheduler | None = None
+        # Images pasted into untitled documents wait here until the document is saved
+        data_dir = Path(QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation))
+        self.unsaved_image_dir = data_dir / "unsaved"
+        self.documents = DocumentDirectories(f"{ASSET_SCHEME.decode()}://{DOCUMENT_HOST}/")
+        # Every tab of every window shares this profile and page pool
+        self.web_profile = create_web_profile(self.assets, self.documents, engine=engine)
+        warm_pages = WARM_PAGE_POOL_SIZE if engine.warm_pages is None else engine.warm_pages
+        self.page_pool = PagePool(self.web_profile, warm_pages, parent=self)
+
+    def new_window(self) -> MainWindow:
+        win = MainWindow(self.page_pool)
+        # Closing a window releases its WebEngine pages instead of keeping them around
+        win.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        win.destroyed.connect(partial(self._forget_window, win))
+        self.windows.append(win)
+        win.show()
+        return win
+
+    def _forget_window(self, win: MainWindow, *_args):
+        if win in self.windows:
+            self.windows.remove(win)
+
+    def export_stylesheet(self) -> StyleSheet | None:
+        """The editor stylesheet prepared for HTML export; parsed on first use, from any thread."""
+        if self._export_stylesheet is None:
+            asset = self.assets.get(EDITOR_STYLESHEET)
+            if asset is not None:
+                self._export_stylesheet = StyleSheet(asset.body().decode("utf-8"))
+        return self._export_stylesheet
+
+    def pdf_settings(self) -> PdfSettings:
+        return PdfSettings.load(app_settings())
+
+    def set_pdf_settings(self, settings: PdfSettings):
+        settings.save(app_settings())
+        if self._pdf_scheduler is not None:
+            self._pdf_scheduler.settings = settings
+
+    def pdf_scheduler(self) -> PdfScheduler:
+        """Renders PDF exports of all windows; created on first use."""
+        if self._pdf_scheduler is None:
+            base_url = f"{ASSET_SCHEME.decode()}://app/"
+            self._pdf_scheduler = PdfScheduler(
+                self.web_profile, self.assets, base_url, self.pdf_settings(), parent=self
+            )
+        return self._pdf_scheduler
+
+    def _target_window(self) -> MainWindow:
+        active = self.activeWindow()
+        if active in self.windows:
+            return active
+        return self.windows[-1] if self.windows else self.new_window()
+
+    def open_path(self, path: Path):
+        """Show path in this process: focus the tab that has it, else open it in a tab."""
+        path = path.resolve()
+        for win in self.windows:
+            tab = win.find_tab(path)
+            if tab is not None:
+                win.show_tab(tab)
+                return
+        self._target_window().open_path(path)
+
+    def open_paths(self, paths: list[Path]):
+        if not paths:
+            win = self._target_window()
+            win.show_tab(win.new_tab())
+            return
+        for path in paths:
+            if path.exists():
+                self.open_path(path)
+
+    def event(self, e):
+        if e.type() == QEvent.FileOpen:
+            try:
+                self.fileOpened.emit(e.file())
+                return True
+            except Exception:
+                return True
+        return super().event(e)
+
+
+def run_gui(args, profile) -> int:
+    """Create the application and main window and run the event loop."""
+    os.environ.setdefault("QT_ENABLE_HIGHDPI_SCALING", "1")
+    os.environ.setdefault("QT_SCALE_FACTOR", "1")
+
+    # Chromium reads its flags once, when WebEngine starts
+    engine = select_engine_profile(args.engine_profile, os.environ, app_settings().value(SETTINGS_KEY))
+    apply_chromium_flags(engine, os.environ)
+
+    register_asset_scheme()
+    app = MarkWriteApp(sys.argv, engine)
+    profile.mark("create QApplication, profile")
+
+    # Later invocations hand their files to this process (see markwrite_instance)
+    if sys.platform != "darwin" and not args.new_instance:
+        instance_server = InstanceServer(app)
+        instance_server.openRequested.connect(app.open_paths)
+        instance_server.listen()
+
+    win = app.new_window()
+    profile.mark("create main window")
+    first_tab = win.current_tab()
+    first_tab.page.bridge.timingsReported.connect(profile.page_timings)
+    first_tab.editorReady.connect(lambda: profile.finish("editor ready"))
+
+    # When Finder sends FileOpen to the application (Open With), open it here too
+    app.fileOpened.connect(lambda path_str: app.open_paths([Path(path_str)]))
+    win.offer_recovery()
+
+    # If launched with file paths (file association / double-click), open them;
+    # each tab's bridge holds the content until its editor is ready
+    candidates = [Path(p) for p in args.paths if Path(p).exists()]
+    if candidates:
+        app.open_paths(candidates)
+
+    return app.exec()
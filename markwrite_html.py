@@ -0,0 +1,255 @@
+"""Standalone HTML documents for export.
+
+The editor hands out a bare HTML fragment. For export it is wrapped in a
+complete document that carries its own styling: the rules of the editor
+stylesheet that can apply to the elements actually used by the fragment,
+inlined into a <style> element. Everything else (the editor UI, toolbar,
+popups, ...) is dropped, so an exported page weighs a few KB of CSS instead
+of the full 165 KB stylesheet and needs no external files.
+
+Which rules survive depends only on the set of tags, classes and ids in the
+fragment, so the pruned CSS is cached per such set.
+
+This module does not import Qt.
+"""
+
+from __future__ import annotations
+
+import html
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+EDITOR_STYLESHEET = "assets/css/toastui-editor.min.css"
+# Bumped whenever the produced document changes for the same input
+DOCUMENT_VERSION = 1
+# Class of the element the editor renders its content into; its rules are scoped to it
+CONTENTS_CLASS = "toastui-editor-contents"
+# Pruned stylesheets kept per element set
+PRUNED_CACHE_SIZE = 64
+
+# Page layout around the content; the editor stylesheet styles the content itself
+_PAGE_CSS = "body{margin:0 auto;max-width:52em;padding:2em 1.5em}"
+# Elements of the document wrapper that rules may refer to
+_WRAPPER = ({"html", "body", "div"}, {CONTENTS_CLASS}, set())
+
+_PSEUDO = re.compile(r"::?[\w-]+(\((?:[^()]|\([^()]*\))*\))?")
+_ATTRIBUTE = re.compile(r"\[[^\]]*\]")
+_TAG = re.compile(r"(?:^|(?<=[\s>+~]))([a-zA-Z][\w-]*)")
+_CLASS = re.compile(r"\.([\w-]+)")
+_ID = re.compile(r"#([\w-]+)")
+
+
+@dataclass(frozen=True)
+class ElementSet:
+    """The tags, classes and ids used by a fragment; the cache key for pruning."""
+
+    tags: frozenset
+    classes: frozenset
+    ids: frozenset
+
+    def __or__(self, other: "ElementSet") -> "ElementSet":
+        return ElementSet(self.tags | other.tags, self.classes | other.classes, self.ids | other.ids)
+
+
+# Start tags and their class and id attributes. A tag inside a comment or script is
+# counted too, which at worst keeps a few rules more than needed.
+_START_TAG = re.compile(r"<([A-Za-z][^\s/>]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>")
+_CLASS_OR_ID = re.compile(r"""(?:^|\s)(class|id)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+))""", re.I)
+
+
+def used_elements(fragment: str) -> ElementSet:
+    tags = set(_WRAPPER[0])
+    classes = set(_WRAPPER[1])
+    ids = set(_WRAPPER[2])
+    for tag, attributes in _START_TAG.findall(fragment):
+        tags.add(tag.lower())
+        if attributes:
+            for name, *quoted in _CLASS_OR_ID.findall(attributes):
+                value = html.unescape("".join(quoted))
+                if name.lower() == "class":
+                    classes.update(value.split())
+                elif value:
+                    ids.add(value)
+    return ElementSet(frozenset(tags), frozenset(classes), frozenset(ids))
+
+
+def _split_top_level(text: str, sep: str) -> list[str]:
+    parts, depth, start, quote = [], 0, 0, None
+    for i, ch in enumerate(text):
+        if quote:
+            if ch == quote and text[i - 1] != "\\":
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        elif ch == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _requirements(selector: str) -> tuple[frozenset, frozenset, frozenset]:
+    """What an element set must contain for selector to possibly match.
+
+    Pseudo-classes (including :not(...)) and attribute selectors are ignored,
+    which can only keep a rule too many, never drop one that applies.
+    """
+    simple = _ATTRIBUTE.sub("", _PSEUDO.sub("", selector)).strip()
+    tags = frozenset(tag.lower() for tag in _TAG.findall(simple))
+    return tags, frozenset(_CLASS.findall(simple)), frozenset(_ID.findall(simple))
+
+
+class _Rule:
+    __slots__ = ("text", "selectors")
+
+    def __init__(self, prelude: str, body: str):
+        self.text = f"{prelude}{{{body}}}"
+        self.selectors = [_requirements(s) for s in _split_top_level(prelude, ",")]
+
+    def applies(self, used: ElementSet) -> bool:
+        return any(
+            tags <= used.tags and classes <= used.classes and ids <= used.ids
+            for tags, classes, ids in self.selectors
+        )
+
+
+class _Block:
+    """An at-rule with nested rules (@media, @supports)."""
+
+    __slots__ = ("prelude", "rules")
+
+    def __init__(self, prelude: str, rules: list):
+        self.prelude = prelude
+        self.rules = rules
+
+
+def _parse(css: str, pos: int = 0) -> tuple[list, int]:
+    """Parse rules from pos up to the matching "}" (or the end); return (rules, end)."""
+    rules: list = []
+    n = len(css)
+    while pos < n:
+        # Skip whitespace and comments between rules
+        while pos < n and css[pos].isspace():
+            pos += 1
+        if css.startswith("/*", pos):
+            end = css.find("*/", pos + 2)
+            pos = n if end < 0 else end + 2
+            continue
+        if pos >= n:
+            break
+        if css[pos] == "}":
+            return rules, pos + 1
+        brace = css.find("{", pos)
+        semicolon = css.find(";", pos)
+        if brace < 0:
+            break
+        if 0 <= semicolon < brace:
+            # Statement at-rule (@charset, @import, ...): keep as is
+            rules.append(css[pos:semicolon + 1])
+            pos = semicolon + 1
+            continue
+        prelude = css[pos:brace].strip()
+        if prelude.startswith(("@media", "@supports")):
+            nested, pos = _parse(css, brace + 1)
+            rules.append(_Block(prelude, nested))
+            continue
+        # Declaration block: find its closing brace, respecting strings
+        i, quote = brace + 1, None
+        while i < n:
+            ch = css[i]
+            if quote:
+                if ch == quote and css[i - 1] != "\\":
+                    quote = None
+            elif ch in "\"'":
+                quote = ch
+            elif ch == "}":
+                break
+            i += 1
+        body = css[brace + 1:i].strip()
+        if prelude.startswith("@"):
+            rules.append(f"{prelude}{{{body}}}")  # @font-face, @keyframes, @page: kept
+        else:
+            rules.append(_Rule(prelude, body))
+        pos = i + 1
+    return rules, pos
+
+
+def _emit(rules: list, used: ElementSet, out: list[str]):
+    for rule in rules:
+        if isinstance(rule, str):
+            out.append(rule)
+        elif isinstance(rule, _Block):
+            inner: list[str] = []
+            _emit(rule.rules, used, inner)
+            if inner:
+                out.append(f"{rule.prelude}{{{''.join(inner)}}}")
+        elif rule.applies(used):
+            out.append(rule.text)
+
+
+class StyleSheet:
+    """A parsed stylesheet that can be cut down to the rules a fragment needs.
+
+    Thread-safe, so one instance can serve every window and worker.
+    """
+
+    def __init__(self, css: str):
+        license_comment = re.match(r"\s*(/\*!.*?\*/)", css, re.S)
+        # License headers (/*! ... */) travel with the rules taken from the file
+        self.header = license_comment.group(1) if license_comment else ""
+        self._rules, _end = _parse(css)
+        self._cache: OrderedDict[ElementSet, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def prune(self, used: ElementSet) -> str:
+        with self._lock:
+            css = self._cache.get(used)
+            if css is not None:
+                self._cache.move_to_end(used)
+                return css
+        out: list[str] = []
+        _emit(self._rules, used, out)
+        css = self.header + "".join(out)
+        with self._lock:
+            self._cache[used] = css
+            while len(self._cache) > PRUNED_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return css
+
+
+def html_document(fragment: str, title: str, stylesheet: StyleSheet | None, base_url: str | None = None) -> str:
+    """Wrap an editor HTML fragment in a complete, self-contained document.
+
+    base_url, if given, is where relative links and images resolve (used when
+    the document is rendered somewhere else than next to its source).
+    """
+    head, tail = document_wrapper(used_elements(fragment), title, stylesheet, base_url)
+    return f"{head}{fragment}{tail}"
+
+
+def document_wrapper(used: ElementSet, title: str, stylesheet: StyleSheet | None,
+                     base_url: str | None = None) -> tuple[str, str]:
+    """The text before and after a fragment using the elements used, as html_document() writes it.
+
+    For fragments written piece by piece: the union of the pieces' elements
+    gives the same document as the whole fragment would.
+    """
+    css = _PAGE_CSS
+    if stylesheet is not None:
+        css += stylesheet.prune(used)
+    base = f'<base href="{html.escape(base_url)}">\n' if base_url else ""
+    head = (
+        "<!DOCTYPE html>\n"
+        '<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+        '<meta name="viewport" content="width=device-width, initial-scale=1">\n'
+        f"{base}<title>{html.escape(title)}</title>\n"
+        f"<style>{css}</style>\n"
+        f'</head>\n<body>\n<div class="{CONTENTS_CLASS}">\n'
+    )
+    return head, "\n</div>\n</body>\n</html>\n"
@@ -0,0 +1,138 @@
+"""Images pasted or dropped into a document, stored as files next to it.
+
+Toast UI embeds such images as base64 data URIs, which makes every load and
+save of the document carry the screenshots along. Instead, each image is
+written once to an ``assets`` folder beside the document, named after a hash
+of its bytes, and the Markdown refers to it by relative path. Pasting the same
+image twice stores it once, and the document text stays as small as its text.
+
+Untitled documents keep their images in a shared folder of the user data
+directory. Saving or exporting a document to another directory copies the
+images it refers to into the assets folder there.
+
+The editor shows images through markwrite://doc/<token>/..., where each token
+stands for one document directory (see DocumentDirectories); large images are
+served downscaled (see thumbnail()). Only thumbnail() needs Qt, and imports it
+itself, so exporters that run without Qt can copy images too.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from pathlib import Path
+
+from markwrite_files import atomic_write_bytes
+
+# Folder next to the document that holds its images
+IMAGE_DIR = "assets"
+# Images larger than this (in either direction) are downscaled for display
+THUMBNAIL_MAX_PX = 1600
+
+IMAGE_TYPES = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/svg+xml": ".svg",
+}
+_SUFFIX_TYPES = {suffix: mime for mime, suffix in IMAGE_TYPES.items()} | {".jpeg": "image/jpeg"}
+# Only stored (content-addressed) images are carried along; other references are left alone
+_REFERENCE = re.compile(
+    rf"(?<![\w/.-])(?:\./)?{IMAGE_DIR}/([0-9a-f]{{32}}(?:{'|'.join(re.escape(s) for s in IMAGE_TYPES.values())}))"
+)
+
+
+def image_mime(path: Path) -> str | None:
+    return _SUFFIX_TYPES.get(Path(path).suffix.lower())
+
+
+def store_image(directory: Path, data: bytes, mime: str) -> str:
+    """Write data to directory/assets unless it is there already; return its relative path."""
+    suffix = IMAGE_TYPES.get(mime.lower())
+    if suffix is None:
+        raise ValueError(f"unsupported image type: {mime or 'unknown'}")
+    name = hashlib.blake2b(data, digest_size=16).hexdigest() + suffix
+    target = Path(directory) / IMAGE_DIR / name
+    if not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(target, data)
+    return f"{IMAGE_DIR}/{name}"
+
+
+def referenced_images(text: str) -> set[str]:
+    """File names of stored images that Markdown or HTML text refers to."""
+    return set(_REFERENCE.findall(text))
+
+
+def copy_images(text: str, source_dir: Path, target_dir: Path) -> int:
+    """Copy the stored images text refers to from source_dir to target_dir; return the count."""
+    source, target = Path(source_dir) / IMAGE_DIR, Path(target_dir) / IMAGE_DIR
+    if source.resolve() == target.resolve():
+        return 0
+    copied = 0
+    for name in sorted(referenced_images(text)):
+        src, dst = source / name, target / name
+        # Content-addressed: a file of that name already has those bytes
+        if dst.exists() or not src.is_file():
+            continue
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(dst, src.read_bytes())
+        copied += 1
+    return copied
+
+
+def thumbnail(path: Path, max_px: int = THUMBNAIL_MAX_PX) -> tuple[bytes, str]:
+    """The image at path for display: (data, mime), downscaled if it is large.
+
+    Vector and animated images, and anything Qt cannot decode, are returned as is.
+    """
+    from PySide6.QtCore import QBuffer, QByteArray, QIODevice, Qt
+    from PySide6.QtGui import QImage
+
+    data = Path(path).read_bytes()
+    mime = image_mime(path) or "application/octet-stream"
+    if mime in ("image/svg+xml", "image/gif"):
+        return data, mime
+    image = QImage.fromData(data)
+    if image.isNull() or max(image.width(), image.height()) <= max_px:
+        return data, mime
+    scaled = image.scaled(max_px, max_px, Qt.AspectRatioMode.KeepAspectRatio,
+                          Qt.TransformationMode.SmoothTransformation)
+    out = QByteArray()
+    buffer = QBuffer(out)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    # Photos stay JPEG; everything else (screenshots, transparency) becomes PNG
+    fmt, mime = ("JPEG", "image/jpeg") if mime == "image/jpeg" else ("PNG", "image/png")
+    scaled.save(buffer, fmt, 90 if fmt == "JPEG" else -1)
+    buffer.close()
+    return bytes(out), mime
+
+
+class DocumentDirectories:
+    """The document directories the editor may load images from, by URL token.
+
+    Only image files below a registered directory are ever resolved.
+    """
+
+    def __init__(self, url_prefix: str):
+        self.url_prefix = url_prefix
+        self._directories: dict[str, Path] = {}
+
+    def url(self, directory: Path) -> str:
+        """Base URL under which relative image paths of documents in directory resolve."""
+        directory = Path(directory).resolve()
+        token = hashlib.blake2b(str(directory).encode("utf-8"), digest_size=8).hexdigest()
+        self._directories[token] = directory
+        return f"{self.url_prefix}{token}/"
+
+    def resolve(self, url_path: str) -> Path | None:
+        """The image file for the path of a markwrite://doc/ URL, or None."""
+        token, _sep, relative = url_path.lstrip("/").partition("/")
+        directory = self._directories.get(token)
+        if directory is None or not relative:
+            return None
+        path = (directory / relative).resolve()
+        if not path.is_relative_to(directory) or image_mime(path) is None or not path.is_file():
+            return None
+        return path
@@ -0,0 +1,78 @@
+"""Client side of MarkWrite's single-instance mode.
+
+A running MarkWrite listens on a per-user local socket (a QLocalServer, see
+InstanceServer in markwrite_gui.py). A second invocation hands its paths over
+that socket and exits instead of starting another QtWebEngine process tree.
+This side deliberately uses only the standard library so that forwarding
+never pays for importing Qt.
+
+Protocol: the client sends one JSON line {"open": [absolute paths]}; the
+server answers "ok" once it has taken the request. Anything else that arrives
+on the socket is rejected and the connection dropped.
+"""
+
+from __future__ import annotations
+
+import getpass
+import json
+import os
+import socket
+import sys
+import tempfile
+from pathlib import Path
+
+CONNECT_TIMEOUT_SECONDS = 2.0
+# A request line longer than this is not from MarkWrite; the server drops it
+MAX_REQUEST_BYTES = 1 << 20
+
+
+def server_name() -> str:
+    """The name to pass to QLocalServer.listen().
+
+    On Unix this is the full socket path (in the private runtime directory when
+    available); on Windows it is the name of a named pipe.
+    """
+    if sys.platform == "win32":
+        return f"markwrite-{getpass.getuser()}"
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"markwrite-{os.getuid()}.sock")
+
+
+def encode_request(paths: list[Path]) -> bytes:
+    return (json.dumps({"open": [str(p) for p in paths]}) + "\n").encode("utf-8")
+
+
+def decode_request(line: bytes) -> list[Path]:
+    """The paths of a request line; ValueError for anything that is not a request."""
+    message = json.loads(line)
+    paths = message.get("open", []) if isinstance(message, dict) else None
+    if not isinstance(paths, list) or not all(isinstance(p, str) and p for p in paths):
+        raise ValueError("not an open request")
+    return [Path(p) for p in paths]
+
+
+def _send_unix(message: bytes) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(CONNECT_TIMEOUT_SECONDS)
+        sock.connect(server_name())
+        sock.sendall(message)
+        return sock.recv(16).startswith(b"ok")
+
+
+def _send_windows(message: bytes) -> bool:
+    # A pipe opened as a file has no read timeout, so do not wait for the
+    # answer here: a successful write means the server has the request.
+    with open(rf"\\.\pipe\{server_name()}", "r+b", buffering=0) as pipe:
+        pipe.write(message)
+    return True
+
+
+def send_to_running_instance(paths: list[Path]) -> bool:
+    """Ask a running MarkWrite to open paths; False if there is none to ask."""
+    message = encode_request([p.resolve() for p in paths])
+    try:
+        if sys.platform == "win32":
+            return _send_windows(message)
+        return _send_unix(message)
+    except OSError:
+        return False
@@ -0,0 +1,270 @@
+"""Background file I/O for MarkWrite.
+
+Reads and writes run on a dedicated worker thread so that slow disks and
+network shares never block the GUI thread (repaint, WebEngine input, ...).
+Every task reports back through Qt signals; because the signal object is
+created on the GUI thread, the connected slots run there as well.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from markwrite_files import IO_CHUNK_SIZE, FileState, atomic_write_bytes, content_digest
+from markwrite_trace import span
+
+
+class IOCancelled(Exception):
+    """Raised inside a task when cancellation has been requested."""
+
+
+def _file_state(path: Path, digest: str) -> FileState:
+    st = os.stat(path)
+    return FileState(digest, st.st_size, st.st_mtime_ns)
+
+
+class IOTaskSignals(QObject):
+    progress = Signal(int, int)  # bytes done, bytes total
+    finished = Signal(object)  # task result
+    failed = Signal(str)  # error message
+    cancelled = Signal()
+
+
+class IOTask(QRunnable):
+    """Base class for a file operation executed on the I/O worker thread."""
+
+    def __init__(self, path: Path):
+        super().__init__()
+        self.path = path
+        self.signals = IOTaskSignals()
+        self._cancel_requested = threading.Event()
+
+    def cancel(self):
+        self._cancel_requested.set()
+
+    def _check_cancelled(self):
+        if self._cancel_requested.is_set():
+            raise IOCancelled()
+
+    def work(self):
+        raise NotImplementedError
+
+    def run(self):
+        try:
+            with span(type(self).__name__, "io", path=str(self.path)):
+                result = self.work()
+        except IOCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+
+class ReadTextTask(IOTask):
+    """Read and decode a text file. Cancellable between chunks.
+
+    After a successful read, `state` describes the bytes that were read.
+    """
+
+    def __init__(self, path: Path, encoding: str = "utf-8"):
+        super().__init__(path)
+        self.encoding = encoding
+        self.state: FileState | None = None
+
+    def work(self) -> str:
+        data = bytearray()
+        with open(self.path, "rb") as fh:
+            st = os.fstat(fh.fileno())
+            total = st.st_size
+            while True:
+                self._check_cancelled()
+                chunk = fh.read(IO_CHUNK_SIZE)
+                if not chunk:
+                    break
+                data += chunk
+                self.signals.progress.emit(len(data), total)
+        self._check_cancelled()
+        text = data.decode(self.encoding)
+        self.state = FileState(content_digest(data), st.st_size, st.st_mtime_ns)
+        return text
+
+
+class WriteTextTask(IOTask):
+    """Encode text and write it to disk atomically (see atomic_write_bytes).
+
+    Cancellable between chunks; a cancelled write leaves the target untouched.
+    """
+
+    def __init__(self, path: Path, text: str, encoding: str = "utf-8"):
+        super().__init__(path)
+        self.text = text
+        self.encoding = encoding
+
+    def _write(self, data: bytes):
+        atomic_write_bytes(self.path, data, self.signals.progress.emit, self._check_cancelled)
+
+    def work(self) -> int:
+        self._check_cancelled()
+        data = self.text.encode(self.encoding)
+        self._write(data)
+        return len(data)
+
+
+class CallableTask(IOTask):
+    """Run fn(*args) on the I/O worker; its return value is the task result."""
+
+    def __init__(self, path: Path | None, fn, *args):
+        super().__init__(path)
+        self.fn = fn
+        self.args = args
+
+    def work(self):
+        self._check_cancelled()
+        return self.fn(*self.args)
+
+
+@dataclass(frozen=True)
+class SaveResult:
+    path: Path
+    state: FileState
+    skipped: bool
+
+
+class SaveTask(WriteTextTask):
+    """Atomic write that is skipped when the content is already on disk.
+
+    `previous` is the state of our last read/write of this path. If the new
+    content hashes the same and the file has not been touched since, nothing
+    is written at all, so file watchers and sync clients see no change.
+    """
+
+    def __init__(self, path: Path, text: str, previous: FileState | None, encoding: str = "utf-8"):
+        super().__init__(path, text, encoding)
+        self.previous = previous
+
+    def work(self) -> SaveResult:
+        self._check_cancelled()
+        data = self.text.encode(self.encoding)
+        digest = content_digest(data)
+        previous = self.previous
+        if previous is not None and previous.digest == digest and previous.matches_disk(self.path):
+            return SaveResult(self.path, previous, skipped=True)
+        self._write(data)
+        return SaveResult(self.path, _file_state(self.path, digest), skipped=False)
+
+
+class SaveEngine(QObject):
+    """Saves documents atomically, skipping no-op writes and coalescing bursts.
+
+    While a save of a path is in flight, further requests for that path only
+    replace the pending text; when the running save finishes, the latest
+    pending text is saved once. Callbacks of every coalesced request run when
+    the save that covers them completes.
+    """
+
+    saved = Signal(object)  # SaveResult
+    failed = Signal(object, str)  # path, error message
+
+    def __init__(self, submit, parent: QObject | None = None):
+        super().__init__(parent)
+        self._submit = submit
+        self._states: dict[Path, FileState] = {}
+        self._in_flight: dict[Path, list] = {}
+        self._pending: dict[Path, tuple[str, list]] = {}
+
+    def remember(self, path: Path, state: FileState | None):
+        """Record what is on disk for path, e.g. after it has been read."""
+        if state is None:
+            self._states.pop(path, None)
+        else:
+            self._states[path] = state
+
+    def state(self, path: Path) -> FileState | None:
+        return self._states.get(path)
+
+    def is_saving(self, path: Path | None = None) -> bool:
+        """Whether a save (of path, if given) is in flight."""
+        if path is not None:
+            return path in self._in_flight
+        return bool(self._in_flight)
+
+    def save(self, path: Path, text: str, on_saved=None):
+        callbacks = [on_saved] if on_saved is not None else []
+        if path in self._in_flight:
+            _old_text, waiting = self._pending.get(path, ("", []))
+            self._pending[path] = (text, waiting + callbacks)
+            return
+        self._start(path, text, callbacks)
+
+    def _start(self, path: Path, text: str, callbacks: list):
+        task = SaveTask(path, text, self._states.get(path))
+        self._in_flight[path] = callbacks
+        task.signals.finished.connect(self._on_finished)
+        task.signals.failed.connect(lambda msg: self._on_failed(path, msg))
+        task.signals.cancelled.connect(lambda: self._on_cancelled(path))
+        self._submit(task)
+
+    def _start_pending(self, path: Path):
+        pending = self._pending.pop(path, None)
+        if pending is not None:
+            self._start(path, *pending)
+
+    def _on_finished(self, result: SaveResult):
+        callbacks = self._in_flight.pop(result.path, [])
+        self._states[result.path] = result.state
+        self.saved.emit(result)
+        for callback in callbacks:
+            callback()
+        self._start_pending(result.path)
+
+    def _on_failed(self, path: Path, message: str):
+        self._in_flight.pop(path, None)
+        self.failed.emit(path, message)
+        self._start_pending(path)
+
+    def _on_cancelled(self, path: Path):
+        self._in_flight.pop(path, None)
+        self._start_pending(path)
+
+
+class FileIOQueue:
+    """Runs IOTasks one at a time, in submission order, off the GUI thread.
+
+    A single worker keeps writes to the same file strictly ordered while the
+    GUI thread stays free.
+    """
+
+    def __init__(self):
+        self._pool = QThreadPool()
+        self._pool.setMaxThreadCount(1)
+        # Keep Python references alive until the task has reported back
+        self._active: set[IOTask] = set()
+
+    def submit(self, task: IOTask) -> IOTask:
+        self._active.add(task)
+        def done(*_args):
+            self._active.discard(task)
+
+        task.signals.finished.connect(done)
+        task.signals.failed.connect(done)
+        task.signals.cancelled.connect(done)
+        self._pool.start(task)
+        return task
+
+    def cancel(self, task: IOTask):
+        task.cancel()
+        # A task that has not started yet is dropped from the queue right away
+        if self._pool.tryTake(task):
+            task.signals.cancelled.emit()
+
+    def is_busy(self) -> bool:
+        return bool(self._active)
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
@@ -0,0 +1,272 @@
+"""Crash-safe autosave journal for MarkWrite.
+
+Each open document with unsaved changes gets a journal file in the user's
+data directory. A journal is a sequence of JSON lines: a header, a full-text
+checkpoint and then only the edits made since, as "replace this range with
+that text" deltas. Appends are fsync'ed; a torn last line from a crash is
+ignored on replay. Once the deltas outgrow the checkpoint, the journal is
+compacted into a fresh checkpoint, and the store as a whole is kept under a
+size and age limit by evicting the oldest journals.
+
+Delta offsets are UTF-16 code units, the unit JavaScript strings (and thus
+the editor) use, so the editor can compute deltas without any conversion.
+
+The header names the writing process by PID and start time: a journal is
+offered for recovery once that process is gone, even if its PID has since
+been reused by another one.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from markwrite_files import atomic_write_bytes
+
+JOURNAL_VERSION = 1
+JOURNAL_SUFFIX = ".mwjournal"
+# Compact once the deltas take more room than this or than the checkpoint
+COMPACT_MIN_BYTES = 256 << 10
+# Upper bound for all journals together, and for how long a journal is kept
+MAX_STORE_BYTES = 512 << 20
+MAX_JOURNAL_AGE_SECONDS = 30 * 24 * 3600
+
+_UTF16 = "utf-16-le"
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    if sys.platform == "win32":
+        import ctypes
+
+        synchronize = 0x00100000
+        handle = ctypes.windll.kernel32.OpenProcess(synchronize, False, pid)
+        if not handle:
+            return False
+        try:
+            # WAIT_TIMEOUT (0x102) means the process is still running
+            return ctypes.windll.kernel32.WaitForSingleObject(handle, 0) == 0x102
+        finally:
+            ctypes.windll.kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _process_started(pid: int) -> int | None:
+    """When a process started, in the platform's own units, or None where that cannot be read."""
+    if pid <= 0:
+        return None
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        query_limited_information = 0x1000
+        handle = ctypes.windll.kernel32.OpenProcess(query_limited_information, False, pid)
+        if not handle:
+            return None
+        try:
+            created, exited, kernel, user = (wintypes.FILETIME() for _ in range(4))
+            if not ctypes.windll.kernel32.GetProcessTimes(
+                handle, ctypes.byref(created), ctypes.byref(exited), ctypes.byref(kernel), ctypes.byref(user)
+            ):
+                return None
+            return created.dwHighDateTime << 32 | created.dwLowDateTime
+        finally:
+            ctypes.windll.kernel32.CloseHandle(handle)
+    if sys.platform == "darwin":
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"))
+        # sysctl(CTL_KERN, KERN_PROC, KERN_PROC_PID): a kinfo_proc starting with p_starttime
+        mib = (ctypes.c_int * 4)(1, 14, 1, pid)
+        buffer = ctypes.create_string_buffer(1024)
+        size = ctypes.c_size_t(len(buffer))
+        if libc.sysctl(mib, 4, buffer, ctypes.byref(size), None, 0) != 0 or size.value < 12:
+            return None
+        seconds, microseconds = struct.unpack_from("=qi", buffer.raw)
+        return seconds * 1_000_000 + microseconds
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as fh:
+            stat = fh.read()
+    except OSError:
+        return None
+    # starttime is field 22; the command name (field 2) may hold spaces and ")"
+    try:
+        return int(stat[stat.rindex(b")") + 2:].split()[19])
+    except (ValueError, IndexError):
+        return None
+
+
+def _owner_running(header: dict) -> bool:
+    """Whether the process that wrote a journal header is still running."""
+    pid = header.get("pid", 0)
+    if not isinstance(pid, int) or not _pid_alive(pid):
+        return False
+    started = header.get("started")
+    if started is None:
+        return True  # written where start times cannot be read
+    # A different start time means the PID now belongs to another process
+    return _process_started(pid) in (started, None)
+
+
+
+def _record(obj: dict) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _read_records(path: Path):
+    """Yield the decodable records of a journal; a torn tail is skipped."""
+    with open(path, "rb") as fh:
+        for line in fh:
+            if not line.endswith(b"\n"):
+                return
+            try:
+                yield json.loads(line)
+            except ValueError:
+                return
+
+
+def replay(path: Path) -> tuple[dict, str]:
+    """Return (header, text) reconstructed from a journal file."""
+    header: dict = {}
+    doc = bytearray()
+    for rec in _read_records(path):
+        op = rec.get("op")
+        if op == "header":
+            header = rec
+        elif op == "checkpoint":
+            doc = bytearray(rec["text"].encode(_UTF16, "surrogatepass"))
+        elif op == "replace":
+            doc[rec["start"] * 2:rec["end"] * 2] = rec["text"].encode(_UTF16, "surrogatepass")
+    return header, doc.decode(_UTF16, "surrogatepass")
+
+
+class Journal:
+    """Append-only delta journal of a single document.
+
+    Not thread-safe: after creation, use it from one (worker) thread only.
+    """
+
+    def __init__(self, path: Path, source: Path | None):
+        self.path = path
+        self.source = source
+        self._size = 0
+        self._checkpoint_size = 0
+
+    def _header(self) -> dict:
+        return {
+            "op": "header",
+            "v": JOURNAL_VERSION,
+            "pid": os.getpid(),
+            "started": _process_started(os.getpid()),
+            "source": str(self.source) if self.source else None,
+            "created": time.time(),
+        }
+
+    def write_checkpoint(self, text: str):
+        """Atomically replace the journal with a header and a full-text checkpoint."""
+        data = _record(self._header()) + _record({"op": "checkpoint", "text": text})
+        atomic_write_bytes(self.path, data)
+        self._size = len(data)
+        self._checkpoint_size = len(data)
+
+    def append_replace(self, start: int, end: int, text: str):
+        data = _record({"op": "replace", "start": start, "end": end, "text": text})
+        with open(self.path, "ab") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        self._size += len(data)
+
+    def needs_compaction(self) -> bool:
+        deltas = self._size - self._checkpoint_size
+        return deltas > max(COMPACT_MIN_BYTES, self._checkpoint_size)
+
+    def compact(self):
+        _header, text = replay(self.path)
+        self.write_checkpoint(text)
+
+    def discard(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+@dataclass(frozen=True)
+class RecoveryEntry:
+    path: Path
+    source: Path | None
+    modified: float
+
+    def display_name(self) -> str:
+        return self.source.name if self.source else "Untitled"
+
+
+class JournalStore:
+    """The directory holding the journals of all documents."""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def create(self, source: Path | None) -> Journal:
+        self.root.mkdir(parents=True, exist_ok=True)
+        name = f"{uuid.uuid4().hex}{JOURNAL_SUFFIX}"
+        return Journal(self.root / name, source)
+
+    def _journal_files(self) -> list[Path]:
+        if not self.root.is_dir():
+            return []
+        return [p for p in self.root.iterdir() if p.suffix == JOURNAL_SUFFIX]
+
+    def recoverable(self) -> list[RecoveryEntry]:
+        """Journals left behind by MarkWrite processes that are no longer running."""
+        entries = []
+        for path in self._journal_files():
+            try:
+                header = next(_read_records(path), {})
+                modified = path.stat().st_mtime
+            except (OSError, ValueError):
+                continue
+            if header.get("op") != "header" or _owner_running(header):
+                continue
+            source = header.get("source")
+            entries.append(RecoveryEntry(path, Path(source) if source else None, modified))
+        entries.sort(key=lambda entry: entry.modified, reverse=True)
+        return entries
+
+    def enforce_limits(self, keep: set[Path] = frozenset()):
+        """Evict expired journals, then the oldest ones until the store fits its budget."""
+        now = time.time()
+        files = []
+        for path in self._journal_files():
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        files.sort()
+        total = sum(size for _mtime, size, _path in files)
+        for mtime, size, path in files:
+            if path in keep:
+                continue
+            if total <= MAX_STORE_BYTES and now - mtime <= MAX_JOURNAL_AGE_SECONDS:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,128 @@
+"""Large-file mode: memory-mapped Markdown read in sections.
+
+Files above a size threshold are not pushed into the WYSIWYG editor, which
+becomes unusable with a few MB of content and can take the renderer down with
+tens of MB. Instead the file is memory-mapped and shown section by section:
+only the part the user has scrolled to is ever decoded and rendered, so a
+100 MB report opens as fast as a small one.
+
+Sections end at a blank line outside fenced code blocks, so each one can be
+rendered as Markdown on its own.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import re
+from pathlib import Path
+
+from markwrite_io import IO_CHUNK_SIZE, FileState, ReadTextTask
+
+# Files at least this large open in large-file mode (configurable in the GUI)
+LARGE_FILE_THRESHOLD_BYTES = 8 << 20
+# Approximate size of one rendered section
+SECTION_BYTES = 256 << 10
+# A section without a usable blank line is cut at a line end after this much
+MAX_SECTION_BYTES = 4 * SECTION_BYTES
+
+_FENCE = re.compile(rb"^ {0,3}(?:`{3,}|~{3,})", re.M)
+
+
+class MappedDocument:
+    """A read-only memory map of a Markdown file, read in sections."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        try:
+            st = os.fstat(self._file.fileno())
+            self.size = st.st_size
+            self.mtime_ns = st.st_mtime_ns
+            # Empty files cannot be mapped
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        except BaseException:
+            self._file.close()
+            raise
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._map = b""
+        self._file.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def state(self, progress=None) -> FileState:
+        """Hash the mapped file; run on a worker, it touches every page."""
+        # Same digest as content_digest() of the whole file, without a copy of it
+        digest = hashlib.blake2b(digest_size=16)
+        for start in range(0, self.size, IO_CHUNK_SIZE):
+            digest.update(self._map[start:start + IO_CHUNK_SIZE])
+            if progress is not None:
+                progress(min(start + IO_CHUNK_SIZE, self.size), self.size)
+        return FileState(digest.hexdigest(), self.size, self.mtime_ns)
+
+    def section_end(self, start: int) -> int:
+        """Where the section starting at start ends (exclusive)."""
+        data, size = self._map, self.size
+        if size - start <= SECTION_BYTES:
+            return size
+        # Finish the line crossing the target size, then look for a blank line.
+        # Every counted range starts and ends at a line start.
+        pos = data.find(b"\n", start + SECTION_BYTES - 1)
+        if pos < 0:
+            return size
+        pos += 1
+        fences = len(_FENCE.findall(data, start, pos))
+        limit = min(size, start + MAX_SECTION_BYTES)
+        while pos < limit:
+            blank = data.find(b"\n\n", pos - 1, limit)
+            if blank < 0:
+                break
+            end = blank + 2
+            fences += len(_FENCE.findall(data, pos, end))
+            # An even number of fence lines means the cut is outside a code block
+            if fences % 2 == 0:
+                return end
+            pos = end
+        newline = data.find(b"\n", max(pos, limit) - 1)
+        return size if newline < 0 else newline + 1
+
+    def read_section(self, start: int) -> tuple[str, int]:
+        """Decode the section starting at start; return (text, end)."""
+        if os.fstat(self._file.fileno()).st_size < self.size:
+            # Reading past the new end of a mapping would crash the process
+            raise OSError(f"{self.path.name} was truncated on disk")
+        end = self.section_end(start)
+        return self._map[start:end].decode("utf-8", errors="replace"), end
+
+
+def open_mapped(path: Path, progress=None) -> tuple[MappedDocument, FileState]:
+    """Map path and hash it; meant to run on the I/O worker."""
+    document = MappedDocument(path)
+    try:
+        return document, document.state(progress)
+    except BaseException:
+        document.close()
+        raise
+
+
+class OpenDocumentTask(ReadTextTask):
+    """Read a file as text, or map it if it has at least threshold bytes.
+
+    The result is the text or a MappedDocument; `state` is set either way.
+    """
+
+    def __init__(self, path: Path, threshold: int = LARGE_FILE_THRESHOLD_BYTES, encoding: str = "utf-8"):
+        super().__init__(path, encoding)
+        self.threshold = threshold
+
+    def work(self):
+        if os.stat(self.path).st_size < self.threshold:
+            return super().work()
+        document, self.state = open_mapped(self.path, self.signals.progress.emit)
+        return document
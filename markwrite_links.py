@@ -0,0 +1,135 @@
+"""Checking relative links and heading anchors: `markwrite check-links`.
+
+Links are taken from the workspace index (see markwrite_workspace), so a
+check first brings the index up to date, which parses only new and changed
+files (in worker processes when there are many), and then resolves every
+link against the indexed files and their anchors in memory. Links to other
+kinds of files are checked for existence; links with a scheme (https:,
+mailto:, ...) are not checked.
+
+The command line and the Workspace panel's "Check Links" share one index per
+folder, kept in the user data directory.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import posixpath
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import unquote
+
+from markwrite_workspace import WorkspaceIndex, index_path
+
+_SCHEME = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+
+
+@dataclass(frozen=True)
+class BrokenLink:
+    path: Path
+    line: int
+    target: str
+    reason: str
+
+
+def check_links(index: WorkspaceIndex) -> list[BrokenLink]:
+    """Broken relative links of the indexed files, by file and line."""
+    conn = index.connect()
+    try:
+        files = dict(conn.execute("SELECT path, id FROM files"))
+        anchors: dict[int, set[str]] = {}
+        for file_id, anchor in conn.execute("SELECT file_id, anchor FROM anchors"):
+            anchors.setdefault(file_id, set()).add(anchor.lower())
+        links = conn.execute(
+            "SELECT files.path, links.target, links.line FROM links JOIN files ON files.id = links.file_id "
+            "ORDER BY files.path, links.line"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    exists: dict[str, bool] = {}
+
+    def on_disk(relative: str) -> bool:
+        if relative not in exists:
+            exists[relative] = os.path.exists(index.root / relative)
+        return exists[relative]
+
+    broken = []
+    for source, target, line in links:
+        reason = _check(source, target, files, anchors, on_disk)
+        if reason is not None:
+            broken.append(BrokenLink(index.root / source, line, target, reason))
+    return broken
+
+
+def _check(source: str, target: str, files: dict[str, int], anchors: dict[int, set[str]], on_disk) -> str | None:
+    if _SCHEME.match(target) or target.startswith("//"):
+        return None
+    target_path, _sep, fragment = target.partition("#")
+    target_path = unquote(target_path.partition("?")[0])
+    if not target_path:
+        resolved = source
+    elif target_path.startswith("/"):
+        resolved = posixpath.normpath(target_path.lstrip("/"))
+    else:
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(source), target_path))
+    file_id = files.get(resolved)
+    if file_id is None:
+        # Not an indexed Markdown file: an image, a directory, a hidden file...
+        return None if on_disk(resolved) else "no such file"
+    fragment = unquote(fragment).lower()
+    if fragment and fragment not in anchors.get(file_id, ()):
+        return f"no heading #{fragment}"
+    return None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="markwrite check-links",
+        description="Report broken relative links and #heading anchors in a folder of Markdown files.",
+    )
+    parser.add_argument("root", type=Path, help="folder to check")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="worker processes for parsing changed files (default: one per CPU, at most 8)")
+    parser.add_argument("--index", type=Path, default=None,
+                        help="index file to use (default: the one MarkWrite keeps for this folder)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    return parser
+
+
+def run_check_links(argv: list[str]) -> int:
+    args = build_parser().parse_args(argv)
+    if not args.root.is_dir():
+        print(f"markwrite check-links: not a directory: {args.root}", file=sys.stderr)
+        return 2
+    db_path = args.index
+    if db_path is None:
+        # The same location as the GUI's, so both reuse what the other indexed
+        from PySide6.QtCore import QCoreApplication, QStandardPaths
+        from markwrite import APP_NAME
+        QCoreApplication.setApplicationName(APP_NAME)
+        data_dir = Path(QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation))
+        db_path = index_path(data_dir, args.root)
+
+    started = time.perf_counter()
+    index = WorkspaceIndex(args.root, db_path)
+    stats = index.update(workers=args.jobs)
+    broken = check_links(index)
+    checked = index.file_count()
+    index.close()
+    elapsed = time.perf_counter() - started
+
+    if not args.quiet:
+        cwd = Path.cwd()
+        for link in broken:
+            path = link.path.relative_to(cwd) if link.path.is_relative_to(cwd) else link.path
+            print(f"{path}:{link.line}: {link.target}: {link.reason}")
+    print(
+        f"Checked {checked} files ({stats.indexed} parsed) in {elapsed:.1f} s: {len(broken)} broken links",
+        file=sys.stderr,
+    )
+    return 1 if broken else 0
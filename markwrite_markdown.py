@@ -0,0 +1,1158 @@
+"""A streaming Markdown parser and HTML renderer in pure Python.
+
+Everything the editor page does with a document's structure needs a browser:
+its HTML comes from Toast UI running in Chromium. This module does the same
+for CommonMark with the GFM extensions the editor writes (tables, task lists,
+strikethrough) without Qt or WebEngine, for batch jobs (`markwrite export
+--engine python`), large files and checks.
+
+parse() reads lines one at a time and yields each top-level block as soon as
+it is complete, so memory grows with the largest top-level block, not with
+the document. Blocks are plain dataclasses; inline content stays Markdown
+source until HtmlRenderer renders it. The HTML follows the conventions of the
+editor's own Markdown renderer (ToastMark): `<pre class="lang-x"><code
+data-language="x">`, task items as `<li class="task-list-item checked"
+data-task="" data-task-checked="">`, table cell alignment in `align`, one
+block per line. It is not byte-for-byte what the WYSIWYG view's getHTML()
+returns, which serialises its own DOM.
+
+Reference links resolve against definitions seen earlier in the stream; pass
+the result of prescan_references() to resolve forward references as well
+(to_html() does both passes). Known gaps against the CommonMark spec:
+tabs are expanded in indentation only, a list item starting with a
+blank line may take one more line than the spec allows, and quotes and
+lists nested deeper than MAX_NESTING are read as text. Scans for link
+destinations, titles and labels are bounded, so hostile input parses in
+linear time.
+
+Like getHTML(), which runs its result through DOMPurify, the HTML is safe to
+open: raw HTML loses script and style elements, frames, event handler
+attributes and script URLs, and links and images with a `javascript:` (or
+similar) URL are written without it.
+
+This module does not import Qt.
+"""
+
+from __future__ import annotations
+
+import html
+import io
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from urllib.parse import quote
+
+# Bumped whenever the HTML produced for the same input changes
+PARSER_VERSION = 3
+# Block quotes and lists nested deeper than this many containers are read as text,
+# which keeps the tree shallow enough for walk() and HtmlRenderer to recurse
+MAX_NESTING = 100
+
+
+# -------- Block tree --------
+@dataclass
+class Heading:
+    level: int
+    text: str  # inline Markdown
+    line: int
+
+
+@dataclass
+class Paragraph:
+    text: str
+    line: int
+
+
+@dataclass
+class CodeBlock:
+    text: str
+    info: str
+    line: int
+    fenced: bool = True
+
+
+@dataclass
+class ThematicBreak:
+    line: int
+
+
+@dataclass
+class HtmlBlock:
+    text: str
+    line: int
+
+
+@dataclass
+class Table:
+    align: list[str | None]  # "left", "center", "right" or None per column
+    header: list[str]
+    rows: list[list[str]]
+    line: int
+
+
+@dataclass
+class BlockQuote:
+    children: list
+    line: int
+
+
+@dataclass
+class ListItem:
+    children: list
+    line: int
+    task: bool = False
+    checked: bool = False
+
+
+@dataclass
+class ListBlock:
+    ordered: bool
+    start: int
+    items: list[ListItem]
+    line: int
+    tight: bool = True
+
+
+def walk(blocks: Iterable) -> Iterator:
+    """Every block of the trees in blocks, parents before their children."""
+    for block in blocks:
+        yield block
+        if isinstance(block, ListBlock):
+            yield from walk(block.items)
+        elif isinstance(block, (BlockQuote, ListItem)):
+            yield from walk(block.children)
+
+
+# -------- Block parsing --------
+_ATX = re.compile(r"(#{1,6})(?:[ \t]+|$)(.*)")
+_ATX_CLOSING = re.compile(r"(?:^|[ \t]+)#+[ \t]*$")
+_FENCE = re.compile(r"(`{3,}|~{3,})(.*)")
+_THEMATIC = re.compile(r"(?:(?:\*[ \t]*){3,}|(?:-[ \t]*){3,}|(?:_[ \t]*){3,})$")
+_SETEXT = re.compile(r"(=+|-+)[ \t]*$")
+_BULLET = re.compile(r"([-+*])(?=[ \t]|$)")
+_ORDERED = re.compile(r"(\d{1,9})([.)])(?=[ \t]|$)")
+_TABLE_DELIMITER = re.compile(r"\|?[ \t]*:?-+:?[ \t]*(?:\|[ \t]*:?-+:?[ \t]*)*\|?[ \t]*$")
+_TASK = re.compile(r"\[([ xX])\](?:[ \t]+|$)")
+_REFERENCE = re.compile(
+    r"\[((?:[^\\\[\]]|\\.){1,999})\]:[ \t]*\n?[ \t]*(<[^<>\n]*>|[^\s<][^\s]*)"
+    r"(?:[ \t]*\n?[ \t]*(\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*'|\((?:[^()\\]|\\.)*\)))?[ \t]*(?:\n|$)",
+    re.S,
+)
+_HTML_BLOCK_NAMES = (
+    "address|article|aside|base|basefont|blockquote|body|caption|center|col|colgroup|dd|details|dialog|"
+    "dir|div|dl|dt|fieldset|figcaption|figure|footer|form|frame|frameset|h1|h2|h3|h4|h5|h6|head|header|hr|"
+    "html|iframe|legend|li|link|main|menu|menuitem|nav|noframes|ol|optgroup|option|p|param|search|section|"
+    "summary|table|tbody|td|tfoot|th|thead|title|tr|track|ul"
+)
+_TAG_NAME = r"[A-Za-z][A-Za-z0-9-]*"
+_ATTRIBUTE = r"(?:\s+[A-Za-z_:][A-Za-z0-9_.:-]*(?:\s*=\s*(?:[^\s\"'=<>`]+|'[^']*'|\"[^\"]*\"))?)"
+_OPEN_TAG = rf"<{_TAG_NAME}{_ATTRIBUTE}*\s*/?>"
+_CLOSE_TAG = rf"</{_TAG_NAME}\s*>"
+# (start, end) of the HTML block kinds; an end of None means "up to a blank line"
+_HTML_BLOCKS = (
+    (re.compile(r"<(?:script|pre|style|textarea)(?:\s|>|$)", re.I),
+     re.compile(r"</(?:script|pre|style|textarea)>", re.I)),
+    (re.compile(r"<!--"), re.compile(r"-->")),
+    (re.compile(r"<\?"), re.compile(r"\?>")),
+    (re.compile(r"<![A-Za-z]"), re.compile(r">")),
+    (re.compile(r"<!\[CDATA\["), re.compile(r"\]\]>")),
+    (re.compile(rf"</?(?:{_HTML_BLOCK_NAMES})(?:\s|/?>|$)", re.I), None),
+)
+# A complete tag alone on its line; unlike the others it cannot interrupt a paragraph
+_HTML_BLOCK_TAG = re.compile(rf"(?:{_OPEN_TAG}|{_CLOSE_TAG})[ \t]*$")
+
+
+def _indent(text: str) -> tuple[int, int]:
+    """Columns of leading whitespace (tabs to multiples of 4) and where the content starts."""
+    if text[:1] not in (" ", "\t"):
+        return 0, 0
+    content = len(text) - len(text.lstrip(" \t"))
+    if "\t" not in text[:content]:
+        return content, content
+    col = i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == " ":
+            col += 1
+        elif ch == "\t":
+            col += 4 - col % 4
+        else:
+            break
+        i += 1
+    return col, i
+
+
+def _strip_columns(text: str, columns: int) -> str:
+    """text without its first columns of indentation; a tab that straddles the cut leaves spaces."""
+    col = i = 0
+    while i < len(text) and col < columns:
+        ch = text[i]
+        if ch == " ":
+            col += 1
+        elif ch == "\t":
+            width = 4 - col % 4
+            if col + width > columns:
+                return " " * (col + width - columns) + text[i + 1:]
+            col += width
+        else:
+            break
+        i += 1
+    return text[i:]
+
+
+def _is_blank(text: str) -> bool:
+    return not text.strip(" \t")
+
+
+def normalize_label(label: str) -> str:
+    return " ".join(label.split()).casefold()
+
+
+def _unescape(text: str) -> str:
+    """Backslash escapes and entities of link destinations, titles and info strings."""
+    return html.unescape(_ESCAPED.sub(r"\1", text))
+
+
+def _take_references(text: str, references: dict) -> str:
+    """text without the link reference definitions it starts with, which go to references."""
+    while text.startswith("["):
+        match = _REFERENCE.match(text)
+        if match is None:
+            break
+        label, dest, title = match.groups()
+        if dest.startswith("<"):
+            dest = dest[1:-1]
+        key = normalize_label(label)
+        if key and key not in references:
+            references[key] = (_unescape(dest), _unescape(title[1:-1]) if title else None)
+        text = text[match.end():]
+    return text
+
+
+class _Container:
+    __slots__ = ("kind", "node", "children", "offset", "bullet", "blank", "loose")
+
+    def __init__(self, kind: str, node, children: list, offset: int = 0, bullet: str = ""):
+        self.kind = kind  # "document", "quote", "list" or "item"
+        self.node = node
+        self.children = children
+        self.offset = offset  # items: columns of indentation their content needs
+        self.bullet = bullet  # lists: marker character or ordered delimiter
+        self.blank = False  # a blank line was seen since the last content
+        self.loose = False
+
+
+class _Leaf:
+    __slots__ = ("kind", "lines", "line", "indent", "fence", "info", "end", "table")
+
+    def __init__(self, kind: str, line: int, lines: list[str]):
+        self.kind = kind  # "paragraph", "fenced", "indented", "html" or "table"
+        self.line = line
+        self.lines = lines
+        self.indent = 0
+        self.fence = ""
+        self.info = ""
+        self.end = None
+        self.table: Table | None = None
+
+
+class BlockParser:
+    """Line-by-line block parser; feed() lines, then take() the finished top-level blocks."""
+
+    def __init__(self, references: dict | None = None):
+        self.references = {} if references is None else references
+        self._root = _Container("document", None, [])
+        self._stack = [self._root]
+        self._leaf: _Leaf | None = None
+        self._line = 0
+
+    def take(self) -> list:
+        """The top-level blocks completed so far, each returned once."""
+        done = len(self._root.children) - (1 if len(self._stack) > 1 else 0)
+        blocks = self._root.children[:done]
+        del self._root.children[:done]
+        return blocks
+
+    def finish(self):
+        self._close_to(1)
+        self._close_leaf()
+
+    # -------- Per line --------
+    def feed(self, line: str):
+        self._line += 1
+        rest = line.rstrip("\r\n")
+        matched = 1
+        for entry in self._stack[1:]:
+            if entry.kind == "quote":
+                ind, i = _indent(rest)
+                if ind > 3 or rest[i:i + 1] != ">":
+                    break
+                rest = _strip_columns(rest[i + 1:], 1) if rest[i + 1:i + 2] in (" ", "\t") else rest[i + 1:]
+            elif entry.kind == "item":
+                if _is_blank(rest):
+                    if not entry.children and (self._leaf is None or self._stack[-1] is not entry):
+                        break  # an item can begin with at most one blank line
+                elif _indent(rest)[0] >= entry.offset:
+                    rest = _strip_columns(rest, entry.offset)
+                else:
+                    break
+            matched += 1
+        all_matched = matched == len(self._stack)
+        leaf = self._leaf
+
+        if leaf is not None and leaf.kind in ("fenced", "html"):
+            if all_matched:
+                self._continue_raw(leaf, rest)
+                return
+            self._close_leaf()
+
+        while True:
+            ind, i = _indent(rest)
+            text = rest[i:]
+            leaf = self._leaf
+            in_paragraph = leaf is not None and leaf.kind == "paragraph"
+            if ind >= 4:
+                if in_paragraph or _is_blank(rest):
+                    break
+                if not (all_matched and leaf is not None and leaf.kind == "indented"):
+                    self._start(matched)
+                    self._leaf = _Leaf("indented", self._line, [])
+                self._leaf.lines.append(_strip_columns(rest, 4))
+                return
+            first = text[:1]
+            if first == ">" and matched < MAX_NESTING:
+                self._start(matched)
+                quote = BlockQuote([], self._line)
+                self._push(_Container("quote", quote, quote.children))
+                rest = _strip_columns(text[1:], 1) if text[1:2] in (" ", "\t") else text[1:]
+                matched = len(self._stack)
+                continue
+            if first == "#":
+                match = _ATX.match(text)
+                if match:
+                    self._start(matched)
+                    content = _ATX_CLOSING.sub("", match.group(2)).strip(" \t")
+                    self._add(Heading(len(match.group(1)), content, self._line))
+                    return
+            if first in ("`", "~"):
+                match = _FENCE.match(text)
+                if match and not (first == "`" and "`" in match.group(2)):
+                    self._start(matched)
+                    self._leaf = _Leaf("fenced", self._line, [])
+                    self._leaf.fence = match.group(1)
+                    self._leaf.indent = ind
+                    self._leaf.info = _unescape(match.group(2).strip(" \t"))
+                    return
+            if first == "<":
+                end = self._html_block_end(text, in_paragraph)
+                if end is not False:
+                    self._start(matched)
+                    self._leaf = _Leaf("html", self._line, [])
+                    self._leaf.end = end
+                    self._continue_raw(self._leaf, rest)
+                    return
+            if in_paragraph and all_matched and first in ("=", "-") and _SETEXT.match(text):
+                body = _take_references("\n".join(leaf.lines), self.references)
+                if body:
+                    self._leaf = None
+                    self._add(Heading(1 if first == "=" else 2, body.strip(), leaf.line))
+                    return
+            if in_paragraph and all_matched and first in ("|", ":", "-") and _TABLE_DELIMITER.match(text):
+                if self._start_table(leaf, text):
+                    return
+            if first in ("*", "-", "_") and _THEMATIC.match(text):
+                self._start(matched)
+                self._add(ThematicBreak(self._line))
+                return
+            item = self._list_item(rest, ind, i, in_paragraph and all_matched) if matched < MAX_NESTING else None
+            if item is not None:
+                offset, bullet, ordered, start, content = item
+                self._start(matched, item=True)
+                self._open_item(offset, bullet, ordered, start)
+                rest = content
+                matched = len(self._stack)
+                continue
+            break
+
+        all_matched = matched == len(self._stack)
+        leaf = self._leaf
+        if _is_blank(rest):
+            self._close_to(matched)
+            if self._leaf is not None and self._leaf.kind == "indented":
+                self._leaf.lines.append(_strip_columns(rest, 4))
+            else:
+                self._close_leaf()
+            for entry in self._stack:
+                entry.blank = True
+            return
+        if leaf is not None and leaf.kind == "paragraph" and not all_matched:
+            leaf.lines.append(rest.lstrip(" \t"))  # a lazy continuation line
+            self._clear_blank()
+            return
+        self._close_to(matched)
+        leaf = self._leaf
+        if leaf is not None and leaf.kind == "paragraph":
+            leaf.lines.append(rest.lstrip(" \t"))
+            return
+        if leaf is not None and leaf.kind == "table":
+            leaf.table.rows.append(_table_row(rest, len(leaf.table.header)))
+            return
+        self._start(matched)
+        self._leaf = _Leaf("paragraph", self._line, [rest.lstrip(" \t")])
+
+    def _continue_raw(self, leaf: _Leaf, rest: str):
+        if leaf.kind == "fenced":
+            ind, i = _indent(rest)
+            closing = rest[i:].rstrip(" \t")
+            if ind <= 3 and closing and closing[0] == leaf.fence[0] \
+                    and len(closing) >= len(leaf.fence) and closing == closing[0] * len(closing):
+                self._close_leaf()
+            else:
+                leaf.lines.append(_strip_columns(rest, min(ind, leaf.indent)))
+            return
+        if leaf.end is None:
+            if _is_blank(rest):
+                self._close_leaf()
+            else:
+                leaf.lines.append(rest)
+            return
+        leaf.lines.append(rest)
+        # The start line itself may hold the end (<!-- ... --> on one line)
+        if leaf.end.search(rest):
+            self._close_leaf()
+
+    @staticmethod
+    def _html_block_end(text: str, in_paragraph: bool):
+        """The end pattern of an HTML block starting with text, None for "a blank line", False if none starts."""
+        for start, end in _HTML_BLOCKS:
+            if start.match(text):
+                return end
+        if not in_paragraph and _HTML_BLOCK_TAG.match(text) \
+                and not re.match(r"</?(?:script|pre|style|textarea)\b", text, re.I):
+            return None
+        return False
+
+    def _start_table(self, leaf: _Leaf, delimiter: str) -> bool:
+        header_line = leaf.lines[-1]
+        if "|" not in header_line and "|" not in delimiter:
+            return False
+        header = _split_cells(header_line)
+        aligns = []
+        for cell in _split_cells(delimiter):
+            left, right = cell.startswith(":"), cell.endswith(":")
+            aligns.append("center" if left and right else "left" if left else "right" if right else None)
+        if len(header) != len(aligns):
+            return False
+        line = self._line - 1
+        leaf.lines.pop()
+        if leaf.lines:
+            self._close_leaf()
+        self._leaf = _Leaf("table", line, [])
+        self._leaf.table = Table(aligns, header, [], line)
+        return True
+
+    @staticmethod
+    def _list_item(rest: str, ind: int, i: int, interrupts_paragraph: bool):
+        """(content offset, marker, ordered, start, content) if rest starts a list item."""
+        text = rest[i:]
+        match = _BULLET.match(text) or _ORDERED.match(text)
+        if match is None:
+            return None
+        ordered = match.re is _ORDERED
+        after = text[match.end():]
+        if interrupts_paragraph and (_is_blank(after) or (ordered and match.group(1) != "1")):
+            return None
+        marker_end = ind + match.end()
+        spaces, _j = _indent(after)
+        if _is_blank(after):
+            offset, content = marker_end + 1, ""
+        elif spaces >= 5:
+            # Indented code right after the marker: the content starts one column in
+            offset, content = marker_end + 1, _strip_columns(after, 1)
+        else:
+            offset, content = marker_end + spaces, _strip_columns(after, spaces)
+        bullet = match.group(2) if ordered else match.group(1)
+        return offset, bullet, ordered, int(match.group(1)) if ordered else 1, content
+
+    # -------- Tree building --------
+    def _start(self, matched: int, item: bool = False):
+        """Close what a new block at depth matched replaces; note looseness of enclosing items."""
+        self._close_to(matched)
+        self._close_leaf()
+        if not item and self._stack[-1].kind == "list":
+            self._pop()  # only another item continues a list
+        top = self._stack[-1]
+        if top.kind == "item" and top.blank and top.children:
+            self._stack[-2].loose = True
+        if not item:
+            # _open_item() still needs the list's flag: a blank line before an item loosens the list
+            self._clear_blank()
+
+    def _clear_blank(self):
+        for entry in self._stack:
+            entry.blank = False
+
+    def _open_item(self, offset: int, bullet: str, ordered: bool, start: int):
+        top = self._stack[-1]
+        if top.kind == "list" and top.bullet == bullet:
+            if top.blank:
+                top.loose = True
+        else:
+            if top.kind == "list":
+                self._pop()
+            node = ListBlock(ordered, start, [], self._line)
+            self._push(_Container("list", node, node.items, bullet=bullet))
+        self._clear_blank()
+        item = ListItem([], self._line)
+        self._stack[-1].children.append(item)
+        self._stack.append(_Container("item", item, item.children, offset))
+
+    def _push(self, entry: _Container):
+        self._stack[-1].children.append(entry.node)
+        self._stack.append(entry)
+
+    def _pop(self):
+        entry = self._stack.pop()
+        if entry.kind == "item":
+            _finish_item(entry.node)
+        elif entry.kind == "list":
+            entry.node.tight = not entry.loose
+
+    def _close_to(self, depth: int):
+        if len(self._stack) > depth:
+            self._close_leaf()
+            while len(self._stack) > depth:
+                self._pop()
+
+    def _add(self, block):
+        self._stack[-1].children.append(block)
+
+    def _close_leaf(self):
+        leaf, self._leaf = self._leaf, None
+        if leaf is None:
+            return
+        if leaf.kind == "paragraph":
+            text = _take_references("\n".join(leaf.lines), self.references).rstrip()
+            if text:
+                self._add(Paragraph(text, leaf.line))
+        elif leaf.kind == "fenced":
+            body = "".join(line + "\n" for line in leaf.lines)
+            self._add(CodeBlock(body, leaf.info, leaf.line))
+        elif leaf.kind == "indented":
+            lines = leaf.lines
+            while lines and _is_blank(lines[-1]):
+                lines.pop()
+            self._add(CodeBlock("".join(line + "\n" for line in lines), "", leaf.line, fenced=False))
+        elif leaf.kind == "html":
+            self._add(HtmlBlock("\n".join(leaf.lines), leaf.line))
+        else:
+            self._add(leaf.table)
+
+
+def _finish_item(item: ListItem):
+    first = item.children[0] if item.children else None
+    if isinstance(first, Paragraph):
+        match = _TASK.match(first.text)
+        if match:
+            item.task = True
+            item.checked = match.group(1) != " "
+            first.text = first.text[match.end():]
+            if not first.text:
+                item.children.pop(0)
+
+
+_PIPE = re.compile(r"(?<!\\)((?:\\\\)*)\|")
+
+
+def _split_cells(line: str) -> list[str]:
+    line = line.strip(" \t")
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    cells = []
+    start = 0
+    for match in _PIPE.finditer(line):
+        cells.append(line[start:match.end() - 1])
+        start = match.end()
+    cells.append(line[start:])
+    return [cell.strip(" \t").replace("\\|", "|") for cell in cells]
+
+
+def _table_row(line: str, columns: int) -> list[str]:
+    cells = _split_cells(line)[:columns]
+    return cells + [""] * (columns - len(cells))
+
+
+def _lines(source) -> Iterable[str]:
+    return io.StringIO(source) if isinstance(source, str) else source
+
+
+def parse(source: str | Iterable[str], references: dict | None = None) -> Iterator:
+    """Top-level blocks of a document given as text or as lines (a file object works), as they complete.
+
+    Link reference definitions are collected into references as they are
+    parsed; pass a dict to share them with an HtmlRenderer.
+    """
+    parser = BlockParser(references)
+    for line in _lines(source):
+        parser.feed(line)
+        yield from parser.take()
+    parser.finish()
+    yield from parser.take()
+
+
+def prescan_references(source: str | Iterable[str]) -> dict:
+    """Single-line link reference definitions anywhere outside fenced code, for forward references."""
+    references: dict = {}
+    fence = ""
+    for line in _lines(source):
+        stripped = line.lstrip(" >\t")
+        if fence:
+            if stripped.startswith(fence):
+                fence = ""
+            continue
+        match = _FENCE.match(stripped)
+        if match:
+            fence = match.group(1)[0] * 3
+        elif stripped.startswith("["):
+            _take_references(stripped.rstrip("\r\n"), references)
+    return references
+
+
+# -------- Inline rendering --------
+_ESCAPABLE = r"""!"#$%&'()*+,\-./:;<=>?@\[\\\]^_`{|}~"""
+_ESCAPED = re.compile(rf"\\([{_ESCAPABLE}])")
+_TEXT = re.compile(r"[^\\`*_~\[\]!<&\n]+")
+_BACKTICKS = re.compile(r"`+")
+_ENTITY = re.compile(r"&(?:#[xX][0-9a-fA-F]{1,6}|#[0-9]{1,7}|[A-Za-z][A-Za-z0-9]{1,31});")
+_AUTOLINK = re.compile(r"<([A-Za-z][A-Za-z0-9+.-]{1,31}:[^\s<>]*)>")
+_EMAIL = re.compile(
+    r"<([a-zA-Z0-9.!#$%&'*+/=?^_`{|}~-]+@[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?"
+    r"(?:\.[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?)*)>"
+)
+_INLINE_HTML = re.compile(
+    rf"{_OPEN_TAG}|{_CLOSE_TAG}|<!---->|<!--(?:-?[^>-])(?:-?[^-])*-->|<\?.*?\?>|<![A-Za-z][^>]*>|<!\[CDATA\[.*?\]\]>",
+    re.S,
+)
+# Link labels are at most this long, which also bounds the work per "]"
+MAX_LABEL_LENGTH = 999
+_LINK_LABEL = re.compile(rf"\[((?:[^\\\[\]]|\\.){{0,{MAX_LABEL_LENGTH}}})\]")
+# Parentheses nesting allowed in a link destination, as in cmark
+MAX_LINK_PARENS = 32
+_URL_SAFE = ";/?:@&=+$,-_.!~*'()#%[]"
+_PUNCTUATION = set("""!"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~""")
+_TAG = re.compile(r"<[^>]*>")
+
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+def _href(url: str) -> str:
+    return _escape(quote(url, safe=_URL_SAFE))
+
+
+# -------- Sanitising --------
+# URLs with these schemes run script when followed; images may still use data:
+_UNSAFE_SCHEMES = {"javascript", "vbscript", "data"}
+_SCHEME = re.compile(r"([A-Za-z][A-Za-z0-9+.-]*):")
+# Browsers skip these inside a URL and leading control characters and spaces before it
+_URL_IGNORED = re.compile(r"[\t\n\r]")
+_URL_LEADING = "".join(map(chr, range(0x21)))
+# Removed with their content
+_DROPPED_ELEMENTS = {"script", "style"}
+# Removed, content kept
+_DROPPED_TAGS = {
+    "animate", "applet", "base", "embed", "frame", "frameset", "iframe", "link", "meta", "noscript", "object", "set",
+}
+_URL_ATTRIBUTES = {"action", "background", "cite", "data", "formaction", "href", "poster", "src", "xlink:href"}
+_RAW_TAG = re.compile(
+    rf"<(/?)({_TAG_NAME})((?:{_ATTRIBUTE})*)\s*(/?)>|<!---->|<!--(?:-?[^>-])(?:-?[^-])*-->|<![A-Za-z][^>]*>"
+)
+_RAW_ATTRIBUTE = re.compile(r"\s+([A-Za-z_:][A-Za-z0-9_.:-]*)(?:\s*=\s*([^\s\"'=<>`]+|'[^']*'|\"[^\"]*\"))?")
+
+
+def _safe_url(url: str, image: bool = False) -> bool:
+    match = _SCHEME.match(_URL_IGNORED.sub("", url).lstrip(_URL_LEADING))
+    if match is None:
+        return True
+    scheme = match.group(1).lower()
+    return scheme not in _UNSAFE_SCHEMES or (image and scheme == "data")
+
+
+def _clean_attributes(tag: str, attributes: str) -> str:
+    out = []
+    for match in _RAW_ATTRIBUTE.finditer(attributes):
+        name, value = match.groups()
+        key = name.lower()
+        if key.startswith("on") or key == "srcdoc":
+            continue
+        if value is None:
+            out.append(f" {name}")
+            continue
+        if value[0] in "'\"":
+            value = value[1:-1]
+        value = html.unescape(value)
+        if key in _URL_ATTRIBUTES and not _safe_url(value, image=tag == "img"):
+            continue
+        out.append(f' {name}="{_escape(value)}"')
+    return "".join(out)
+
+
+def _clean_html(text: str) -> str:
+    """Raw HTML without anything that runs script; a "<" that starts no tag or comment is escaped.
+
+    Attributes are rewritten in double quotes, and comments or declarations
+    holding a "<" are dropped, so no markup hides inside them.
+    """
+    out: list[str] = []
+    pos = 0
+    while True:
+        start = text.find("<", pos)
+        if start < 0:
+            out.append(text[pos:])
+            return "".join(out)
+        out.append(text[pos:start])
+        match = _RAW_TAG.match(text, start)
+        if match is None:
+            out.append("&lt;")
+            pos = start + 1
+            continue
+        pos = match.end()
+        closing, name, attributes, empty = match.groups()
+        if name is None:
+            if "<" not in match.group()[1:]:
+                out.append(match.group())
+            continue
+        tag = name.lower()
+        if tag in _DROPPED_ELEMENTS:
+            if not closing:
+                end = re.compile(rf"</{tag}\s*>", re.I).search(text, pos)
+                pos = end.end() if end else len(text)
+        elif tag in _DROPPED_TAGS:
+            pass
+        elif closing:
+            out.append(f"</{name}>")
+        else:
+            out.append(f"<{name}{_clean_attributes(tag, attributes)}{' /' if empty else ''}>")
+
+
+def _is_punctuation(ch: str) -> bool:
+    return ch in _PUNCTUATION or (ch != "" and not ch.isalnum() and not ch.isspace() and ord(ch) > 127)
+
+
+class _Delimiter:
+    __slots__ = ("char", "count", "length", "can_open", "can_close", "opens", "closes")
+
+    def __init__(self, char: str, count: int, can_open: bool, can_close: bool):
+        self.char = char
+        self.count = self.length = count
+        self.can_open = can_open
+        self.can_close = can_close
+        self.opens: list[str] = []  # tags after the remaining delimiter characters, outermost first
+        self.closes: list[str] = []  # tags before them, innermost first
+
+    def __str__(self):
+        return "".join(self.closes) + self.char * self.count + "".join(self.opens)
+
+
+_EMPHASIS_TAGS = {("*", 1): "em", ("_", 1): "em", ("*", 2): "strong", ("_", 2): "strong",
+                  ("~", 1): "del", ("~", 2): "del"}
+
+
+def _process_emphasis(delimiters: list[_Delimiter]):
+    """CommonMark's delimiter algorithm over delimiters, in document order; they are consumed."""
+    bottoms: dict[tuple, int] = {}
+    i = 0
+    while i < len(delimiters):
+        closer = delimiters[i]
+        if not closer.can_close or closer.count == 0:
+            i += 1
+            continue
+        key = (closer.char, closer.can_open, closer.length % 3)
+        j = i - 1
+        found = -1
+        while j >= bottoms.get(key, 0):
+            opener = delimiters[j]
+            if opener.char == closer.char and opener.can_open and opener.count:
+                if closer.char == "~":
+                    if opener.count == closer.count:
+                        found = j
+                        break
+                elif not ((opener.can_close or closer.can_open) and (opener.length + closer.length) % 3 == 0
+                          and not (opener.length % 3 == 0 and closer.length % 3 == 0)):
+                    found = j
+                    break
+            j -= 1
+        if found < 0:
+            bottoms[key] = i
+            if not closer.can_open:
+                closer.can_close = False
+            i += 1
+            continue
+        opener = delimiters[found]
+        used = closer.count if closer.char == "~" else (2 if opener.count >= 2 and closer.count >= 2 else 1)
+        tag = _EMPHASIS_TAGS[(closer.char, used)]
+        opener.count -= used
+        closer.count -= used
+        opener.opens.insert(0, f"<{tag}>")
+        closer.closes.append(f"</{tag}>")
+        for between in delimiters[found + 1:i]:
+            between.can_open = between.can_close = False
+        if closer.count == 0:
+            i += 1
+
+
+class _InlineParser:
+    def __init__(self, text: str, references: dict):
+        self.text = text
+        self.references = references
+        self.nodes: list = []  # strings of HTML and _Delimiter objects
+        self.delimiters: list[_Delimiter] = []
+        # Open brackets: (index in nodes, index in delimiters, source position after "[", image?, active?)
+        self.brackets: list[list] = []
+        # Closing characters of link titles and <destinations> known to be missing from a position on;
+        # without this every unclosed "[x](" would rescan the rest of the paragraph
+        self._unclosed: dict[str, int] = {}
+
+    def render(self) -> str:
+        text, pos, end = self.text, 0, len(self.text)
+        while pos < end:
+            match = _TEXT.match(text, pos)
+            if match:
+                self.nodes.append(_escape(match.group()))
+                pos = match.end()
+                continue
+            ch = text[pos]
+            if ch == "\\":
+                pos = self._backslash(pos)
+            elif ch == "`":
+                pos = self._code(pos)
+            elif ch in "*_~":
+                pos = self._delimiter(pos)
+            elif ch == "[":
+                self._open_bracket(pos, pos + 1, False)
+                pos += 1
+            elif ch == "!":
+                if text.startswith("![", pos):
+                    self._open_bracket(pos, pos + 2, True)
+                    pos += 2
+                else:
+                    self.nodes.append("!")
+                    pos += 1
+            elif ch == "]":
+                pos = self._close_bracket(pos)
+            elif ch == "<":
+                pos = self._angle(pos)
+            elif ch == "&":
+                match = _ENTITY.match(text, pos)
+                self.nodes.append(match.group() if match else "&amp;")
+                pos = match.end() if match else pos + 1
+            else:  # "\n"
+                pos = self._line_break(pos)
+        _process_emphasis(self.delimiters)
+        return "".join(map(str, self.nodes))
+
+    def _backslash(self, pos: int) -> int:
+        nxt = self.text[pos + 1:pos + 2]
+        if nxt == "\n":
+            self.nodes.append("<br />\n")
+            return pos + 2
+        if nxt and nxt in _PUNCTUATION:
+            self.nodes.append(_escape(nxt))
+            return pos + 2
+        self.nodes.append("\\")
+        return pos + 1
+
+    def _code(self, pos: int) -> int:
+        run = _BACKTICKS.match(self.text, pos).group()
+        search = pos + len(run)
+        while True:
+            match = _BACKTICKS.search(self.text, search)
+            if match is None:
+                self.nodes.append(run)
+                return pos + len(run)
+            if match.group() == run:
+                break
+            search = match.end()
+        code = self.text[pos + len(run):match.start()].replace("\n", " ")
+        if len(code) > 2 and code[0] == " " and code[-1] == " " and code.strip(" "):
+            code = code[1:-1]
+        self.nodes.append(f"<code>{_escape(code)}</code>")
+        return match.end()
+
+    def _delimiter(self, pos: int) -> int:
+        text, ch = self.text, self.text[pos]
+        end = pos
+        while end < len(text) and text[end] == ch:
+            end += 1
+        count = end - pos
+        if ch == "~" and count > 2:
+            self.nodes.append(ch * count)
+            return end
+        before = text[pos - 1] if pos > 0 else " "
+        after = text[end] if end < len(text) else " "
+        left = not after.isspace() and (not _is_punctuation(after) or before.isspace() or _is_punctuation(before))
+        right = not before.isspace() and (not _is_punctuation(before) or after.isspace() or _is_punctuation(after))
+        if ch == "_":
+            can_open = left and (not right or _is_punctuation(before))
+            can_close = right and (not left or _is_punctuation(after))
+        else:
+            can_open, can_close = left, right
+        delimiter = _Delimiter(ch, count, can_open, can_close)
+        self.nodes.append(delimiter)
+        if can_open or can_close:
+            self.delimiters.append(delimiter)
+        return end
+
+    def _open_bracket(self, pos: int, content: int, image: bool):
+        self.brackets.append([len(self.nodes), len(self.delimiters), content, image, True])
+        self.nodes.append(self.text[pos:content])
+
+    def _close_bracket(self, pos: int) -> int:
+        if not self.brackets:
+            self.nodes.append("]")
+            return pos + 1
+        node_index, delimiter_index, content, image, active = self.brackets.pop()
+        if not active:
+            self.nodes.append("]")
+            return pos + 1
+        target = self._link_target(pos + 1, content)
+        if target is None:
+            self.nodes.append("]")
+            return pos + 1
+        dest, title, end = target
+        inner = self.delimiters[delimiter_index:]
+        del self.delimiters[delimiter_index:]
+        _process_emphasis(inner)
+        title_attr = f' title="{_escape(title)}"' if title is not None else ""
+        if image:
+            alt = html.unescape(_TAG.sub("", "".join(map(str, self.nodes[node_index + 1:]))))
+            del self.nodes[node_index:]
+            src = f' src="{_href(dest)}"' if _safe_url(dest, image=True) else ""
+            self.nodes.append(f'<img{src} alt="{_escape(alt)}"{title_attr} />')
+        else:
+            href = f' href="{_href(dest)}"' if _safe_url(dest) else ""
+            self.nodes[node_index] = f'<a{href}{title_attr}>'
+            self.nodes.append("</a>")
+            # No links inside links
+            for bracket in self.brackets:
+                if not bracket[3]:
+                    bracket[4] = False
+        return end
+
+    def _link_target(self, pos: int, content: int):
+        """(destination, title, end) of the link whose text runs from content to the "]" before pos, or None."""
+        text = self.text
+        if text.startswith("(", pos):
+            inline = self._inline_target(pos + 1)
+            if inline is not None:
+                return inline
+        if not self.references:
+            return None
+        match = _LINK_LABEL.match(text, pos)
+        if match and match.group(1).strip():
+            key, end = match.group(1), match.end()
+        elif pos - 1 - content <= MAX_LABEL_LENGTH:
+            # Collapsed "[text][]" and shortcut "[text]" references use the text as label
+            key, end = text[content:pos - 1], match.end() if match else pos
+        else:
+            return None
+        reference = self.references.get(normalize_label(key))
+        if reference is None:
+            return None
+        return reference[0], reference[1], end
+
+    def _inline_target(self, pos: int):
+        text, end = self.text, len(self.text)
+        while pos < end and text[pos] in " \t\n":
+            pos += 1
+        if text.startswith("<", pos):
+            close = self._find_closing(">", pos + 1)
+            if close < 0 or "\n" in text[pos:close] or "<" in text[pos + 1:close]:
+                return None
+            dest, pos = text[pos + 1:close], close + 1
+        else:
+            start, depth = pos, 0
+            while pos < end:
+                ch = text[pos]
+                if ch == "\\" and pos + 1 < end:
+                    pos += 2
+                    continue
+                if ch.isspace() or ord(ch) < 0x20:
+                    break
+                if ch == "(":
+                    depth += 1
+                    if depth > MAX_LINK_PARENS:
+                        return None
+                elif ch == ")":
+                    if depth == 0:
+                        break
+                    depth -= 1
+                pos += 1
+            dest = text[start:pos]
+        title = None
+        spaced = pos
+        while pos < end and text[pos] in " \t\n":
+            pos += 1
+        if pos < end and text[pos] in "\"'(" and pos > spaced:
+            scan = self._find_closing(")" if text[pos] == "(" else text[pos], pos + 1)
+            if scan < 0:
+                return None
+            title, pos = _unescape(text[pos + 1:scan]), scan + 1
+            while pos < end and text[pos] in " \t\n":
+                pos += 1
+        if not text.startswith(")", pos):
+            return None
+        return _unescape(dest), title, pos + 1
+
+    def _find_closing(self, closing: str, pos: int) -> int:
+        """Where the first closing character not escaped by a backslash is at or after pos, or -1."""
+        if pos >= self._unclosed.get(closing, len(self.text) + 1):
+            return -1
+        text, end, scan = self.text, len(self.text), pos
+        while scan < end and text[scan] != closing:
+            scan += 2 if text[scan] == "\\" else 1
+        if scan >= end:
+            self._unclosed[closing] = pos
+            return -1
+        return scan
+
+    def _angle(self, pos: int) -> int:
+        text = self.text
+        match = _AUTOLINK.match(text, pos)
+        if match:
+            url = match.group(1)
+            href = f' href="{_href(url)}"' if _safe_url(url) else ""
+            self.nodes.append(f'<a{href}>{_escape(url)}</a>')
+            return match.end()
+        match = _EMAIL.match(text, pos)
+        if match:
+            address = match.group(1)
+            self.nodes.append(f'<a href="mailto:{_href(address)}">{_escape(address)}</a>')
+            return match.end()
+        match = _INLINE_HTML.match(text, pos)
+        if match:
+            self.nodes.append(_clean_html(match.group()))
+            return match.end()
+        self.nodes.append("&lt;")
+        return pos + 1
+
+    def _line_break(self, pos: int) -> int:
+        # Trailing spaces of the line are still the end of the last text node
+        last = self.nodes[-1] if self.nodes else ""
+        hard = False
+        if isinstance(last, str) and last.endswith(" "):
+            stripped = last.rstrip(" ")
+            hard = len(last) - len(stripped) >= 2
+            self.nodes[-1] = stripped
+        self.nodes.append("<br />\n" if hard else "\n")
+        pos += 1
+        while pos < len(self.text) and self.text[pos] in " \t":
+            pos += 1
+        return pos
+
+
+def render_inline(text: str, references: dict | None = None) -> str:
+    return _InlineParser(text, references or {}).render()
+
+
+def plain_text(text: str, references: dict | None = None) -> str:
+    """The visible text of inline Markdown, e.g. a heading without its markup."""
+    return html.unescape(_TAG.sub("", render_inline(text, references)))
+
+
+# -------- HTML --------
+class HtmlRenderer:
+    """Renders blocks to HTML; references are shared with the parser, so later definitions still apply."""
+
+    def __init__(self, references: dict | None = None):
+        self.references = {} if references is None else references
+
+    def render(self, block) -> str:
+        out: list[str] = []
+        self._block(block, out, False)
+        return "".join(out)
+
+    def _inline(self, text: str) -> str:
+        return _InlineParser(text, self.references).render()
+
+    def _block(self, block, out: list[str], tight: bool):
+        if isinstance(block, Paragraph):
+            if tight:
+                out.append(self._inline(block.text))
+            else:
+                out.append(f"<p>{self._inline(block.text)}</p>\n")
+        elif isinstance(block, Heading):
+            out.append(f"<h{block.level}>{self._inline(block.text)}</h{block.level}>\n")
+        elif isinstance(block, CodeBlock):
+            words = block.info.split()
+            if words:
+                language = _escape(words[0])
+                out.append(f'<pre class="lang-{language}"><code data-language="{language}">')
+            else:
+                out.append("<pre><code>")
+            out.append(f"{_escape(block.text)}</code></pre>\n")
+        elif isinstance(block, ListBlock):
+            tag = "ol" if block.ordered else "ul"
+            start = f' start="{block.start}"' if block.ordered and block.start != 1 else ""
+            out.append(f"<{tag}{start}>\n")
+            for item in block.items:
+                self._item(item, out, block.tight)
+            out.append(f"</{tag}>\n")
+        elif isinstance(block, BlockQuote):
+            out.append("<blockquote>\n")
+            for child in block.children:
+                self._block(child, out, False)
+            out.append("</blockquote>\n")
+        elif isinstance(block, Table):
+            self._table(block, out)
+        elif isinstance(block, ThematicBreak):
+            out.append("<hr />\n")
+        elif isinstance(block, HtmlBlock):
+            out.append(_clean_html(block.text) + "\n")
+
+    def _item(self, item: ListItem, out: list[str], tight: bool):
+        if item.task:
+            classes = "task-list-item checked" if item.checked else "task-list-item"
+            checked = ' data-task-checked=""' if item.checked else ""
+            out.append(f'<li class="{classes}" data-task=""{checked}>')
+        else:
+            out.append("<li>")
+        for i, child in enumerate(item.children):
+            if not (tight and isinstance(child, Paragraph)) and (i == 0 or not out[-1].endswith("\n")):
+                out.append("\n")
+            self._block(child, out, tight)
+        out.append("</li>\n")
+
+    def _table(self, table: Table, out: list[str]):
+        def row(cells: list[str], tag: str):
+            out.append("<tr>\n")
+            for align, cell in zip(table.align, cells):
+                attribute = f' align="{align}"' if align else ""
+                out.append(f"<{tag}{attribute}>{self._inline(cell)}</{tag}>\n")
+            out.append("</tr>\n")
+
+        out.append("<table>\n<thead>\n")
+        row(table.header, "th")
+        out.append("</thead>\n")
+        if table.rows:
+            out.append("<tbody>\n")
+            for cells in table.rows:
+                row(cells, "td")
+            out.append("</tbody>\n")
+        out.append("</table>\n")
+
+
+def iter_html(source: str | Iterable[str], references: dict | None = None) -> Iterator[str]:
+    """HTML of a document, one top-level block at a time."""
+    references = {} if references is None else references
+    renderer = HtmlRenderer(references)
+    for block in parse(source, references):
+        yield renderer.render(block)
+
+
+def to_html(text: str) -> str:
+    """The HTML fragment of a whole document held in memory."""
+    return "".join(iter_html(text, prescan_references(text)))
@@ -0,0 +1,245 @@
+"""Resident memory of MarkWrite per engine profile: `markwrite memory-report`.
+
+For every engine profile (see markwrite_engine) a probe process starts the
+editor without a window, opens the given documents (or copies of a generated
+sample) in tabs, waits until they are loaded and memory has settled, and sums
+the resident set size of its whole process tree by kind: MarkWrite itself,
+renderers, the GPU process and Chromium's utility processes. The report puts
+the profiles side by side.
+
+RSS is read with ps, so the report runs on Linux and macOS. Memory shared
+between processes is counted once per process, as ps reports it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from markwrite_engine import ENGINE_PROFILES, ENV_VAR, select_engine_profile
+
+PROBE_TIMEOUT_S = 120
+# After the last document is loaded; also outlasts the page pool's refill delay
+SETTLE_MS = 3000
+SAMPLE_SECTIONS = 200
+KINDS = ("browser", "renderer", "gpu", "utility", "zygote", "other")
+
+
+def parse_ps(output: str) -> list[tuple[int, int, int, str]]:
+    """(pid, ppid, rss in KB, command line) from `ps -A -o pid=,ppid=,rss=,args=`."""
+    rows = []
+    for line in output.splitlines():
+        fields = line.split(None, 3)
+        if len(fields) < 3:
+            continue
+        try:
+            pid, ppid, rss = int(fields[0]), int(fields[1]), int(fields[2])
+        except ValueError:
+            continue
+        rows.append((pid, ppid, rss, fields[3] if len(fields) > 3 else ""))
+    return rows
+
+
+def process_kind(args: str) -> str:
+    """What a Chromium process is for, from its --type switch."""
+    for arg in args.split():
+        if arg.startswith("--type="):
+            kind = arg[len("--type="):]
+            if kind == "gpu-process":
+                return "gpu"
+            return kind if kind in KINDS else "utility"
+    return "other"
+
+
+def tree_memory(rows: list[tuple[int, int, int, str]], root: int) -> dict[str, float]:
+    """RSS in MB of root ("browser") and all its descendants, by kind; "total" sums them."""
+    children: dict[int, list[tuple[int, int, str]]] = {}
+    memory = {kind: 0.0 for kind in KINDS}
+    for pid, ppid, rss, args in rows:
+        if pid == root:
+            memory["browser"] += rss / 1024
+        else:
+            children.setdefault(ppid, []).append((pid, rss, args))
+    stack = [root]
+    while stack:
+        for pid, rss, args in children.get(stack.pop(), ()):
+            memory[process_kind(args)] += rss / 1024
+            stack.append(pid)
+    memory = {kind: mb for kind, mb in memory.items() if mb or kind == "browser"}
+    memory["total"] = sum(memory.values())
+    return memory
+
+
+def process_tree_memory(root: int) -> dict[str, float]:
+    output = subprocess.run(["ps", "-A", "-o", "pid=,ppid=,rss=,args="],
+                            capture_output=True, text=True, check=True).stdout
+    return tree_memory(parse_ps(output), root)
+
+
+def sample_document(sections: int = SAMPLE_SECTIONS) -> str:
+    """A document with the usual mix of headings, prose, lists, tables and code."""
+    parts = ["# Memory report sample\n"]
+    for i in range(sections):
+        parts.append(
+            f"\n## Section {i}\n\n"
+            "Lorem ipsum dolor sit amet, *consectetur* adipiscing elit, sed do **eiusmod** tempor "
+            "incididunt ut labore et dolore magna aliqua. See [the next section]"
+            f"(#section-{i + 1}).\n\n"
+            "- first item\n- second item with `code`\n- [ ] a task\n\n"
+            "| Name | Value | Note |\n|------|------:|------|\n"
+            f"| alpha | {i} | one |\n| beta | {i * 2} | two |\n\n"
+            f"```python\ndef section_{i}(x):\n    return x * {i}\n```\n"
+        )
+    return "".join(parts)
+
+
+def _command() -> list[str]:
+    if getattr(sys, "frozen", False):
+        return [sys.executable]
+    return [sys.executable, str(Path(__file__).with_name("markwrite.py"))]
+
+
+def _probe_env(home: Path) -> dict[str, str]:
+    """A throwaway home, so probes neither see nor disturb the user's profile, settings or journals."""
+    env = dict(os.environ)
+    env.pop(ENV_VAR, None)
+    env.update({
+        "HOME": str(home),
+        "USERPROFILE": str(home),
+        "XDG_CACHE_HOME": str(home / "cache"),
+        "XDG_CONFIG_HOME": str(home / "config"),
+        "XDG_DATA_HOME": str(home / "data"),
+        "QT_QPA_PLATFORM": env.get("QT_QPA_PLATFORM", "offscreen"),
+    })
+    return env
+
+
+def run_probe(engine_name: str, paths: list[Path]) -> int:
+    """The probe process: load the documents with one engine profile and print its memory as JSON."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import markwrite_gui
+    from markwrite_engine import apply_chromium_flags
+
+    engine = select_engine_profile(engine_name, {}, None)
+    apply_chromium_flags(engine, os.environ)
+    markwrite_gui.register_asset_scheme()
+    app = markwrite_gui.MarkWriteApp([sys.argv[0]], engine)
+    win = app.new_window()
+    started = time.perf_counter()
+    app.open_paths(paths)
+    pending = set()
+    result = {}
+
+    def loaded(tab, _text):
+        pending.discard(tab)
+        if not pending:
+            markwrite_gui.QTimer.singleShot(SETTLE_MS, measure)
+
+    def measure():
+        result["memory"] = process_tree_memory(os.getpid())
+        result["load_ms"] = (time.perf_counter() - started) * 1000
+        app.quit()
+
+    def poll():
+        tabs = [tab for tab in win.all_tabs() if tab.current_path is not None]
+        if len(tabs) < len(paths) or not all(tab.page is not None and tab.page.is_ready for tab in tabs):
+            return
+        timer.stop()
+        # Bridge operations run in order: each answer means that tab's document is in its editor
+        pending.update(tabs)
+        for tab in tabs:
+            tab.page.bridge.request_content("markdown", lambda text, tab=tab: loaded(tab, text))
+
+    timer = markwrite_gui.QTimer(app)
+    timer.timeout.connect(poll)
+    timer.start(100)
+    markwrite_gui.QTimer.singleShot(PROBE_TIMEOUT_S * 1000, app.quit)
+    app.exec()
+    if "memory" not in result:
+        print("markwrite memory-report: the editor did not load the documents in time", file=sys.stderr)
+        return 1
+    result.update(profile=engine.name, tabs=len(paths))
+    print(json.dumps(result))
+    return 0
+
+
+def format_report(results: list[dict]) -> str:
+    names = [result["profile"] for result in results]
+    kinds = [kind for kind in KINDS + ("total",) if any(kind in result["memory"] for result in results)]
+    lines = [f"Resident memory with {results[0]['tabs']} documents open (MB):",
+             f"  {'':<10}" + "".join(f"{name:>10}" for name in names)]
+    for kind in kinds:
+        cells = "".join(
+            f"{result['memory'][kind]:>10.1f}" if kind in result["memory"] else f"{'-':>10}" for result in results
+        )
+        lines.append(f"  {kind:<10}{cells}")
+    base = results[0]["memory"]["total"]
+    for result in results[1:]:
+        if base:
+            change = (result["memory"]["total"] - base) / base * 100
+            lines.append(f"{result['profile']}: {change:+.0f}% total compared with {results[0]['profile']}")
+    return "\n".join(lines)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="markwrite memory-report",
+        description="Compare the resident memory of MarkWrite with the default and the lean engine profile.",
+    )
+    parser.add_argument("paths", nargs="*", type=Path,
+                        help="Markdown files to open (default: copies of a generated sample)")
+    parser.add_argument("--tabs", type=int, default=3, help="copies of the sample to open without paths")
+    parser.add_argument("--profiles", default=",".join(ENGINE_PROFILES),
+                        help="comma-separated engine profiles to compare (default: %(default)s)")
+    parser.add_argument("--json", action="store_true", help="print the measurements as JSON")
+    parser.add_argument("--probe", choices=sorted(ENGINE_PROFILES), help=argparse.SUPPRESS)
+    return parser
+
+
+def run_memory_report(argv: list[str]) -> int:
+    args = build_parser().parse_args(argv)
+    if args.probe:
+        return run_probe(args.probe, [path.resolve() for path in args.paths])
+    if sys.platform == "win32":
+        print("markwrite memory-report: not supported on Windows", file=sys.stderr)
+        return 2
+    profiles = [name.strip() for name in args.profiles.split(",") if name.strip()]
+    unknown = [name for name in profiles if name not in ENGINE_PROFILES]
+    if unknown or not profiles:
+        print(f"markwrite memory-report: unknown engine profile: {', '.join(unknown) or '(none)'}", file=sys.stderr)
+        return 2
+    missing = [str(path) for path in args.paths if not path.is_file()]
+    if missing:
+        print(f"markwrite memory-report: no such file: {', '.join(missing)}", file=sys.stderr)
+        return 2
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="markwrite-memory-") as tmp:
+        paths = [str(path.resolve()) for path in args.paths]
+        if not paths:
+            text = sample_document()
+            for i in range(max(1, args.tabs)):
+                sample = Path(tmp) / f"sample-{i + 1}.md"
+                sample.write_text(text, encoding="utf-8")
+                paths.append(str(sample))
+        for name in profiles:
+            # Each probe gets a fresh home: no caches or settings carried over between profiles
+            home = Path(tmp) / f"home-{name}"
+            home.mkdir()
+            proc = subprocess.run(_command() + ["memory-report", "--probe", name, *paths],
+                                  env=_probe_env(home), capture_output=True, text=True, timeout=PROBE_TIMEOUT_S + 30)
+            lines = proc.stdout.strip().splitlines()
+            if proc.returncode != 0 or not lines:
+                print(f"markwrite memory-report: the {name} probe failed ({proc.returncode}):\n{proc.stderr[-2000:]}",
+                      file=sys.stderr)
+                return 1
+            results.append(json.loads(lines[-1]))
+
+    print(json.dumps(results, indent=1) if args.json else format_report(results))
+    return 0
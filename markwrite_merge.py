@@ -0,0 +1,83 @@
+"""Three-way merge of a document edited in MarkWrite and changed on disk.
+
+Both versions are compared line by line with the text they started from (the
+base: what was last read from or saved to the file). Changes made on only one
+side are taken as they are; where both sides changed the same lines
+differently, both versions are kept between conflict markers, as git does.
+
+This module does not import Qt.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+
+OURS_MARKER = "<<<<<<< edits in MarkWrite\n"
+SEPARATOR = "=======\n"
+THEIRS_MARKER = ">>>>>>> version on disk\n"
+
+
+@dataclass(frozen=True)
+class MergeResult:
+    text: str
+    conflicts: int
+
+
+def _changes(base: list[str], other: list[str]) -> list[tuple[int, int, int, int]]:
+    """Ranges of base replaced in other: (base start, base end, other start, other end)."""
+    matcher = SequenceMatcher(None, base, other, autojunk=False)
+    return [(i1, i2, j1, j2) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+
+
+def _terminated(lines: list[str]) -> list[str]:
+    # A side ending without a newline must not run into the next marker
+    if lines and not lines[-1].endswith("\n"):
+        return lines[:-1] + [lines[-1] + "\n"]
+    return lines
+
+
+def merge3(base: str, ours: str, theirs: str) -> MergeResult:
+    b, o, t = base.splitlines(keepends=True), ours.splitlines(keepends=True), theirs.splitlines(keepends=True)
+    changes = sorted(
+        [(c, 0) for c in _changes(b, o)] + [(c, 1) for c in _changes(b, t)],
+        key=lambda change: change[0][:2],
+    )
+    out: list[str] = []
+    conflicts = 0
+    pos = 0
+    offsets = [0, 0]  # line offset of ours / theirs against base after the changes so far
+    i = 0
+    while i < len(changes):
+        # Group changes that overlap or touch in base; one side never overlaps itself
+        lo, hi = changes[i][0][:2]
+        group = [changes[i]]
+        i += 1
+        while i < len(changes) and changes[i][0][0] <= hi:
+            hi = max(hi, changes[i][0][1])
+            group.append(changes[i])
+            i += 1
+        out.extend(b[pos:lo])
+        segments = []
+        for side, lines in ((0, o), (1, t)):
+            growth = sum((x2 - x1) - (b2 - b1) for (b1, b2, x1, x2), s in group if s == side)
+            start = lo + offsets[side]
+            segments.append(lines[start:hi + offsets[side] + growth])
+            offsets[side] += growth
+        sides = {side for _change, side in group}
+        if len(sides) == 1:
+            out.extend(segments[sides.pop()])
+        elif segments[0] == segments[1]:
+            out.extend(segments[0])
+        else:
+            conflicts += 1
+            if out and not out[-1].endswith("\n"):
+                out[-1] += "\n"
+            out.append(OURS_MARKER)
+            out.extend(_terminated(segments[0]))
+            out.append(SEPARATOR)
+            out.extend(_terminated(segments[1]))
+            out.append(THEIRS_MARKER)
+        pos = hi
+    out.extend(b[pos:])
+    return MergeResult("".join(out), conflicts)
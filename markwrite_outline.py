@@ -0,0 +1,45 @@
+"""Python's copy of a document's outline, as the Outline pane shows it.
+
+The outline plugin of editor_offline.html reports its heading list as splices
+(start, removed count or -1 for everything, new headings) and whether it keeps
+one at all (not in Markdown mode). DocumentOutline applies them, so indices in
+the list are the page's own and can be sent back to jump to a heading.
+
+A tab's page is released when the tab is discarded and a fresh one attached
+when it is shown again. The fresh page starts empty, in WYSIWYG mode, and
+reports only the headings its content adds; page_released() resets the list to
+match, so they are not added a second time.
+
+This module does not import Qt.
+"""
+
+from __future__ import annotations
+
+Heading = tuple[int, str]  # (level, text)
+
+
+class DocumentOutline:
+    def __init__(self):
+        self.headings: list[Heading] = []
+        self.shown = True  # False while the page is in Markdown mode
+
+    def splice(self, start: int, removed: int, headings: list[Heading]):
+        """Replace headings [start, start + removed), or all of them when removed is -1."""
+        if removed < 0:
+            self.headings = list(headings)
+        else:
+            self.headings[start:start + removed] = headings
+
+    def set_shown(self, shown: bool) -> bool:
+        """Follow the page's mode; True if that changed anything."""
+        if shown == self.shown:
+            return False
+        self.shown = shown
+        if not shown:
+            self.headings = []  # the page sends all of it again when it is shown
+        return True
+
+    def page_released(self):
+        """The tab lost its page: start over as the next page will."""
+        self.headings = []
+        self.shown = True
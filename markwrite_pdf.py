@@ -0,0 +1,208 @@
+"""PDF output through QWebEnginePage.printToPdf.
+
+Export documents (see markwrite_html) are rendered by a small set of
+offscreen pages. PdfScheduler bounds both how many pages render at once and
+how much memory they are estimated to need, so a batch of hundreds of
+documents neither runs one at a time nor starts a renderer per document.
+Documents reach the pages through the markwrite:// asset store, which avoids
+the size limit of QWebEnginePage.setHtml().
+"""
+
+from __future__ import annotations
+
+import os
+from collections import deque
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+
+from PySide6.QtCore import QMarginsF, QObject, QSettings, QTimer, QUrl, Signal
+from PySide6.QtGui import QPageLayout, QPageSize
+from PySide6.QtWebEngineCore import QWebEnginePage, QWebEngineProfile, QWebEngineSettings
+
+from markwrite_assets import AssetStore
+
+PAGE_SIZES = {
+    "a3": QPageSize.PageSizeId.A3,
+    "a4": QPageSize.PageSizeId.A4,
+    "a5": QPageSize.PageSizeId.A5,
+    "letter": QPageSize.PageSizeId.Letter,
+    "legal": QPageSize.PageSizeId.Legal,
+    "tabloid": QPageSize.PageSizeId.Tabloid,
+}
+# Pages rendering PDFs at the same time, and the memory they may use together
+MAX_PDF_PAGES = 4
+PDF_MEMORY_LIMIT_BYTES = 1 << 30
+# Estimated cost of a render: a renderer process plus a multiple of the document size
+RENDERER_BASE_BYTES = 64 << 20
+DOCUMENT_MEMORY_FACTOR = 16
+# Unused pages are closed after this long, so their renderers do not linger
+IDLE_PAGE_TIMEOUT_MS = 30 * 1000
+
+
+@dataclass(frozen=True)
+class PdfSettings:
+    page_size: str = "a4"
+    margins_mm: float = 15.0
+    landscape: bool = False
+
+    def page_layout(self) -> QPageLayout:
+        size = QPageSize(PAGE_SIZES.get(self.page_size.lower(), QPageSize.PageSizeId.A4))
+        orientation = QPageLayout.Orientation.Landscape if self.landscape else QPageLayout.Orientation.Portrait
+        m = self.margins_mm
+        return QPageLayout(size, orientation, QMarginsF(m, m, m, m), QPageLayout.Unit.Millimeter)
+
+    def key(self) -> str:
+        """Identifies the layout, e.g. for export manifests."""
+        return f"{self.page_size.lower()}-{self.margins_mm:g}mm{'-landscape' if self.landscape else ''}"
+
+    @classmethod
+    def load(cls, settings: QSettings) -> "PdfSettings":
+        default = cls()
+        page_size = str(settings.value("pdf/page_size", default.page_size)).lower()
+        try:
+            margins = float(settings.value("pdf/margins_mm", default.margins_mm))
+        except (TypeError, ValueError):
+            margins = default.margins_mm
+        landscape = str(settings.value("pdf/landscape", default.landscape)).lower() in ("true", "1")
+        return cls(page_size if page_size in PAGE_SIZES else default.page_size, max(0.0, margins), landscape)
+
+    def save(self, settings: QSettings):
+        settings.setValue("pdf/page_size", self.page_size)
+        settings.setValue("pdf/margins_mm", self.margins_mm)
+        settings.setValue("pdf/landscape", self.landscape)
+
+
+@dataclass
+class _PdfJob:
+    document: bytes
+    output: Path
+    callback: object  # callback(error message or None)
+    asset: str = ""
+
+    def cost(self) -> int:
+        return len(self.document) * DOCUMENT_MEMORY_FACTOR
+
+
+class PdfScheduler(QObject):
+    """Renders export documents to PDF files on a bounded pool of offscreen pages."""
+
+    idle = Signal()  # every submitted document has been handled
+
+    def __init__(self, profile: QWebEngineProfile, store: AssetStore, base_url: str,
+                 settings: PdfSettings = PdfSettings(), max_pages: int = MAX_PDF_PAGES,
+                 memory_limit: int = PDF_MEMORY_LIMIT_BYTES, parent: QObject | None = None):
+        super().__init__(parent)
+        self.profile = profile
+        self.store = store
+        self.base_url = base_url
+        self.settings = settings
+        self._max_pages = max(1, max_pages)
+        self._memory_limit = memory_limit
+        self._queue: deque[_PdfJob] = deque()
+        self._idle_pages: list[QWebEnginePage] = []
+        self._running: dict[QWebEnginePage, _PdfJob] = {}
+        self._next_id = 0
+        self._release_timer = QTimer(self)
+        self._release_timer.setSingleShot(True)
+        self._release_timer.setInterval(IDLE_PAGE_TIMEOUT_MS)
+        self._release_timer.timeout.connect(self._release_idle_pages)
+
+    def submit(self, document: str, output: Path, callback):
+        self._queue.append(_PdfJob(document.encode("utf-8"), output, callback))
+        self._pump()
+
+    def backlog(self) -> int:
+        return len(self._queue) + len(self._running)
+
+    def _estimate(self) -> int:
+        pages = len(self._idle_pages) + len(self._running)
+        return pages * RENDERER_BASE_BYTES + sum(job.cost() for job in self._running.values())
+
+    def _pump(self):
+        while self._queue and len(self._running) < self._max_pages:
+            job = self._queue[0]
+            extra = job.cost() + (0 if self._idle_pages else RENDERER_BASE_BYTES)
+            # Always let one document through, however large, so nothing stalls
+            if self._running and self._estimate() + extra > self._memory_limit:
+                break
+            self._queue.popleft()
+            page = self._idle_pages.pop() if self._idle_pages else self._new_page()
+            self._start(page, job)
+        if not self._queue and not self._running:
+            self._release_timer.start()
+            self.idle.emit()
+
+    def _new_page(self) -> QWebEnginePage:
+        page = QWebEnginePage(self.profile, self)
+        # Export documents are static; no scripts means less work and nothing to run
+        page.settings().setAttribute(QWebEngineSettings.WebAttribute.JavascriptEnabled, False)
+        page.loadFinished.connect(partial(self._on_loaded, page))
+        page.pdfPrintingFinished.connect(partial(self._on_printed, page))
+        page.renderProcessTerminated.connect(partial(self._on_crashed, page))
+        return page
+
+    def _start(self, page: QWebEnginePage, job: _PdfJob):
+        self._release_timer.stop()
+        self._next_id += 1
+        job.asset = f"pdf/{self._next_id}.html"
+        self.store.add(job.asset, job.document, "text/html")
+        self._running[page] = job
+        page.load(QUrl(self.base_url + job.asset))
+
+    def _on_loaded(self, page: QWebEnginePage, ok: bool):
+        job = self._running.get(page)
+        if job is None:
+            return
+        self.store.discard(job.asset)
+        if not ok:
+            self._done(page, f"could not render {job.output.name}")
+            return
+        try:
+            job.output.parent.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            self._done(page, str(e))
+            return
+        page.printToPdf(str(self._temp_path(job.output)), self.settings.page_layout())
+
+    def _on_printed(self, page: QWebEnginePage, path: str, ok: bool):
+        job = self._running.get(page)
+        if job is None:
+            return
+        error = None
+        try:
+            if not ok:
+                raise OSError(f"could not write {path}")
+            os.replace(path, job.output)
+        except OSError as e:
+            error = str(e)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        self._done(page, error)
+
+    def _on_crashed(self, page: QWebEnginePage, *_args):
+        job = self._running.get(page)
+        if job is not None:
+            self.store.discard(job.asset)
+            self._done(page, "renderer process terminated", reuse=False)
+
+    def _done(self, page: QWebEnginePage, error: str | None, reuse: bool = True):
+        job = self._running.pop(page)
+        if reuse:
+            self._idle_pages.append(page)
+        else:
+            page.deleteLater()
+        job.callback(error)
+        self._pump()
+
+    def _release_idle_pages(self):
+        for page in self._idle_pages:
+            page.deleteLater()
+        self._idle_pages.clear()
+
+    @staticmethod
+    def _temp_path(output: Path) -> Path:
+        # Written next to the target and renamed over it, like every other save
+        return output.with_name(f".{output.name}.tmp")
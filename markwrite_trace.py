@@ -0,0 +1,182 @@
+"""Opt-in tracing in Chrome trace-event format: `--trace FILE` or MARKWRITE_TRACE=FILE.
+
+Spans are recorded around file operations (every IOTask), bridge round trips
+between Python and the editor page, and page and tab lifecycle events. The
+editor page records its own spans (loading and reading back documents,
+rendering diagrams) and sends them over the bridge; they are merged in on a
+track per page. At exit everything is written as JSON that chrome://tracing
+and https://ui.perfetto.dev open directly.
+
+Tracing is off unless enable() was called; until then span() returns one
+shared no-op context manager and the other functions return after a single
+check, so the instrumented code paths cost next to nothing.
+
+This module does not import Qt.
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import sys
+import threading
+import time
+
+ENV_VAR = "MARKWRITE_TRACE"
+# Editor pages get their own tracks, numbered from here
+PAGE_TRACK_BASE = 1_000_000
+
+clock = time.perf_counter
+
+
+class Tracer:
+    """Collects trace events in memory; written once, at exit."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pid = os.getpid()
+        # Maps page timestamps (ms since the Unix epoch) onto our clock
+        self._epoch_offset = time.time() - clock()
+        self._events: list[dict] = []
+        self._threads: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _tid(self) -> int:
+        ident = threading.get_ident()
+        tid = self._threads.get(ident)
+        if tid is None:
+            with self._lock:
+                tid = self._threads.setdefault(ident, len(self._threads) + 1)
+                self._events.append(self._metadata("thread_name", tid, threading.current_thread().name))
+        return tid
+
+    def _metadata(self, kind: str, tid: int, name: str) -> dict:
+        return {"name": kind, "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+
+    def _us(self, t: float) -> float:
+        return round(t * 1e6, 1)
+
+    def add(self, event: dict):
+        with self._lock:
+            self._events.append(event)
+
+    def complete(self, name: str, cat: str, start: float, end: float, args: dict | None):
+        event = {"name": name, "cat": cat, "ph": "X", "ts": self._us(start), "dur": self._us(end) - self._us(start),
+                 "pid": self.pid, "tid": self._tid()}
+        if args:
+            event["args"] = args
+        self.add(event)
+
+    def instant(self, name: str, cat: str, args: dict | None):
+        event = {"name": name, "cat": cat, "ph": "i", "s": "t", "ts": self._us(clock()),
+                 "pid": self.pid, "tid": self._tid()}
+        if args:
+            event["args"] = args
+        self.add(event)
+
+    def page_events(self, page: int, events: list):
+        """Merge spans recorded by an editor page: [name, start, duration] in ms, start since the epoch."""
+        tid = PAGE_TRACK_BASE + page
+        merged = []
+        with self._lock:
+            if tid not in self._threads.values():
+                self._threads[-tid] = tid
+                merged.append(self._metadata("thread_name", tid, f"Editor page {page}"))
+        for name, start_ms, duration_ms in events:
+            start = (start_ms / 1000 - self._epoch_offset) * 1e6
+            if duration_ms is None:
+                merged.append({"name": name, "cat": "page", "ph": "i", "s": "t", "ts": round(start, 1),
+                               "pid": self.pid, "tid": tid})
+            else:
+                merged.append({"name": name, "cat": "page", "ph": "X", "ts": round(start, 1),
+                               "dur": round(duration_ms * 1000, 1), "pid": self.pid, "tid": tid})
+        with self._lock:
+            self._events.extend(merged)
+
+    def write(self):
+        with self._lock:
+            events = [self._metadata("process_name", 0, "MarkWrite")] + self._events
+        import json
+        data = {"traceEvents": events, "displayTimeUnit": "ms"}
+        with open(self.path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, separators=(",", ":"))
+
+
+_tracer: Tracer | None = None
+
+
+class _Span:
+    __slots__ = ("name", "cat", "args", "start")
+
+    def __init__(self, name: str, cat: str, args: dict):
+        self.name, self.cat, self.args = name, cat, args
+
+    def __enter__(self):
+        self.start = clock()
+        return self
+
+    def __exit__(self, exc_type, _exc, _tb):
+        tracer = _tracer
+        if tracer is not None:
+            if exc_type is not None:
+                self.args["error"] = exc_type.__name__
+            tracer.complete(self.name, self.cat, self.start, clock(), self.args)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def enable(path: str) -> Tracer:
+    """Start recording; the trace is written to path when the process exits."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(path)
+        atexit.register(_write)
+    return _tracer
+
+
+def _write():
+    if _tracer is not None:
+        try:
+            _tracer.write()
+        except OSError as e:
+            print(f"markwrite: could not write trace {_tracer.path}: {e}", file=sys.stderr)
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, cat: str = "app", **args):
+    """Context manager timing its block."""
+    if _tracer is None:
+        return _NO_SPAN
+    return _Span(name, cat, args)
+
+
+def complete(name: str, start: float, cat: str = "app", **args):
+    """Record a span that started at start (a clock() value) and ends now, e.g. at a callback."""
+    if _tracer is not None:
+        _tracer.complete(name, cat, start, clock(), args)
+
+
+def instant(name: str, cat: str = "app", **args):
+    if _tracer is not None:
+        _tracer.instant(name, cat, args)
+
+
+def page_events(page: int, events: list):
+    if _tracer is not None:
+        _tracer.page_events(page, events)
+
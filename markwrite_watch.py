@@ -0,0 +1,126 @@
+"""Noticing when open documents change on disk.
+
+Local files are watched with QFileSystemWatcher, which costs nothing while
+nothing happens. Bursts of events (an editor writing in steps, a git pull
+touching many files) are coalesced into one notification per file after a
+short quiet period. Files on network file systems, where change notifications
+are unreliable, are polled instead, but only with stat(): the receiver reads
+and hashes a file only when its size or mtime moved (see check_file()).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+
+from PySide6.QtCore import QFileSystemWatcher, QObject, QStorageInfo, QTimer, Signal
+
+from markwrite_io import IO_CHUNK_SIZE, FileState
+
+# Quiet period after the last change event before a file is reported
+DEBOUNCE_MS = 400
+# How often files on network file systems are stat()ed
+POLL_INTERVAL_MS = 5000
+NETWORK_FILESYSTEMS = frozenset({
+    "nfs", "nfs4", "cifs", "smbfs", "smb2", "smb3", "afpfs", "webdav", "davfs", "9p",
+    "fuse.sshfs", "sshfs", "fuse.rclone",
+})
+
+
+def is_network_path(path: Path) -> bool:
+    if str(path).startswith(("\\\\", "//")):
+        return True  # UNC path
+    fs_type = bytes(QStorageInfo(str(Path(path).parent)).fileSystemType()).decode(errors="replace")
+    return fs_type.lower() in NETWORK_FILESYSTEMS
+
+
+def _stat_key(path: Path) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def check_file(path: Path, known: FileState | None, keep_data: bool = True) -> tuple[FileState, bytes | None] | None:
+    """Compare path with what MarkWrite last read or wrote; runs on the I/O worker.
+
+    Returns None if the stat still matches known, without reading anything.
+    Otherwise the file is hashed and (state, data) returned; data is the new
+    content if keep_data is set, else None. A state whose digest equals
+    known's means the file was only touched.
+    """
+    if known is not None and known.matches_disk(path):
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    parts = []
+    with open(path, "rb") as fh:
+        st = os.fstat(fh.fileno())
+        while chunk := fh.read(IO_CHUNK_SIZE):
+            digest.update(chunk)
+            if keep_data:
+                parts.append(chunk)
+    return FileState(digest.hexdigest(), st.st_size, st.st_mtime_ns), b"".join(parts) if keep_data else None
+
+
+class DocumentWatcher(QObject):
+    """Reports changes of a set of files, debounced, via the changed signal."""
+
+    changed = Signal(object)  # Path
+
+    def __init__(self, parent: QObject | None = None):
+        super().__init__(parent)
+        self._paths: set[Path] = set()
+        self._polled: dict[Path, tuple[int, int] | None] = {}
+        self._pending: set[Path] = set()
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_event)
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(DEBOUNCE_MS)
+        self._debounce.timeout.connect(self._flush)
+        self._poll = QTimer(self)
+        self._poll.setInterval(POLL_INTERVAL_MS)
+        self._poll.timeout.connect(self._poll_paths)
+
+    def set_paths(self, paths):
+        """Watch exactly these files."""
+        paths = {Path(p) for p in paths}
+        for path in self._paths - paths:
+            self._watcher.removePath(str(path))
+            self._polled.pop(path, None)
+            self._pending.discard(path)
+        for path in paths - self._paths:
+            if is_network_path(path):
+                self._polled[path] = _stat_key(path)
+            elif path.exists():
+                self._watcher.addPath(str(path))
+        self._paths = paths
+        # No timer runs at all unless a network file is open
+        if self._polled and not self._poll.isActive():
+            self._poll.start()
+        elif not self._polled:
+            self._poll.stop()
+
+    def _on_event(self, path_str: str):
+        path = Path(path_str)
+        if path in self._paths:
+            self._pending.add(path)
+            self._debounce.start()
+
+    def _flush(self):
+        pending, self._pending = self._pending, set()
+        watched = set(self._watcher.files())
+        for path in pending:
+            # Replacing a file (atomic saves, git) ends its watch; watch the new one
+            if path not in self._polled and str(path) not in watched and path.exists():
+                self._watcher.addPath(str(path))
+            self.changed.emit(path)
+
+    def _poll_paths(self):
+        for path, key in list(self._polled.items()):
+            current = _stat_key(path)
+            if current != key:
+                self._polled[path] = current
+                self._on_event(str(path))
@@ -0,0 +1,434 @@
+"""Workspace index: full-text search over a folder of Markdown files.
+
+The index is an SQLite database (one per workspace folder, kept in the user
+data directory) with an FTS5 table over each file's title, headings, text and
+link targets, plus tables of the links (with their line) and of the anchors
+each file defines (see markwrite_links). Updates are incremental:
+files whose size and mtime are unchanged are not read at all, files that were
+only touched are recognised by their hash, and only new or changed files are
+parsed. Parsing runs in a pool of worker processes when there are many files,
+so the first index of a large folder uses all cores.
+
+Queries go through separate read connections (see IndexReader) and return in
+milliseconds on tens of thousands of files; the database is in WAL mode, so
+searching works while an update is being written.
+
+This module does not import Qt, so that worker processes start quickly.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+import os
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+# Bumped whenever the schema or what is extracted changes; older indexes are rebuilt
+INDEX_VERSION = 2
+# Below this many files to parse, a process pool costs more than it saves
+PARALLEL_MIN_FILES = 64
+# Parsed files per worker round trip, and per committed transaction
+BATCH_SIZE = 32
+COMMIT_EVERY = 500
+MAX_WORKERS = 8
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files(
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    title TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS links(file_id INTEGER NOT NULL, target TEXT NOT NULL, line INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS links_file ON links(file_id);
+CREATE TABLE IF NOT EXISTS anchors(file_id INTEGER NOT NULL, anchor TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS anchors_file ON anchors(file_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5(
+    title, headings, body, links, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+_FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_HEADING = re.compile(r"^ {0,3}(#{1,6})[ \t]+(.*?)(?:[ \t]+#+)?[ \t]*$")
+_LINK = re.compile(r"!?\[(?:[^\]\\]|\\.)*\]\(\s*<?([^)\s>]+)>?(?:\s+[\"'(][^)]*)?\)")
+_AUTOLINK = re.compile(r"<((?:https?|mailto|ftp):[^>\s]+)>")
+_LINK_DEFINITION = re.compile(r"^ {0,3}\[[^\]]+\]:\s*<?([^\s>]+)>?")
+_HTML_ANCHOR = re.compile(r"<a\s[^>]*?\b(?:id|name)\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+_INLINE_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_TAG = re.compile(r"<[^>]+>")
+_NOT_SLUG = re.compile(r"[^\w\- ]")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def slugify(heading: str) -> str:
+    """The anchor of a heading, as GitHub and most static site generators make it."""
+    text = _TAG.sub("", _INLINE_LINK.sub(r"\1", heading)).strip().lower()
+    return _NOT_SLUG.sub("", text).replace(" ", "-")
+
+
+@dataclass(frozen=True)
+class Extract:
+    """What the index keeps of one Markdown file."""
+
+    title: str
+    headings: tuple[str, ...]
+    links: tuple[tuple[str, int], ...]  # (target, line number)
+    anchors: tuple[str, ...]  # heading slugs (repeats numbered) and HTML anchors
+
+
+def extract(text: str, fallback_title: str = "") -> Extract:
+    """Headings, links and anchors of a document, ignoring fenced code."""
+    headings, links, anchors = [], [], []
+    slugs: dict[str, int] = {}
+    fence = None
+    for number, line in enumerate(text.splitlines(), 1):
+        match = _FENCE.match(line)
+        if match:
+            marker = match.group(1)
+            if fence is None:
+                fence = marker[0] * len(marker)
+            elif marker.startswith(fence):
+                fence = None
+            continue
+        if fence is not None:
+            continue
+        heading = _HEADING.match(line)
+        if heading:
+            headings.append(heading.group(2))
+            slug = slugify(heading.group(2))
+            # Repeated headings get -1, -2, ... appended
+            repeat = slugs.get(slug, 0)
+            slugs[slug] = repeat + 1
+            anchors.append(f"{slug}-{repeat}" if repeat else slug)
+        definition = _LINK_DEFINITION.match(line)
+        if definition:
+            links.append((definition.group(1), number))
+        elif "](" in line or "<" in line:
+            links.extend((target, number) for target in _LINK.findall(line))
+            links.extend((target, number) for target in _AUTOLINK.findall(line))
+            anchors.extend(_HTML_ANCHOR.findall(line))
+    title = headings[0] if headings else fallback_title
+    return Extract(title, tuple(headings), tuple(links), tuple(anchors))
+
+
+@dataclass(frozen=True)
+class _Parsed:
+    path: str
+    size: int
+    mtime_ns: int
+    digest: str
+    text: str | None  # None: content unchanged (or unreadable, with error set)
+    extract: Extract | None
+    error: str | None = None
+
+
+def _parse(root: str, path: str, known_digest: str | None) -> _Parsed:
+    """Read, hash and extract one file; runs in a worker process."""
+    try:
+        with open(os.path.join(root, path), "rb") as fh:
+            st = os.fstat(fh.fileno())
+            data = fh.read()
+    except OSError as e:
+        return _Parsed(path, 0, 0, "", None, None, str(e))
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    if digest == known_digest:
+        return _Parsed(path, st.st_size, st.st_mtime_ns, digest, None, None)
+    text = data.decode("utf-8", errors="replace")
+    return _Parsed(path, st.st_size, st.st_mtime_ns, digest, text, extract(text, Path(path).stem))
+
+
+def _parse_batch(root: str, batch: list[tuple[str, str | None]]) -> list[_Parsed]:
+    return [_parse(root, path, digest) for path, digest in batch]
+
+
+def scan(root: Path):
+    """(relative posix path, size, mtime_ns) of every Markdown file below root, skipping hidden directories."""
+    stack = [Path(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                elif entry.name.lower().endswith(MARKDOWN_SUFFIXES) and entry.is_file():
+                    st = entry.stat()
+                    yield Path(entry.path).relative_to(root).as_posix(), st.st_size, st.st_mtime_ns
+            except OSError:
+                continue
+
+
+def index_path(data_dir: Path, root: Path) -> Path:
+    """Where the index of the folder root is kept below the user data directory."""
+    key = hashlib.blake2b(str(Path(root).resolve()).encode("utf-8"), digest_size=16).hexdigest()
+    return Path(data_dir) / "workspaces" / f"{key}.sqlite3"
+
+
+@dataclass(frozen=True)
+class UpdateStats:
+    indexed: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    failed: int = 0
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    path: Path
+    title: str
+    snippet: str
+
+
+def _match_query(text: str) -> str | None:
+    """An FTS5 query matching every word of text, the last one as a prefix."""
+    words = _WORD.findall(text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+
+class WorkspaceIndex:
+    """The search index of one folder.
+
+    update() may run on any thread (it opens its own connection); queries
+    use a connection owned by the thread that first queries. Queries on other
+    threads go through a reader() of their own.
+    """
+
+    def __init__(self, root: Path, db_path: Path):
+        self.root = Path(root).resolve()
+        self.db_path = Path(db_path)
+        self._reader: IndexReader | None = None
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self.connect()
+        try:
+            version = None
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+                version = row[0] if row else None
+            except sqlite3.OperationalError:
+                pass
+            if version != str(INDEX_VERSION):
+                conn.executescript("DROP TABLE IF EXISTS meta; DROP TABLE IF EXISTS files;"
+                                   "DROP TABLE IF EXISTS links; DROP TABLE IF EXISTS anchors;"
+                                   "DROP TABLE IF EXISTS search;")
+            conn.executescript(_SCHEMA)
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(INDEX_VERSION),))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('root', ?)", (str(self.root),))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def connect(self) -> sqlite3.Connection:
+        """A new connection to the index, for use on the calling thread."""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def close(self):
+        """Close the connection of the index's own queries; readers are closed by their owners."""
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    # -------- Updating --------
+    def update(self, paths=None, workers: int | None = None, progress=None, check_cancelled=None) -> UpdateStats:
+        """Bring the index up to date with the folder, or with just the given files.
+
+        progress(done, total) is called as files are parsed; check_cancelled()
+        may raise to stop, leaving everything committed so far in place.
+        """
+        conn = self.connect()
+        try:
+            return self._update(conn, paths, workers, progress, check_cancelled)
+        finally:
+            conn.close()
+
+    def _update(self, conn, paths, workers, progress, check_cancelled) -> UpdateStats:
+        known = {
+            path: (file_id, size, mtime_ns, digest)
+            for file_id, path, size, mtime_ns, digest in conn.execute(
+                "SELECT id, path, size, mtime_ns, digest FROM files"
+            )
+        }
+        if paths is None:
+            on_disk = {path: (size, mtime_ns) for path, size, mtime_ns in scan(self.root)}
+            gone = [path for path in known if path not in on_disk]
+        else:
+            on_disk, gone = {}, []
+            for path in paths:
+                relative = Path(path).resolve().relative_to(self.root).as_posix()
+                try:
+                    st = os.stat(self.root / relative)
+                    on_disk[relative] = (st.st_size, st.st_mtime_ns)
+                except OSError:
+                    if relative in known:
+                        gone.append(relative)
+        stale = [
+            (path, known[path][3] if path in known else None)
+            for path, (size, mtime_ns) in on_disk.items()
+            if path not in known or known[path][1:3] != (size, mtime_ns)
+        ]
+        for path in gone:
+            self._delete(conn, known[path][0])
+        conn.commit()
+
+        indexed = unchanged = failed = 0
+        batches = [stale[i:i + BATCH_SIZE] for i in range(0, len(stale), BATCH_SIZE)]
+        root = str(self.root)
+        pool = None
+        if len(stale) >= PARALLEL_MIN_FILES and workers != 0:
+            # Spawned, not forked: the parent may be running Qt threads
+            pool = ProcessPoolExecutor(
+                max_workers=workers or min(os.cpu_count() or 1, MAX_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            results = pool.map(_parse_batch, [root] * len(batches), batches)
+        else:
+            results = (_parse_batch(root, batch) for batch in batches)
+        try:
+            done = since_commit = 0
+            for batch in results:
+                for parsed in batch:
+                    if parsed.error is not None:
+                        failed += 1
+                    elif parsed.extract is None:
+                        unchanged += 1
+                        conn.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?",
+                                     (parsed.size, parsed.mtime_ns, parsed.path))
+                    else:
+                        indexed += 1
+                        self._store(conn, known.get(parsed.path, (None,))[0], parsed)
+                done += len(batch)
+                since_commit += len(batch)
+                if since_commit >= COMMIT_EVERY:
+                    conn.commit()
+                    since_commit = 0
+                if progress is not None:
+                    progress(done, len(stale))
+                if check_cancelled is not None:
+                    check_cancelled()
+            conn.commit()
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+        return UpdateStats(indexed, unchanged + len(on_disk) - len(stale), len(gone), failed)
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, file_id: int):
+        conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+        conn.execute("DELETE FROM links WHERE file_id = ?", (file_id,))
+        conn.execute("DELETE FROM anchors WHERE file_id = ?", (file_id,))
+        conn.execute("DELETE FROM search WHERE rowid = ?", (file_id,))
+
+    @staticmethod
+    def _store(conn: sqlite3.Connection, file_id: int | None, parsed: _Parsed):
+        info = parsed.extract
+        name = parsed.path.rsplit("/", 1)[-1]
+        if file_id is None:
+            file_id = conn.execute(
+                "INSERT INTO files(path, name, size, mtime_ns, digest, title) VALUES (?, ?, ?, ?, ?, ?)",
+                (parsed.path, name, parsed.size, parsed.mtime_ns, parsed.digest, info.title),
+            ).lastrowid
+        else:
+            conn.execute(
+                "UPDATE files SET size = ?, mtime_ns = ?, digest = ?, title = ? WHERE id = ?",
+                (parsed.size, parsed.mtime_ns, parsed.digest, info.title, file_id),
+            )
+            conn.execute("DELETE FROM links WHERE file_id = ?", (file_id,))
+            conn.execute("DELETE FROM anchors WHERE file_id = ?", (file_id,))
+            conn.execute("DELETE FROM search WHERE rowid = ?", (file_id,))
+        conn.executemany("INSERT INTO links VALUES (?, ?, ?)", [(file_id, *link) for link in info.links])
+        conn.executemany("INSERT INTO anchors VALUES (?, ?)", [(file_id, anchor) for anchor in info.anchors])
+        conn.execute(
+            "INSERT INTO search(rowid, title, headings, body, links) VALUES (?, ?, ?, ?, ?)",
+            (file_id, info.title, "\n".join(info.headings), parsed.text,
+             "\n".join(target for target, _line in info.links)),
+        )
+
+    # -------- Queries --------
+    def reader(self) -> IndexReader:
+        """Queries over a connection of their own, e.g. for a query worker thread."""
+        return IndexReader(self.root, sqlite3.connect(self.db_path, timeout=10, check_same_thread=False))
+
+    def _own_reader(self) -> IndexReader:
+        if self._reader is None:
+            self._reader = IndexReader(self.root, self.connect())
+        return self._reader
+
+    def file_count(self) -> int:
+        return self._own_reader().file_count()
+
+    def find_files(self, text: str, limit: int = 20) -> list[Path]:
+        return self._own_reader().find_files(text, limit)
+
+    def search(self, text: str, limit: int = 50) -> list[SearchHit]:
+        return self._own_reader().search(text, limit)
+
+
+class IndexReader:
+    """Read-only queries of a WorkspaceIndex through one connection.
+
+    A reader from WorkspaceIndex.reader() may be used by any one thread at a
+    time, so it can move between the threads of a pool; interrupt() may be
+    called from any thread to stop the query that is running.
+    """
+
+    def __init__(self, root: Path, conn: sqlite3.Connection):
+        self.root = root
+        self._conn = conn
+
+    def close(self):
+        self._conn.close()
+
+    def interrupt(self):
+        """Abort the running query (it raises sqlite3.OperationalError); a no-op when idle."""
+        self._conn.interrupt()
+
+    def _query(self, sql: str, args=()) -> list[tuple]:
+        return self._conn.execute(sql, args).fetchall()
+
+    def file_count(self) -> int:
+        return self._query("SELECT count(*) FROM files")[0][0]
+
+    def find_files(self, text: str, limit: int = 20) -> list[Path]:
+        """Quick open: files whose name contains text, names starting with it first."""
+        text = text.strip()
+        if not text:
+            return []
+        pattern = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        rows = self._query(
+            "SELECT path FROM files WHERE name LIKE ? ESCAPE '\\' "
+            "ORDER BY name NOT LIKE ? ESCAPE '\\', length(name), path LIMIT ?",
+            (f"%{pattern}%", f"{pattern}%", limit),
+        )
+        return [self.root / path for (path,) in rows]
+
+    def search(self, text: str, limit: int = 50) -> list[SearchHit]:
+        """Files containing every word of text (the last as a prefix), best matches first."""
+        query = _match_query(text)
+        if query is None:
+            return []
+        rows = self._query(
+            "SELECT files.path, files.title, snippet(search, 2, '«', '»', '…', 12) "
+            "FROM search JOIN files ON files.id = search.rowid "
+            "WHERE search MATCH ? ORDER BY bm25(search, 10.0, 5.0, 1.0, 2.0) LIMIT ?",
+            (query, limit),
+        )
+        return [SearchHit(self.root / path, title, " ".join(snippet.split())) for path, title, snippet in rows]
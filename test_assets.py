@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-memory asset store in markwrite_assets
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import markwrite_assets
+from markwrite_assets import AssetStore
+
+
+def test_preload_serves_editor_assets_from_memory(tmp_path):
+    root = Path(__file__).parent
+    store = AssetStore(root)
+    store.preload()
+    resident = store.resident_bytes()
+
+    page = store.get("/editor_offline.html")
+
+    assert page.mime == "text/html"
+    assert b"toastui-editor-all.min.js" in page.body()
+    assert store.get("assets/js/toastui-editor-all.min.js").mime == "text/javascript"
+    assert store.resident_bytes() == resident
+
+
+def test_files_outside_root_are_not_served(tmp_path):
+    (tmp_path / "secret.txt").write_text("no", encoding="utf-8")
+    root = tmp_path / "app"
+    root.mkdir()
+
+    store = AssetStore(root)
+
+    assert store.get("../secret.txt") is None
+    assert store.get("missing.js") is None
+
+
+def test_compressed_assets_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(markwrite_assets, "COMPRESS_MIN_BYTES", 16)
+    data = b"body { color: red; }\n" * 200
+    (tmp_path / "big.css").write_bytes(data)
+
+    store = AssetStore(tmp_path, compress=True)
+    asset = store.get("big.css")
+
+    assert asset.compressed
+    assert len(asset.data) < len(data)
+    assert asset.body() == data
+    assert asset.mime == "text/css"
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the engine profiles in markwrite_engine and the memory report of markwrite_memory
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from markwrite_engine import (
+    CHROMIUM_FLAGS_VAR, DEFAULT_PROFILE, ENV_VAR, LEAN_PROFILE, apply_chromium_flags, select_engine_profile
+)
+from markwrite_memory import format_report, parse_ps, process_kind, tree_memory
+
+
+def test_profile_selection_order():
+    assert select_engine_profile(None, {}, None) is DEFAULT_PROFILE
+    assert select_engine_profile(None, {}, "lean") is LEAN_PROFILE
+    assert select_engine_profile(None, {ENV_VAR: "Lean"}, "default") is LEAN_PROFILE
+    assert select_engine_profile("default", {ENV_VAR: "lean"}, "lean") is DEFAULT_PROFILE
+    assert select_engine_profile("tiny", {}, "lean") is DEFAULT_PROFILE
+
+
+def test_chromium_flags_keep_the_users():
+    environ = {}
+    apply_chromium_flags(DEFAULT_PROFILE, environ)
+    assert environ == {}
+
+    environ = {CHROMIUM_FLAGS_VAR: "--disable-gpu --renderer-process-limit=2"}
+    apply_chromium_flags(LEAN_PROFILE, environ)
+    flags = environ[CHROMIUM_FLAGS_VAR].split()
+    assert flags.count("--disable-gpu") == 1
+    # A user's own value comes last and so takes precedence
+    assert flags[-2:] == ["--disable-gpu", "--renderer-process-limit=2"]
+    assert "--renderer-process-limit=1" in flags
+
+
+PS_OUTPUT = """\
+    1     0   9448 /sbin/init
+  100     1 204800 python markwrite.py memory-report --probe lean
+  101   100  51200 /usr/lib/qt6/libexec/QtWebEngineProcess --type=zygote --lang=en
+  102   101 153600 /usr/lib/qt6/libexec/QtWebEngineProcess --type=renderer --lang=en
+  103   100  81920 /usr/lib/qt6/libexec/QtWebEngineProcess --type=gpu-process
+  104   100  20480 /usr/lib/qt6/libexec/QtWebEngineProcess --type=utility --utility-sub-type=network.mojom
+  105   100  10240 /usr/lib/qt6/libexec/QtWebEngineProcess --type=broker
+  200     1  99999 unrelated
+garbage line
+"""
+
+
+def test_tree_memory_groups_processes_by_kind():
+    assert process_kind("QtWebEngineProcess --type=gpu-process") == "gpu"
+    assert process_kind("QtWebEngineProcess --type=broker") == "utility"
+    assert process_kind("python -c pass") == "other"
+
+    memory = tree_memory(parse_ps(PS_OUTPUT), 100)
+
+    assert memory == {"browser": 200.0, "renderer": 150.0, "gpu": 80.0, "utility": 30.0, "zygote": 50.0,
+                      "total": 510.0}
+
+
+def test_format_report():
+    report = format_report([
+        {"profile": "default", "tabs": 3, "memory": {"browser": 200.0, "renderer": 300.0, "total": 500.0}},
+        {"profile": "lean", "tabs": 3, "memory": {"browser": 150.0, "total": 150.0}},
+    ])
+    lines = report.splitlines()
+    assert lines[0] == "Resident memory with 3 documents open (MB):"
+    assert lines[3].split() == ["renderer", "300.0", "-"]
+    assert lines[-1] == "lean: -70% total compared with default"
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for planning `markwrite export` runs in markwrite_export
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from markwrite_export import MANIFEST_NAME, ExportManifest, plan_export
+from markwrite_io import FileState, content_digest
+
+
+def _record_export(manifest: ExportManifest, name: str, source: Path, output: Path):
+    data = source.read_bytes()
+    st = source.stat()
+    manifest.record_export(name, FileState(content_digest(data), st.st_size, st.st_mtime_ns))
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text("<p>done</p>", encoding="utf-8")
+    manifest.save()
+
+
+def test_plan_maps_tree_to_output_and_skips_hidden_dirs(tmp_path):
+    src = tmp_path / "docs"
+    (src / "guide").mkdir(parents=True)
+    (src / ".git").mkdir()
+    (src / "index.md").write_text("# Index\n", encoding="utf-8")
+    (src / "guide" / "setup.markdown").write_text("# Setup\n", encoding="utf-8")
+    (src / "guide" / "notes.txt").write_text("not markdown\n", encoding="utf-8")
+    (src / ".git" / "HEAD.md").write_text("hidden\n", encoding="utf-8")
+
+    jobs, manifests, skipped = plan_export([src], tmp_path / "out", "r1")
+
+    assert skipped == 0
+    assert [job.name for job in jobs] == ["index.md", "guide/setup.markdown"]
+    assert {job.output for job in jobs} == {
+        (tmp_path / "out" / "index.html").resolve(),
+        (tmp_path / "out" / "guide" / "setup.html").resolve(),
+    }
+    assert manifests[0].path == (tmp_path / "out" / MANIFEST_NAME).resolve()
+
+
+def test_plan_skips_unchanged_sources_until_forced_or_renderer_changes(tmp_path):
+    src = tmp_path / "docs"
+    src.mkdir()
+    source = src / "a.md"
+    source.write_text("# A\n", encoding="utf-8")
+    jobs, manifests, _skipped = plan_export([src], None, "r1")
+    _record_export(manifests[0], jobs[0].name, source, jobs[0].output)
+
+    assert plan_export([src], None, "r1")[0] == []
+    assert plan_export([src], None, "r1")[2] == 1
+    assert len(plan_export([src], None, "r1", force=True)[0]) == 1
+    assert len(plan_export([src], None, "r2")[0]) == 1
+
+    # A touched file is planned again; its content hash decides later
+    os.utime(source, ns=(source.stat().st_atime_ns, source.stat().st_mtime_ns + 1_000_000))
+    assert len(plan_export([src], None, "r1")[0]) == 1
+
+
+def test_manifest_survives_round_trip(tmp_path):
+    manifest = ExportManifest(tmp_path / MANIFEST_NAME, "r1")
+    manifest.files["a.md"] = FileState("abc", 3, 42)
+    manifest.save()
+
+    assert ExportManifest.load(manifest.path, "r1").files == {"a.md": FileState("abc", 3, 42)}
+    assert ExportManifest.load(manifest.path, "other").files == {}
+
+
+def test_manifest_keeps_errors_until_the_source_exports(tmp_path):
+    src = tmp_path / "docs"
+    src.mkdir()
+    source = src / "a.md"
+    source.write_text("# A\n", encoding="utf-8")
+    jobs, manifests, _skipped = plan_export([src], None, "r1")
+    manifests[0].record_failure("a.md", "editor page failed to load")
+    manifests[0].save()
+
+    jobs, manifests, _skipped = plan_export([src], None, "r1")
+    assert [job.name for job in jobs] == ["a.md"]
+    assert manifests[0].errors == {"a.md": "editor page failed to load"}
+    _record_export(manifests[0], "a.md", source, jobs[0].output)
+    assert ExportManifest.load(manifests[0].path, "r1").errors == {}
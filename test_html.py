@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for standalone HTML export documents in markwrite_html
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from markwrite_html import CONTENTS_CLASS, StyleSheet, html_document, used_elements
+
+CSS = (
+    "/*! license */"
+    ".toastui-editor-contents p{margin:10px 0}"
+    ".toastui-editor-contents table,.toastui-editor-toolbar{border:0}"
+    ".toastui-editor-toolbar button{color:red}"
+    ".toastui-editor-contents :not(table){line-height:160%}"
+    '.toastui-editor-contents .task-list-item[data-task]:before{content:"{"}'
+    "@media (max-width:480px){.toastui-editor-popup{width:90%}.toastui-editor-contents p{margin:0}}"
+    "@media print{.toastui-editor-toolbar{display:none}}"
+)
+
+
+def test_used_elements_collects_tags_classes_and_ids():
+    used = used_elements('<h2 id="intro">A</h2><ul><li class="task-list-item checked">x</li></ul>')
+
+    assert {"h2", "ul", "li", "body"} <= used.tags
+    assert {"task-list-item", "checked", CONTENTS_CLASS} <= used.classes
+    assert used.ids == {"intro"}
+
+
+def test_prune_keeps_only_rules_for_used_elements():
+    sheet = StyleSheet(CSS)
+
+    css = sheet.prune(used_elements("<p>Hello</p>"))
+
+    assert css.startswith("/*! license */")
+    assert ".toastui-editor-contents p{margin:10px 0}" in css
+    assert ".toastui-editor-contents :not(table){line-height:160%}" in css
+    assert "@media (max-width:480px){.toastui-editor-contents p{margin:0}}" in css
+    assert "toolbar" not in css
+    assert "popup" not in css
+    assert "task-list-item" not in css
+
+
+def test_prune_keeps_a_rule_if_any_selector_matches_and_handles_braces_in_strings():
+    sheet = StyleSheet(CSS)
+
+    css = sheet.prune(used_elements('<table></table><ul><li class="task-list-item">t</li></ul>'))
+
+    assert ".toastui-editor-contents table,.toastui-editor-toolbar{border:0}" in css
+    assert '.toastui-editor-contents .task-list-item[data-task]:before{content:"{"}' in css
+
+
+def test_pruned_css_is_cached_per_element_set():
+    sheet = StyleSheet(CSS)
+
+    first = sheet.prune(used_elements("<p>one</p>"))
+    second = sheet.prune(used_elements("<p>two <p>three</p></p>"))
+
+    assert second is first
+
+
+def test_html_document_is_complete_and_escapes_title():
+    doc = html_document("<p>Hi</p>", "Q&A <draft>", StyleSheet(CSS))
+
+    assert doc.startswith("<!DOCTYPE html>")
+    assert "<title>Q&amp;A &lt;draft&gt;</title>" in doc
+    assert f'<div class="{CONTENTS_CLASS}">\n<p>Hi</p>\n</div>' in doc
+    assert ".toastui-editor-contents p{margin:10px 0}" in doc
+
+
+def test_html_document_sets_base_url_only_when_given():
+    assert "<base " not in html_document("<p>Hi</p>", "T", None)
+
+    doc = html_document('<img src="assets/x.png">', "T", None, base_url="markwrite://doc/abc/")
+
+    assert '<base href="markwrite://doc/abc/">' in doc
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for storing pasted images next to documents in markwrite_images
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice
+from PySide6.QtGui import QColor, QImage
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from markwrite_images import (
+    IMAGE_DIR, DocumentDirectories, copy_images, referenced_images, store_image, thumbnail
+)
+
+
+def _png(width: int, height: int) -> bytes:
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(QColor("teal"))
+    out = QByteArray()
+    buffer = QBuffer(out)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(out)
+
+
+def test_store_image_is_content_addressed(tmp_path):
+    data = _png(4, 4)
+
+    first = store_image(tmp_path, data, "image/png")
+    second = store_image(tmp_path, data, "image/png")
+
+    assert first == second
+    assert first.startswith(f"{IMAGE_DIR}/") and first.endswith(".png")
+    assert (tmp_path / first).read_bytes() == data
+    assert len(list((tmp_path / IMAGE_DIR).iterdir())) == 1
+    with pytest.raises(ValueError):
+        store_image(tmp_path, b"%PDF", "application/pdf")
+
+
+def test_copy_images_carries_referenced_images_only(tmp_path):
+    source, target = tmp_path / "a", tmp_path / "b"
+    used = store_image(source, _png(2, 2), "image/png")
+    unused = store_image(source, _png(3, 3), "image/png")
+    text = f"# Doc\n\n![shot]({used})\n\n![web](https://example.com/{unused})\n"
+
+    assert referenced_images(text) == {Path(used).name}
+    assert copy_images(text, source, target) == 1
+    assert copy_images(text, source, target) == 0
+    assert [p.name for p in (target / IMAGE_DIR).iterdir()] == [Path(used).name]
+
+
+def test_thumbnail_downscales_large_images_only(tmp_path):
+    small = tmp_path / store_image(tmp_path, _png(10, 10), "image/png")
+    large = tmp_path / store_image(tmp_path, _png(400, 100), "image/png")
+
+    assert thumbnail(small, max_px=50) == (small.read_bytes(), "image/png")
+    data, mime = thumbnail(large, max_px=50)
+    image = QImage.fromData(data)
+    assert mime == "image/png"
+    assert (image.width(), image.height()) == (50, 12)
+
+
+def test_document_directories_resolve_only_images_below_directory(tmp_path):
+    docs = tmp_path / "docs"
+    image = docs / store_image(docs, _png(2, 2), "image/png")
+    (docs / "notes.md").write_text("# Notes\n", encoding="utf-8")
+    (tmp_path / "secret.png").write_bytes(b"x")
+    directories = DocumentDirectories("markwrite://doc/")
+
+    base = directories.url(docs)
+    token = base.removeprefix("markwrite://doc/").rstrip("/")
+
+    assert directories.resolve(f"/{token}/{IMAGE_DIR}/{image.name}") == image.resolve()
+    assert directories.resolve(f"/{token}/notes.md") is None
+    assert directories.resolve(f"/{token}/../secret.png") is None
+    assert directories.resolve(f"/unknown/{IMAGE_DIR}/{image.name}") is None
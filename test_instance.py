@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-instance request format of markwrite_instance
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from markwrite_instance import decode_request, encode_request
+
+
+def test_request_round_trip(tmp_path):
+    paths = [tmp_path / "a.md", tmp_path / "dir with spaces" / "ü.md"]
+
+    line = encode_request(paths)
+
+    assert line.endswith(b"\n") and line.count(b"\n") == 1
+    assert decode_request(line) == paths
+    assert decode_request(b"{}\n") == []
+
+
+@pytest.mark.parametrize("line", [
+    b"not json\n",
+    b"\xff\xfe\n",
+    b"[]\n",
+    b"null\n",
+    b'"open"\n',
+    b'{"open": 5}\n',
+    b'{"open": "a.md"}\n',
+    b'{"open": {"a.md": true}}\n',
+    b'{"open": ["a.md", 5]}\n',
+    b'{"open": [null]}\n',
+    b'{"open": [""]}\n',
+])
+def test_malformed_requests_are_value_errors(line):
+    with pytest.raises(ValueError):
+        decode_request(line)
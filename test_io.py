@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the atomic, hash-skipping save path in markwrite_io
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from markwrite_io import IOCancelled, SaveTask, atomic_write_bytes
+
+
+def test_atomic_write_replaces_content_and_keeps_mode(tmp_path):
+    target = tmp_path / "note.md"
+    target.write_text("old", encoding="utf-8")
+    os.chmod(target, 0o640)
+
+    atomic_write_bytes(target, "new".encode("utf-8"))
+
+    assert target.read_text(encoding="utf-8") == "new"
+    assert target.stat().st_mode & 0o777 == 0o640
+    assert [p.name for p in tmp_path.iterdir()] == ["note.md"]
+
+
+def test_cancelled_atomic_write_leaves_target_untouched(tmp_path):
+    target = tmp_path / "note.md"
+    target.write_text("keep me", encoding="utf-8")
+
+    def cancel():
+        raise IOCancelled()
+
+    with pytest.raises(IOCancelled):
+        atomic_write_bytes(target, b"x" * 10, check_cancelled=cancel)
+
+    assert target.read_text(encoding="utf-8") == "keep me"
+    assert [p.name for p in tmp_path.iterdir()] == ["note.md"]
+
+
+def test_save_task_skips_unchanged_content(tmp_path):
+    target = tmp_path / "note.md"
+    first = SaveTask(target, "# Title\n", previous=None).work()
+    assert not first.skipped
+
+    second = SaveTask(target, "# Title\n", previous=first.state).work()
+    assert second.skipped
+    assert second.state == first.state
+
+    third = SaveTask(target, "# Other\n", previous=first.state).work()
+    assert not third.skipped
+    assert target.read_text(encoding="utf-8") == "# Other\n"
+
+
+def test_save_task_rewrites_when_file_changed_on_disk(tmp_path):
+    target = tmp_path / "note.md"
+    first = SaveTask(target, "same\n", previous=None).work()
+    target.write_text("edited elsewhere\n", encoding="utf-8")
+
+    again = SaveTask(target, "same\n", previous=first.state).work()
+
+    assert not again.skipped
+    assert target.read_text(encoding="utf-8") == "same\n"
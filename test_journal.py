@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for the autosave journal in markwrite_journal
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import markwrite_journal
+from markwrite_journal import Journal, JournalStore, replay
+
+
+def test_replay_applies_utf16_deltas(tmp_path):
+    journal = Journal(tmp_path / "a.mwjournal", None)
+    journal.write_checkpoint("Hi 😀 there\n")
+    # "😀" is two UTF-16 code units, so " there" starts at offset 5
+    journal.append_replace(5, 11, " world")
+    journal.append_replace(0, 2, "Hello")
+
+    _header, text = replay(journal.path)
+
+    assert text == "Hello 😀 world\n"
+
+
+def test_replay_ignores_torn_last_record(tmp_path):
+    journal = Journal(tmp_path / "a.mwjournal", tmp_path / "note.md")
+    journal.write_checkpoint("abc")
+    journal.append_replace(3, 3, "d")
+    with open(journal.path, "ab") as fh:
+        fh.write(b'{"op": "replace", "start": 0, "en')
+
+    header, text = replay(journal.path)
+
+    assert header["source"] == str(tmp_path / "note.md")
+    assert text == "abcd"
+
+
+def test_compaction_rewrites_a_single_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(markwrite_journal, "COMPACT_MIN_BYTES", 64)
+    journal = Journal(tmp_path / "a.mwjournal", None)
+    journal.write_checkpoint("x")
+    for i in range(20):
+        journal.append_replace(0, 0, "y")
+    assert journal.needs_compaction()
+
+    journal.compact()
+
+    records = [json.loads(line) for line in journal.path.read_bytes().splitlines()]
+    assert [r["op"] for r in records] == ["header", "checkpoint"]
+    assert records[1]["text"] == "y" * 20 + "x"
+    assert not journal.needs_compaction()
+
+
+def test_recoverable_skips_journals_of_running_processes(tmp_path):
+    store = JournalStore(tmp_path)
+    live = store.create(None)
+    live.write_checkpoint("mine")
+    orphan = store.create(tmp_path / "lost.md")
+    orphan.write_checkpoint("lost")
+    records = orphan.path.read_text(encoding="utf-8").splitlines()
+    header = json.loads(records[0])
+    header["pid"] = 0
+    orphan.path.write_text(json.dumps(header) + "\n" + records[1] + "\n", encoding="utf-8")
+
+    entries = store.recoverable()
+
+    assert [entry.path for entry in entries] == [orphan.path]
+    assert entries[0].display_name() == "lost.md"
+
+
+
+def test_recoverable_offers_journals_whose_pid_was_reused(tmp_path, monkeypatch):
+    store = JournalStore(tmp_path)
+    journal = store.create(tmp_path / "lost.md")
+    journal.write_checkpoint("lost")
+    header, _text = replay(journal.path)
+    assert header["pid"] == os.getpid()
+    assert store.recoverable() == []
+
+    # The PID is running again, but as a process that started at another time
+    monkeypatch.setattr(markwrite_journal, "_process_started", lambda pid: header["started"] + 1)
+
+    assert [entry.path for entry in store.recoverable()] == [journal.path]
+
+def test_enforce_limits_evicts_oldest_first(tmp_path, monkeypatch):
+    store = JournalStore(tmp_path)
+    journals = []
+    for age in (300, 200, 100):
+        journal = store.create(None)
+        journal.write_checkpoint("z" * 1000)
+        os.utime(journal.path, (os.path.getmtime(journal.path) - age,) * 2)
+        journals.append(journal)
+    # Room for exactly the kept journal and the newest one (header sizes vary slightly)
+    budget = journals[0].path.stat().st_size + journals[2].path.stat().st_size
+    monkeypatch.setattr(markwrite_journal, "MAX_STORE_BYTES", budget)
+
+    store.enforce_limits(keep={journals[0].path})
+
+    assert journals[0].path.exists()
+    assert not journals[1].path.exists()
+    assert journals[2].path.exists()
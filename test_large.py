@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for sectioned reading of large files in markwrite_large
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import markwrite_large
+from markwrite_io import content_digest
+from markwrite_large import MappedDocument, OpenDocumentTask, open_mapped
+
+
+def _sections(doc: MappedDocument) -> list[str]:
+    sections, start = [], 0
+    while start < doc.size:
+        text, start = doc.read_section(start)
+        sections.append(text)
+    return sections
+
+
+def test_sections_cover_file_and_end_at_blank_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(markwrite_large, "SECTION_BYTES", 64)
+    monkeypatch.setattr(markwrite_large, "MAX_SECTION_BYTES", 256)
+    text = "".join(f"## Part {i}\n\nSome text for paragraph {i}, ünïcödé.\n\n" for i in range(40))
+    path = tmp_path / "big.md"
+    path.write_text(text, encoding="utf-8")
+
+    doc = MappedDocument(path)
+    sections = _sections(doc)
+    doc.close()
+
+    assert "".join(sections) == text
+    assert len(sections) > 10
+    assert all(section.endswith("\n\n") for section in sections)
+
+
+def test_sections_do_not_split_fenced_code(tmp_path, monkeypatch):
+    monkeypatch.setattr(markwrite_large, "SECTION_BYTES", 32)
+    monkeypatch.setattr(markwrite_large, "MAX_SECTION_BYTES", 4096)
+    code = "```python\n" + "x = 1\n\n" * 20 + "```\n\n"
+    text = "Intro paragraph that is long enough.\n\n" + code + "Outro.\n\n" * 10
+    path = tmp_path / "code.md"
+    path.write_text(text, encoding="utf-8")
+
+    doc = MappedDocument(path)
+    sections = _sections(doc)
+    doc.close()
+
+    assert "".join(sections) == text
+    assert any(code in section for section in sections)
+
+
+def test_open_mapped_hashes_like_a_full_read_and_handles_empty_files(tmp_path):
+    path = tmp_path / "a.md"
+    path.write_bytes(b"# Title\n" * 1000)
+    empty = tmp_path / "empty.md"
+    empty.write_bytes(b"")
+
+    doc, state = open_mapped(path)
+    doc.close()
+    empty_doc, empty_state = open_mapped(empty)
+
+    assert state.digest == content_digest(path.read_bytes())
+    assert state.size == path.stat().st_size
+    assert empty_state.digest == content_digest(b"")
+    assert _sections(empty_doc) == []
+    empty_doc.close()
+    assert empty_doc.closed
+
+
+def test_open_task_maps_only_files_above_threshold(tmp_path):
+    path = tmp_path / "a.md"
+    path.write_text("# Title\n\nBody\n", encoding="utf-8")
+
+    small = OpenDocumentTask(path, threshold=1 << 20)
+    large = OpenDocumentTask(path, threshold=4)
+    text, doc = small.work(), large.work()
+
+    assert text == "# Title\n\nBody\n"
+    assert isinstance(doc, MappedDocument)
+    assert doc.read_section(0) == (text, len(text))
+    assert small.state == large.state
+    doc.close()
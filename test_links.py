@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for checking links and anchors in markwrite_links
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from markwrite_links import check_links, run_check_links
+from markwrite_workspace import WorkspaceIndex, slugify
+
+
+def make_docs(root: Path):
+    (root / "guide").mkdir(parents=True)
+    (root / "img").mkdir()
+    (root / "img" / "logo.png").write_bytes(b"png")
+    (root / "index.md").write_text(
+        "# Welcome\n\n"
+        "- [Setup](guide/setup.md#installing-the-app)\n"
+        "- [Usage](guide/usage.md)\n"
+        "- [Options](guide/setup.md#options-1)\n"
+        "- [Top](#welcome) and [site](https://example.com/missing.md)\n"
+        "![logo](img/logo.png) ![gone](img/gone.png)\n",
+        encoding="utf-8",
+    )
+    (root / "guide" / "setup.md").write_text(
+        "# Setup\n\n## Installing the App\n\n## Options\n\n## Options\n\n"
+        '<a id="Legacy"></a>\n\nBack to [the start](../index.md#Welcome) or [legacy](#legacy).\n'
+        "See [missing](#nowhere).\n",
+        encoding="utf-8",
+    )
+
+
+def test_slugify_follows_github():
+    assert slugify("Installing the App") == "installing-the-app"
+    assert slugify("`code` & [links](x.md)!") == "code--links"
+    assert slugify("Ünïcode_names 2") == "ünïcode_names-2"
+
+
+def test_check_links_reports_missing_files_and_anchors(tmp_path):
+    root = tmp_path / "docs"
+    make_docs(root)
+    index = WorkspaceIndex(root, tmp_path / "index.sqlite3")
+    index.update()
+
+    broken = [(link.path.relative_to(root).as_posix(), link.line, link.target, link.reason)
+              for link in check_links(index)]
+
+    assert broken == [
+        ("guide/setup.md", 12, "#nowhere", "no heading #nowhere"),
+        ("index.md", 4, "guide/usage.md", "no such file"),
+        ("index.md", 7, "img/gone.png", "no such file"),
+    ]
+
+    # Fixing a file only reparses that file
+    (root / "guide" / "usage.md").write_text("# Usage\n", encoding="utf-8")
+    (root / "guide" / "setup.md").write_text("# Setup\n\n## Installing the App\n\n## Options\n\n## Options\n",
+                                             encoding="utf-8")
+    assert index.update().indexed == 2
+    assert [link.target for link in check_links(index)] == ["img/gone.png"]
+    index.close()
+
+
+def test_command_line(tmp_path, capsys, monkeypatch):
+    root = tmp_path / "docs"
+    make_docs(root)
+    monkeypatch.chdir(tmp_path)
+
+    assert run_check_links([str(root), "--index", str(tmp_path / "index.sqlite3")]) == 1
+    out, err = capsys.readouterr()
+    assert out.splitlines()[0] == "docs/guide/setup.md:12: #nowhere: no heading #nowhere"
+    assert "3 broken links" in err
+
+    assert run_check_links([str(tmp_path / "missing")]) == 2
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming Markdown parser of markwrite_markdown and `markwrite export --engine python`
+"""
+
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import markwrite
+import markwrite_export
+from markwrite_export import MANIFEST_NAME, PythonExporter, plan_export, write_markdown_html
+from markwrite_markdown import (
+    MAX_NESTING, BlockQuote, CodeBlock, Heading, ListBlock, Paragraph, Table, parse, plain_text, to_html, walk
+)
+
+
+def test_block_tree():
+    blocks = list(parse(
+        "Title\n=====\n\n> quoted\nlazy line\n\n"
+        "- [x] done\n- [ ] open\n\n  second paragraph\n\n"
+        "| Left | Mid | Right |\n|:-----|:---:|------:|\n| a \\| b | `c` |\n\n"
+        "```py\ncode\n```\n"
+    ))
+
+    heading, quote, tasks, table, code = blocks
+    assert heading == Heading(1, "Title", 1)
+    assert isinstance(quote, BlockQuote) and quote.children == [Paragraph("quoted\nlazy line", 4)]
+    assert isinstance(tasks, ListBlock) and not tasks.tight
+    assert [(item.task, item.checked) for item in tasks.items] == [(True, True), (True, False)]
+    assert tasks.items[0].children == [Paragraph("done", 7)]
+    assert isinstance(table, Table)
+    assert table.align == ["left", "center", "right"]
+    assert table.rows == [["a | b", "`c`", ""]]
+    assert code == CodeBlock("code\n", "py", 16)
+    assert [type(block).__name__ for block in walk(blocks)].count("Paragraph") == 4
+
+
+def test_html_follows_the_editor_renderer():
+    html = to_html(
+        "## A *b* **c** ~~d~~\n\n"
+        "- [x] done\n- plain\n\n"
+        "3. three\n\n"
+        "| x | y |\n|---|--:|\n| 1 | 2 |\n\n"
+        "```js\n<a>\n```\n\n"
+        "Line  \nbreak, [ref][] and ![pic](img/a.png \"T\")\n\n"
+        "***\n\n"
+        "[ref]: https://example.com/a\n"
+    )
+
+    assert html == (
+        "<h2>A <em>b</em> <strong>c</strong> <del>d</del></h2>\n"
+        "<ul>\n"
+        '<li class="task-list-item checked" data-task="" data-task-checked="">done</li>\n'
+        "<li>plain</li>\n"
+        "</ul>\n"
+        '<ol start="3">\n<li>three</li>\n</ol>\n'
+        "<table>\n<thead>\n<tr>\n<th>x</th>\n<th align=\"right\">y</th>\n</tr>\n</thead>\n"
+        "<tbody>\n<tr>\n<td>1</td>\n<td align=\"right\">2</td>\n</tr>\n</tbody>\n</table>\n"
+        '<pre class="lang-js"><code data-language="js">&lt;a&gt;\n</code></pre>\n'
+        "<p>Line<br />\nbreak, <a href=\"https://example.com/a\">ref</a> and "
+        '<img src="img/a.png" alt="pic" title="T" /></p>\n'
+        "<hr />\n"
+    )
+
+
+def test_blank_lines_between_items_make_lists_loose():
+    assert to_html("- a\n\n- b\n") == "<ul>\n<li>\n<p>a</p>\n</li>\n<li>\n<p>b</p>\n</li>\n</ul>\n"
+    assert to_html("- a\n- b\n\n- c\n") == (
+        "<ul>\n<li>\n<p>a</p>\n</li>\n<li>\n<p>b</p>\n</li>\n<li>\n<p>c</p>\n</li>\n</ul>\n"
+    )
+    # A blank line before a list of another kind ends the first list; it stays tight
+    assert to_html("- a\n\n+ b\n") == "<ul>\n<li>a</li>\n</ul>\n<ul>\n<li>b</li>\n</ul>\n"
+
+
+def test_hostile_input_stays_linear():
+    for text in ("[a](" * 20000, "[a](x (" * 20000, "[a](<" * 20000, "[" * 80000 + "]" * 20000):
+        started = time.perf_counter()
+        to_html(text + "\n\n[a]: /b\n")
+        assert time.perf_counter() - started < 5, text[:8]
+    # Nesting beyond MAX_NESTING is kept as text instead of overflowing the stack
+    quoted = to_html("> " * 1000 + "x\n")
+    assert quoted.count("<blockquote>") == MAX_NESTING - 1 and quoted.count("</blockquote>") == MAX_NESTING - 1
+    nested = "".join("  " * i + "- x\n" for i in range(300))
+    assert sum(1 for _ in walk(parse(nested))) > MAX_NESTING
+
+
+def test_inline_edge_cases():
+    assert to_html("***x*** *a **b** c* snake_case_name\n") == (
+        "<p><em><strong>x</strong></em> <em>a <strong>b</strong> c</em> snake_case_name</p>\n"
+    )
+    assert to_html("\\*not\\* `*code*` <span>ok</span> 1 < 2 &amp; <https://a.b/c>\n") == (
+        '<p>*not* <code>*code*</code> <span>ok</span> 1 &lt; 2 &amp; <a href="https://a.b/c">https://a.b/c</a></p>\n'
+    )
+    assert to_html("[outer [inner](x)](y)\n") == '<p>[outer <a href="x">inner</a>](y)</p>\n'
+    assert plain_text("A *b* `c` [d](e)") == "A b c d"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("[x](javascript:alert(1))\n", "<p><a>x</a></p>\n"),
+    ("[x](JaVaScRiPt:alert(1))\n", "<p><a>x</a></p>\n"),
+    ("[x](&#106;avascript:alert(1))\n", "<p><a>x</a></p>\n"),
+    ("[x]: vbscript:msgbox\n\n[x]\n", "<p><a>x</a></p>\n"),
+    ("<javascript:alert(1)>\n", "<p><a>javascript:alert(1)</a></p>\n"),
+    ("[x](data:text/html,<b>)\n", "<p><a>x</a></p>\n"),
+    ("![x](javascript:alert(1))\n", '<p><img alt="x" /></p>\n'),
+    ("![x](data:image/png;base64,AA)\n", '<p><img src="data:image/png;base64,AA" alt="x" /></p>\n'),
+])
+def test_script_urls_are_dropped(text, expected):
+    assert to_html(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("<script>alert(1)</script>\n\nafter\n", "\n<p>after</p>\n"),
+    ("<style>\np { color: red }\n</style>\n", "\n"),
+    ("<div onclick='x()' class=a>\n<iframe src=x></iframe>\n</div>\n", '<div class="a">\n\n</div>\n'),
+    ('<a href=" java\tscript:alert(1)" title="&lt;t&gt;">y</a>\n', '<p><a title="&lt;t&gt;">y</a></p>\n'),
+    ('<p><img src="data:image/png;base64,AA" onerror=alert(1)></p>\n', '<p><img src="data:image/png;base64,AA"></p>\n'),
+    ("<!-- note -->\n", "<!-- note -->\n"),
+    ("<!-- <img src=x onerror=alert(1)> -->\n", "\n"),
+])
+def test_raw_html_blocks_are_cleaned(text, expected):
+    assert to_html(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("a <img src=x onerror=alert(1)> b\n", '<p>a <img src="x"> b</p>\n'),
+    ("a <script>alert(1)</script> b\n", "<p>a alert(1) b</p>\n"),
+    ('a <a href="javascript:alert(1)">b</a>\n', "<p>a <a>b</a></p>\n"),
+    ("a <?x > <b> ?>\n", "<p>a &lt;?x > <b> ?></p>\n"),
+    ("<span ONMOUSEOVER=x>ok</span>\n", "<p><span>ok</span></p>\n"),
+])
+def test_inline_html_is_cleaned(text, expected):
+    assert to_html(text) == expected
+
+
+def test_parse_streams_blocks_as_they_complete():
+    consumed = []
+
+    def lines():
+        for i in range(1000):
+            consumed.append(i)
+            yield f"# Section {i}\n"
+            yield "text\n"
+            yield "\n"
+
+    blocks = parse(lines())
+    first = [next(blocks), next(blocks)]
+    assert first == [Heading(1, "Section 0", 1), Paragraph("text", 2)]
+    # Only as much input as it took to finish those blocks was read
+    assert len(consumed) <= 2
+    assert sum(1 for _ in blocks) == 1998
+
+
+def test_streamed_export_matches_in_memory_export(tmp_path, monkeypatch):
+    source = tmp_path / "doc.md"
+    image = f"{'0' * 32}.png"
+    source.write_text("See [later].\n\n" + "# Part\n\n| a |\n|---|\n| b |\n\n" * 200
+                      + f"![x](assets/{image})\n\n[later]: #end\n", encoding="utf-8")
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "assets" / image).write_bytes(b"png")
+    out = tmp_path / "out"
+    out.mkdir()
+
+    write_markdown_html(source.read_text(encoding="utf-8"), out / "memory.html", "doc", None, tmp_path)
+    monkeypatch.setattr(markwrite_export, "STREAM_EXPORT_BYTES", 0)
+    monkeypatch.setattr(markwrite_export, "IO_CHUNK_SIZE", 64)
+    write_markdown_html(source, out / "streamed.html", "doc", None, tmp_path)
+
+    streamed = (out / "streamed.html").read_text(encoding="utf-8")
+    assert streamed == (out / "memory.html").read_text(encoding="utf-8")
+    assert '<a href="#end">later</a>' in streamed
+    assert (out / "assets" / image).read_bytes() == b"png"
+    assert sorted(p.name for p in out.iterdir()) == ["assets", "memory.html", "streamed.html"]
+
+
+def test_python_exporter_records_sources(tmp_path):
+    src = tmp_path / "docs"
+    src.mkdir()
+    (src / "a.md").write_text("# A\n", encoding="utf-8")
+    (src / "b.md").write_bytes(b"\xff not utf-8")
+    jobs, manifests, _skipped = plan_export([src], tmp_path / "out", "python-1.1")
+
+    exporter = PythonExporter(jobs, manifests, None, workers=1)
+    exporter.run()
+
+    assert (exporter.exported, exporter.unchanged, exporter.failed) == (1, 0, 1)
+    assert "<h1>A</h1>" in (tmp_path / "out" / "a.html").read_text(encoding="utf-8")
+    manifest = json.loads((tmp_path / "out" / MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert list(manifest["files"]) == ["a.md"] and list(manifest["errors"]) == ["b.md"]
+    jobs, _manifests, skipped = plan_export([src], tmp_path / "out", "python-1.1")
+    assert skipped == 1 and [job.name for job in jobs] == ["b.md"]
+
+
+def test_python_engine_does_not_import_qt(tmp_path):
+    (tmp_path / "a.md").write_text("# A\n\n![x](assets/missing.png)\n", encoding="utf-8")
+    script = (
+        "import sys, markwrite\n"
+        f"code = markwrite._run_export(['--engine', 'python', '-q', {str(tmp_path / 'a.md')!r}])\n"
+        "assert code == 0, code\n"
+        "assert not [m for m in sys.modules if m.startswith('PySide6')], 'Qt imported'\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).parent, check=True)
+    assert "<h1>A</h1>" in (tmp_path / "a.html").read_text(encoding="utf-8")
+
+
+def test_python_engine_finds_the_stylesheet_from_any_directory(tmp_path):
+    (tmp_path / "a.md").write_text("# A\n", encoding="utf-8")
+    script = Path(__file__).parent / "markwrite.py"
+
+    subprocess.run([sys.executable, str(script), "export", "--engine", "python", "-q", "a.md"],
+                   cwd=tmp_path, check=True)
+
+    html = (tmp_path / "a.html").read_text(encoding="utf-8")
+    assert "<h1>A</h1>" in html and ".toastui-editor-contents h1" in html
+
+
+def test_python_engine_fails_without_the_stylesheet(tmp_path, monkeypatch):
+    (tmp_path / "a.md").write_text("# A\n", encoding="utf-8")
+    monkeypatch.setattr(markwrite_export, "asset_root", lambda: tmp_path / "missing")
+
+    code = markwrite_export.run_export(["--engine", "python", "-q", str(tmp_path / "a.md")],
+                                       markwrite.StartupProfile(False))
+
+    assert code == 2
+    assert not (tmp_path / "a.html").exists()
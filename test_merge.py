@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for merging local edits with changes on disk in markwrite_merge
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from markwrite_merge import OURS_MARKER, SEPARATOR, THEIRS_MARKER, merge3
+
+BASE = "# Title\n\nIntro\n\n## A\n\nalpha\n\n## B\n\nbeta\n"
+
+
+def test_changes_on_different_lines_merge_cleanly():
+    ours = BASE.replace("alpha", "alpha, edited here")
+    theirs = BASE.replace("beta", "beta, edited by a script") + "\n## C\n\ngamma\n"
+
+    result = merge3(BASE, ours, theirs)
+
+    assert result.conflicts == 0
+    assert result.text == (
+        "# Title\n\nIntro\n\n## A\n\nalpha, edited here\n\n## B\n\nbeta, edited by a script\n\n## C\n\ngamma\n"
+    )
+
+
+def test_identical_changes_on_both_sides_are_taken_once():
+    changed = BASE.replace("Intro", "Introduction")
+
+    result = merge3(BASE, changed, changed)
+
+    assert result == merge3(changed, changed, changed)
+    assert result.text == changed
+
+
+def test_conflicting_changes_are_marked():
+    ours = BASE.replace("beta", "beta (mine)")
+    theirs = BASE.replace("beta\n", "beta (theirs)")
+
+    result = merge3(BASE, ours, theirs)
+
+    assert result.conflicts == 1
+    assert result.text.endswith(
+        f"## B\n\n{OURS_MARKER}beta (mine)\n{SEPARATOR}beta (theirs)\n{THEIRS_MARKER}"
+    )
+    assert result.text.startswith("# Title\n\nIntro\n")
+
+
+def test_one_sided_changes_win_without_base():
+    assert merge3("", "", "new file\n").text == "new file\n"
+    assert merge3("same\n", "mine\n", "same\n").text == "mine\n"
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Tests for the outline a tab keeps in step with its page, in markwrite_outline
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from markwrite_outline import DocumentOutline
+
+HEADINGS = [(1, "Title"), (2, "Part"), (2, "Other part")]
+
+
+def test_restored_tab_lists_each_heading_once():
+    outline = DocumentOutline()
+    outline.splice(0, -1, [])  # the page connects with an empty outline
+    outline.splice(0, 0, HEADINGS)  # the document is loaded
+    outline.splice(1, 1, [(2, "Part one")])
+
+    # Discarded: the page is released. Restored: a warm pooled page gets the
+    # snapshot and reports its headings as added to its own, empty outline
+    outline.page_released()
+    outline.splice(0, 0, [(1, "Title"), (2, "Part one"), (2, "Other part")])
+
+    assert outline.headings == [(1, "Title"), (2, "Part one"), (2, "Other part")]
+
+
+def test_markdown_mode_clears_until_the_page_resends():
+    outline = DocumentOutline()
+    outline.splice(0, -1, HEADINGS)
+
+    assert outline.set_shown(False)
+    assert outline.headings == [] and not outline.shown
+    assert not outline.set_shown(False)
+
+    # Discarded while in Markdown mode: the next page starts in WYSIWYG mode
+    outline.page_released()
+    assert outline.shown and outline.headings == []
+    outline.splice(0, 0, HEADINGS)
+    assert outline.headings == HEADINGS
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for the Chrome trace output of markwrite_trace
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import markwrite_trace
+from markwrite_trace import Tracer, complete, instant, page_events, span
+
+
+def test_disabled_tracing_records_nothing(monkeypatch):
+    monkeypatch.setattr(markwrite_trace, "_tracer", None)
+    assert span("a") is span("b", "io", path="x")
+    with span("a"):
+        pass
+    instant("b")
+    complete("c", 0.0)
+    page_events(1, [["d", 0.0, 1.0]])
+
+
+def test_spans_and_page_events(tmp_path, monkeypatch):
+    tracer = Tracer(str(tmp_path / "trace.json"))
+    monkeypatch.setattr(markwrite_trace, "_tracer", tracer)
+
+    with span("read", "io", path="a.md"):
+        time.sleep(0.002)
+    try:
+        with span("write", "io"):
+            raise OSError("disk full")
+    except OSError:
+        pass
+    worker = threading.Thread(target=instant, args=("tick", "app"), name="worker")
+    worker.start()
+    worker.join()
+    page_start = time.time() * 1000
+    page_events(3, [["setMarkdown", page_start, 5.0], ["scripts loaded", page_start, None]])
+    tracer.write()
+
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    spans = {e["name"]: e for e in events if e["ph"] == "X"}
+    assert spans["read"]["args"] == {"path": "a.md"}
+    assert spans["read"]["dur"] >= 2000
+    assert spans["write"]["args"] == {"error": "OSError"}
+    threads = {e["args"]["name"] for e in events if e["name"] == "thread_name"}
+    assert {"MainThread", "worker", "Editor page 3"} <= threads
+    # Page timestamps land on the same clock as ours, after the spans above
+    assert spans["setMarkdown"]["tid"] == markwrite_trace.PAGE_TRACK_BASE + 3
+    assert spans["setMarkdown"]["dur"] == 5000
+    assert 0 <= spans["setMarkdown"]["ts"] - (spans["write"]["ts"] + spans["write"]["dur"]) < 1_000_000
+
+
+def test_environment_variable_traces_startup(tmp_path):
+    out = tmp_path / "trace.json"
+    env = dict(os.environ, **{markwrite_trace.ENV_VAR: str(out)})
+    script = Path(__file__).parent / "markwrite.py"
+    subprocess.run([sys.executable, str(script), "--version"], env=env, check=True, capture_output=True)
+
+    events = json.loads(out.read_text())["traceEvents"]
+    assert [e["name"] for e in events if e.get("cat") == "startup"] == ["parse arguments", "print version"]
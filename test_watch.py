@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for detecting changes of open documents in markwrite_watch
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+from PySide6.QtCore import QCoreApplication
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from markwrite_io import FileState, content_digest
+from markwrite_watch import DEBOUNCE_MS, DocumentWatcher, check_file
+
+
+def _state(path: Path) -> FileState:
+    st = path.stat()
+    return FileState(content_digest(path.read_bytes()), st.st_size, st.st_mtime_ns)
+
+
+def test_check_file_reads_only_after_stat_change(tmp_path):
+    path = tmp_path / "a.md"
+    path.write_text("one\n", encoding="utf-8")
+    known = _state(path)
+
+    assert check_file(path, known) is None
+
+    os.utime(path, ns=(known.mtime_ns, known.mtime_ns + 1_000_000))
+    touched, data = check_file(path, known)
+    assert touched.digest == known.digest and data == b"one\n"
+
+    path.write_text("two\n", encoding="utf-8")
+    changed, data = check_file(path, touched, keep_data=False)
+    assert changed.digest == content_digest(b"two\n") and data is None
+
+
+def test_watcher_reports_a_burst_of_writes_once(tmp_path):
+    app = QCoreApplication.instance() or QCoreApplication([])
+    path = tmp_path / "a.md"
+    path.write_text("one\n", encoding="utf-8")
+    watcher = DocumentWatcher()
+    seen = []
+    watcher.changed.connect(seen.append)
+    watcher.set_paths([path])
+
+    for i in range(5):
+        path.write_text(f"edit {i}\n", encoding="utf-8")
+        app.processEvents()
+    # Atomic replace, as editors and MarkWrite itself save
+    replacement = tmp_path / "a.md.tmp"
+    replacement.write_text("replaced\n", encoding="utf-8")
+    os.replace(replacement, path)
+    deadline = time.monotonic() + (3 * DEBOUNCE_MS) / 1000
+    while time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+
+    assert seen == [path]
+    watcher.set_paths([])
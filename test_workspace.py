@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Tests for the workspace search index in markwrite_workspace
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from markwrite_workspace import UpdateStats, WorkspaceIndex, extract
+
+
+def make_tree(root: Path):
+    (root / "notes").mkdir(parents=True)
+    (root / ".git").mkdir()
+    (root / "README.md").write_text("# Project Overview\n\nSee [setup](notes/setup.md).\n", encoding="utf-8")
+    (root / "notes" / "setup.md").write_text(
+        "# Setup\n\n## Installing dependencies\n\nRun the installer, then <https://example.com/docs>.\n",
+        encoding="utf-8",
+    )
+    (root / "notes" / "ideas.markdown").write_text("Unsorted thoughts about caching.\n", encoding="utf-8")
+    (root / "notes" / "image.png").write_bytes(b"not markdown")
+    (root / ".git" / "HEAD.md").write_text("# hidden\n", encoding="utf-8")
+
+
+def test_extract_skips_fenced_code():
+    text = (
+        "# Title\n\n[a](one.md) and ![b](img.png)\n\n```md\n# Not a heading\n[c](two.md)\n```\n\n"
+        "## Second ##\n\n[ref]: <three.md>\n"
+    )
+
+    info = extract(text, "fallback")
+
+    assert info.title == "Title"
+    assert info.headings == ("Title", "Second")
+    assert info.links == (("one.md", 3), ("img.png", 3), ("three.md", 12))
+    assert info.anchors == ("title", "second")
+    assert extract("no headings", "fallback").title == "fallback"
+
+
+def test_update_indexes_markdown_files_incrementally(tmp_path):
+    root = tmp_path / "workspace"
+    make_tree(root)
+    index = WorkspaceIndex(root, tmp_path / "index.sqlite3")
+
+    assert index.update() == UpdateStats(indexed=3)
+    assert index.file_count() == 3
+    assert index.update() == UpdateStats(unchanged=3)
+
+    # Touched only: hashed, not re-indexed; edited: re-indexed; deleted: removed
+    setup = root / "notes" / "setup.md"
+    os.utime(setup, ns=(1, 1))
+    (root / "README.md").write_text("# Project Overview\n\nNow with a changelog.\n", encoding="utf-8")
+    (root / "notes" / "ideas.markdown").unlink()
+
+    assert index.update() == UpdateStats(indexed=1, unchanged=1, removed=1)
+    assert index.file_count() == 2
+    index.close()
+
+
+def test_search_and_quick_open(tmp_path):
+    root = tmp_path / "workspace"
+    make_tree(root)
+    index = WorkspaceIndex(root, tmp_path / "index.sqlite3")
+    index.update()
+
+    hits = index.search("install")
+    assert [hit.path for hit in hits] == [root / "notes" / "setup.md"]
+    assert hits[0].title == "Setup"
+    assert "«Installing»" in hits[0].snippet
+    assert index.search("project overview")[0].path == root / "README.md"
+    assert index.search("example.com") != []
+    assert index.search("hidden") == []
+
+    assert index.find_files("setup") == [root / "notes" / "setup.md"]
+    assert index.find_files("r") == [root / "README.md", root / "notes" / "ideas.markdown"]
+    assert index.find_files("%") == []
+
+    # Only the given files are looked at
+    (root / "notes" / "setup.md").write_text("# Setup\n\nConfigure everything.\n", encoding="utf-8")
+    (root / "new.md").write_text("# New\n", encoding="utf-8")
+    assert index.update([root / "notes" / "setup.md"]) == UpdateStats(indexed=1)
+    assert index.search("install") == []
+    assert index.search("configure")[0].path == root / "notes" / "setup.md"
+    index.close()
+
+
+def test_update_in_worker_processes(tmp_path):
+    root = tmp_path / "workspace"
+    root.mkdir()
+    for i in range(100):
+        (root / f"note{i:03}.md").write_text(f"# Note {i}\n\nword{i} shared\n", encoding="utf-8")
+    index = WorkspaceIndex(root, tmp_path / "index.sqlite3")
+    progress = []
+
+    stats = index.update(workers=2, progress=lambda done, total: progress.append((done, total)))
+
+    assert stats == UpdateStats(indexed=100)
+    assert progress[-1] == (100, 100)
+    assert [hit.path.name for hit in index.search("word42")] == ["note042.md"]
+    assert len(index.search("shared", limit=200)) == 100
+    index.close()
+
+
+def test_reader_queries_a_large_index_from_other_threads(tmp_path):
+    root = tmp_path / "workspace"
+    index = WorkspaceIndex(root, tmp_path / "index.sqlite3")
+    count = 50000
+    conn = index.connect()
+    with conn:
+        conn.executemany(
+            "INSERT INTO files(id, path, name, size, mtime_ns, digest, title) VALUES (?, ?, ?, 0, 0, '', ?)",
+            ((i, f"dir{i % 100}/note{i}.md", f"note{i}.md", f"Note {i}") for i in range(1, count + 1)),
+        )
+        conn.executemany(
+            "INSERT INTO search(rowid, title, headings, body, links) VALUES (?, ?, '', ?, '')",
+            ((i, f"Note {i}", f"word{i} shared " + "filler " * 20) for i in range(1, count + 1)),
+        )
+    conn.close()
+    reader = index.reader()
+    results = {}
+
+    def query(text):
+        results[text] = (reader.find_files(text), reader.search(text))
+
+    # Like a query worker of a thread pool, each query may run on another thread
+    for text in ("note4242", "word4242 shared"):
+        thread = threading.Thread(target=query, args=(text,))
+        thread.start()
+        thread.join()
+    assert results["note4242"][0][0] == root / "dir42" / "note4242.md"
+    assert [hit.path.name for hit in results["word4242 shared"][1]] == ["note4242.md"]
+
+    # A superseded query is stopped while it ranks every file
+    errors = []
+
+    def slow_query():
+        try:
+            reader.search("shared")
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=slow_query)
+    thread.start()
+    while thread.is_alive():
+        reader.interrupt()
+        thread.join(0.001)
+    assert errors
+    assert index.file_count() == count
+    assert len(reader.search("filler", limit=5)) == 5
+    reader.close()
+    index.close()
@@ -0,0 +1,404 @@
+"""Headless performance benchmark for MarkWrite: startup, load, save, export and memory.
+
+    python tools/benchmark.py                      # writes JSON results to stdout
+    python tools/benchmark.py --sizes 100k,1m -o results.json
+    python tools/benchmark.py --compare base.json  # also prints the change against an earlier run
+
+Synthetic Markdown documents of increasing size (headings, paragraphs, lists,
+tables, code blocks, images and Mermaid diagrams) are generated into a
+temporary directory. Everything runs in child processes on the offscreen Qt
+platform with a throwaway home directory, so no window is shown, no network is
+used and the user's settings, journals and WebEngine cache are untouched:
+
+- startup: time from the child's first Python line to the editor reporting ready, once with an
+  empty WebEngine cache (cold) and once more with the cache from the first run
+  (warm); the operating system's file cache is warm in both cases
+- per document: set_markdown (Python -> editor), getMarkdown (editor -> Python)
+  and a save through the same path as File > Save, median of --repeat runs
+- export: `markwrite export` of all documents to HTML, as a separate process
+- peak RSS of the editor process, of its WebEngine helper processes (Linux)
+  and of the export process
+
+Results are a flat dict of metrics (milliseconds, MB) so that runs of
+different commits can be compared with --compare.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+_STARTED = time.perf_counter()
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+RESULTS_VERSION = 1
+DEFAULT_SIZES = "100k,1m,5m"
+DEFAULT_REPEAT = 3
+CHILD_TIMEOUT_S = 600
+# --compare flags metrics that got this much worse
+DEFAULT_THRESHOLD = 0.10
+
+_WORDS = (
+    "editor document markdown render table heading offline export window bridge chunk "
+    "section paragraph latency memory budget cache index parser widget signal thread "
+    "queue journal anchor diagram image preview outline folder search save load"
+).split()
+
+
+# -------- Corpus --------
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    units = {"k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def _png(width: int, height: int, rgb: tuple[int, int, int]) -> bytes:
+    """A solid-color PNG, written without any imaging library."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    raw = b"".join(b"\0" + bytes(rgb) * width for _ in range(height))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 16))]
+    i = rng.randrange(len(words))
+    words[i] = rng.choice([f"**{words[i]}**", f"*{words[i]}*", f"`{words[i]}`"])
+    return " ".join(words).capitalize() + "."
+
+
+def _section(rng: random.Random, n: int, images: list[str]) -> str:
+    parts = [f"## Section {n}: {rng.choice(_WORDS)} {rng.choice(_WORDS)}\n"]
+    for _ in range(rng.randint(2, 4)):
+        parts.append(" ".join(_sentence(rng) for _ in range(rng.randint(3, 6))) + "\n")
+    parts.append("".join(f"- {_sentence(rng)}\n" for _ in range(rng.randint(2, 5))))
+    if n % 3 == 0:
+        rows = ["| Name | Size | Time (ms) | Notes |", "|------|-----:|----------:|-------|"]
+        rows += [f"| {rng.choice(_WORDS)} | {rng.randint(1, 99999)} | {rng.random() * 100:.2f} | "
+                 f"{rng.choice(_WORDS)} {rng.choice(_WORDS)} |" for _ in range(rng.randint(3, 8))]
+        parts.append("\n".join(rows) + "\n")
+    if n % 4 == 1:
+        body = "\n".join(f"    {rng.choice(_WORDS)}_{i} = compute({rng.randint(0, 999)})" for i in range(rng.randint(3, 12)))
+        parts.append(f"```python\ndef {rng.choice(_WORDS)}_{n}():\n{body}\n```\n")
+    if n % 5 == 2:
+        parts.append(f"![Figure {n}]({rng.choice(images)})\n")
+    if n % 10 == 7:
+        parts.append(f"```mermaid\ngraph TD\n  A{n}[{rng.choice(_WORDS)}] --> B{n}[{rng.choice(_WORDS)}]\n"
+                     f"  B{n} --> C{n}[{rng.choice(_WORDS)}]\n```\n")
+    parts.append(f"See [the first section](#section-1-{_WORDS[0]}) for details.\n")
+    return "\n".join(parts)
+
+
+def generate_document(size: int, seed: int, images: list[str]) -> str:
+    """Deterministic Markdown of about size bytes."""
+    rng = random.Random(seed)
+    parts = [f"# Benchmark document ({size:,} bytes)\n\n"]
+    total = len(parts[0])
+    n = 0
+    while total < size:
+        n += 1
+        section = _section(rng, n, images) + "\n"
+        parts.append(section)
+        total += len(section.encode("utf-8"))
+    return "".join(parts)
+
+
+def generate_corpus(directory: Path, sizes: list[int]) -> dict[str, Path]:
+    """One document per size, plus the images they show, in directory."""
+    from markwrite_images import store_image  # content-addressed, as pasted images are
+
+    directory.mkdir(parents=True, exist_ok=True)
+    images = [
+        store_image(directory, _png(w, h, rgb), "image/png")
+        for w, h, rgb in ((320, 200, (40, 90, 200)), (1920, 1080, (200, 80, 40)), (64, 64, (30, 160, 90)))
+    ]
+    corpus = {}
+    for size in sizes:
+        label = _size_label(size)
+        path = directory / f"doc-{label}.md"
+        path.write_text(generate_document(size, size, images), encoding="utf-8")
+        corpus[label] = path
+    return corpus
+
+
+def _size_label(size: int) -> str:
+    for unit, factor in (("m", 1 << 20), ("k", 1 << 10)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return str(size)
+
+
+# -------- Memory --------
+def _proc_peak_rss_kb(pid: int) -> int:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def descendant_peak_rss_mb() -> float | None:
+    """Sum of the peak RSS of all processes started by this one (Linux only)."""
+    if not Path("/proc/self/status").exists():
+        return None
+    children: dict[int, list[int]] = {}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            # The command may contain spaces and parentheses; the ppid follows the last ")"
+            ppid = int((entry / "stat").read_text().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry.name))
+    total, stack = 0, list(children.get(os.getpid(), ()))
+    while stack:
+        pid = stack.pop()
+        total += _proc_peak_rss_kb(pid)
+        stack.extend(children.get(pid, ()))
+    return total / 1024
+
+
+def own_peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+# -------- Child processes --------
+def _wait_for(connect, timeout_s: float = CHILD_TIMEOUT_S):
+    """Run the event loop until the callback passed to connect() is called; return its arguments."""
+    from PySide6.QtCore import QEventLoop, QTimer
+
+    loop = QEventLoop()
+    result = {}
+
+    def done(*args):
+        result["args"] = args
+        loop.quit()
+
+    connect(done)
+    if "args" not in result:
+        QTimer.singleShot(int(timeout_s * 1000), loop.quit)
+        loop.exec()
+    if "args" not in result:
+        raise TimeoutError("the editor did not answer in time")
+    return result["args"]
+
+
+def child_editor(corpus: dict[str, str], repeat: int, out_dir: str | None) -> dict:
+    """Startup to editor-ready and, if out_dir is given, load/get/save timings per document."""
+    sys.path.insert(0, str(PROJECT_ROOT))
+    import markwrite_gui
+
+    markwrite_gui.register_asset_scheme()
+    app = markwrite_gui.MarkWriteApp([sys.argv[0]])
+    win = app.new_window()
+    tab = win.current_tab()
+    page_timings = {}
+    tab.page.bridge.timingsReported.connect(page_timings.update)
+    if not tab.page.is_ready:
+        _wait_for(tab.editorReady.connect)
+    metrics = {"startup_ms": (time.perf_counter() - _STARTED) * 1000}
+    metrics.update({f"page.{name}_ms": ms for name, ms in page_timings.items()})
+
+    if out_dir is not None:
+        bridge = tab.page.bridge
+        for label, path in corpus.items():
+            text = Path(path).read_text(encoding="utf-8")
+            set_and_get, get, save = [], [], []
+            for i in range(repeat):
+                start = time.perf_counter()
+                bridge.set_markdown(text)
+                # Operations reach the page in order: this returns once the text is in the editor
+                _wait_for(lambda cb: bridge.request_content("markdown", cb))
+                middle = time.perf_counter()
+                _wait_for(lambda cb: bridge.request_content("markdown", cb))
+                end = time.perf_counter()
+                set_and_get.append(middle - start)
+                get.append(end - middle)
+                # A new file each time: saves of unchanged content are skipped
+                tab.current_path = Path(out_dir) / f"{label}-{i}.md"
+                start = time.perf_counter()
+                _wait_for(lambda cb: tab.save(on_saved=cb))
+                save.append(time.perf_counter() - start)
+            get_ms = statistics.median(get) * 1000
+            metrics[f"{label}.set_markdown_ms"] = max(0.0, statistics.median(set_and_get) * 1000 - get_ms)
+            metrics[f"{label}.get_markdown_ms"] = get_ms
+            metrics[f"{label}.save_ms"] = statistics.median(save) * 1000
+
+    for name, value in (("peak_rss_mb", own_peak_rss_mb()), ("helpers_peak_rss_mb", descendant_peak_rss_mb())):
+        if value is not None:
+            metrics[name] = value
+    return metrics
+
+
+def _child_env(home: Path) -> dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "QT_QPA_PLATFORM": "offscreen",
+        "HOME": str(home),
+        "USERPROFILE": str(home),
+        "XDG_CONFIG_HOME": str(home / ".config"),
+        "XDG_DATA_HOME": str(home / ".local" / "share"),
+        "XDG_CACHE_HOME": str(home / ".cache"),
+        "XDG_RUNTIME_DIR": str(home / ".runtime"),
+    })
+    (home / ".runtime").mkdir(parents=True, exist_ok=True, mode=0o700)
+    return env
+
+
+def run_child(mode: str, payload: dict, home: Path) -> dict:
+    proc = subprocess.run(
+        [sys.executable, __file__, "--child", mode, json.dumps(payload)],
+        env=_child_env(home), capture_output=True, text=True, timeout=CHILD_TIMEOUT_S,
+    )
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"benchmark child '{mode}' failed ({proc.returncode}):\n{proc.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def run_export(corpus_dir: Path, out_dir: Path, home: Path) -> dict:
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, str(PROJECT_ROOT / "markwrite.py"), "export", str(corpus_dir),
+         "-o", str(out_dir), "--force", "--quiet"],
+        env=_child_env(home), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    stderr = proc.stderr.read()
+    metrics = {}
+    if hasattr(os, "wait4"):
+        # The peak RSS of this one process, not the maximum over all children so far
+        _pid, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        peak = usage.ru_maxrss
+        metrics["export.peak_rss_mb"] = peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+    else:
+        proc.wait()
+    metrics["export.html_ms"] = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"markwrite export failed ({proc.returncode}):\n{stderr.decode(errors='replace')[-2000:]}")
+    return metrics
+
+
+# -------- Results --------
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(sizes: list[int], repeat: int) -> dict:
+    sys.path.insert(0, str(PROJECT_ROOT))
+    from markwrite import APP_VERSION_FULL
+
+    with tempfile.TemporaryDirectory(prefix="markwrite-bench-") as tmp:
+        tmp = Path(tmp)
+        corpus = generate_corpus(tmp / "corpus", sizes)
+        home = tmp / "home"
+        metrics = {}
+        cold = run_child("editor", {"corpus": {}, "repeat": 0, "out": None}, home)
+        metrics["startup.cold_ms"] = cold["startup_ms"]
+        warm = run_child("editor", {"corpus": {k: str(v) for k, v in corpus.items()},
+                                    "repeat": repeat, "out": str(tmp / "saved")}, home)
+        metrics["startup.warm_ms"] = warm.pop("startup_ms")
+        for name in ("peak_rss_mb", "helpers_peak_rss_mb"):
+            if name in warm:
+                metrics[f"editor.{name}"] = warm.pop(name)
+        metrics.update(warm)
+        metrics.update(run_export(tmp / "corpus", tmp / "html", home))
+        documents = {label: path.stat().st_size for label, path in corpus.items()}
+
+    return {
+        "version": RESULTS_VERSION,
+        "commit": _git_commit(),
+        "markwrite": APP_VERSION_FULL,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "documents": documents,
+        "metrics": {name: round(value, 2) for name, value in sorted(metrics.items())},
+    }
+
+
+def compare(base: dict, current: dict, threshold: float) -> list[str]:
+    """Lines describing each metric's change; regressions beyond threshold are marked."""
+    lines = []
+    base_metrics = base.get("metrics", {})
+    for name, value in current["metrics"].items():
+        old = base_metrics.get(name)
+        if old is None:
+            lines.append(f"  {name:<36} {'':>10} {value:10.1f}   (new)")
+            continue
+        change = (value - old) / old if old else 0.0
+        mark = "  REGRESSION" if change > threshold else ""
+        lines.append(f"  {name:<36} {old:10.1f} {value:10.1f} {change:+8.1%}{mark}")
+    return lines
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Headless MarkWrite performance benchmark (JSON results).")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"document sizes, comma-separated, with k/m suffixes (default: {DEFAULT_SIZES})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"runs per document measurement; the median is reported (default: {DEFAULT_REPEAT})")
+    parser.add_argument("-o", "--output", type=Path, help="write the results here instead of stdout")
+    parser.add_argument("--compare", type=Path, help="results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown reported as a regression (default: 0.10); "
+                             "with --compare, the exit status is 1 if there is one")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "JSON"), help=argparse.SUPPRESS)
+    return parser
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    if args.child:
+        mode, payload = args.child[0], json.loads(args.child[1])
+        if mode != "editor":
+            raise SystemExit(f"unknown child mode: {mode}")
+        print(json.dumps(child_editor(payload["corpus"], payload["repeat"], payload["out"])), flush=True)
+        # Skip tearing down the window and its WebEngine pages: nothing is left to save
+        os._exit(0)
+
+    results = run_benchmark([parse_size(s) for s in args.sizes.split(",") if s.strip()], max(1, args.repeat))
+    text = json.dumps(results, indent=1) + "\n"
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    else:
+        sys.stdout.write(text)
+    if args.compare:
+        base = json.loads(args.compare.read_text(encoding="utf-8"))
+        lines = compare(base, results, args.threshold)
+        print(f"Compared with {base.get('commit') or args.compare}:", file=sys.stderr)
+        print("\n".join(lines), file=sys.stderr)
+        return 1 if any(line.endswith("REGRESSION") for line in lines) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
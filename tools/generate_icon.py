@@ -1,9 +1,25 @@
+"""Generate the app icon: assets/icon_1024.png, MarkWrite.iconset, MarkWrite.icns and MarkWrite.ico.
+
+The icon is drawn once at 1024 px from whole-image Pillow operations (no
+per-pixel or per-row Python loops); every smaller size is resampled from it,
+all sizes in parallel, and the PNG/ICNS/ICO files are encoded in parallel too.
+
+A stamp next to the outputs records a hash of the inputs (this script and the
+Pillow version) and of every output. When both still match, nothing is
+redrawn, so CI runs on an unchanged tree take a fraction of a second.
+Pass --force to regenerate anyway.
+"""
+
 from __future__ import annotations
 
+import argparse
+import hashlib
+import json
 import os
-import math
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import PIL
 from PIL import Image, ImageDraw, ImageFilter, ImageOps
 
 
@@ -13,6 +29,26 @@ ICONSET_DIR = ASSETS_DIR / "MarkWrite.iconset"
 ICNS_PATH = ASSETS_DIR / "MarkWrite.icns"
 ICO_PATH = ASSETS_DIR / "MarkWrite.ico"
 BASE_PNG = ASSETS_DIR / "icon_1024.png"
+STAMP_PATH = ASSETS_DIR / ".icon-stamp.json"
+
+BASE_SIZE = 1024
+ICONSET_SIZES = {
+    "icon_16x16.png": 16,
+    "icon_16x16@2x.png": 32,
+    "icon_32x32.png": 32,
+    "icon_32x32@2x.png": 64,
+    "icon_128x128.png": 128,
+    "icon_128x128@2x.png": 256,
+    "icon_256x256.png": 256,
+    "icon_256x256@2x.png": 512,
+    "icon_512x512.png": 512,
+    "icon_512x512@2x.png": 1024,
+}
+ICNS_SIZES = [16, 32, 64, 128, 256, 512, 1024]
+ICO_SIZES = [256, 128, 64, 48, 32, 24, 16]
+# Soft masks are blurred at this fraction of their size and scaled up; the
+# result is indistinguishable and the blur several times cheaper
+MASK_SCALE = 4
 
 
 def ensure_dirs() -> None:
@@ -33,14 +69,20 @@ def lerp_color(c1: tuple[int, int, int], c2: tuple[int, int, int], t: float) ->
 
 
 def draw_gradient(size: int, top: tuple[int, int, int], bottom: tuple[int, int, int]) -> Image.Image:
-    """Create a vertical gradient image."""
-    img = Image.new("RGB", (size, size), bottom)
-    draw = ImageDraw.Draw(img)
+    """Create a vertical gradient image: one column of colors, stretched sideways."""
+    column = bytearray()
     for y in range(size):
-        t = y / (size - 1)
-        color = lerp_color(top, bottom, t)
-        draw.line([(0, y), (size, y)], fill=color)
-    return img
+        column.extend(lerp_color(top, bottom, y / (size - 1)))
+    return Image.frombytes("RGB", (1, size), bytes(column)).resize((size, size), Image.NEAREST)
+
+
+def soft_mask(size: int, draw_fn, radius: float) -> Image.Image:
+    """An "L" mask drawn by draw_fn(draw, scale) and Gaussian-blurred, computed at reduced size."""
+    small = max(1, size // MASK_SCALE)
+    mask = Image.new("L", (small, small), 0)
+    draw_fn(ImageDraw.Draw(mask), small / size)
+    mask = mask.filter(ImageFilter.GaussianBlur(radius=max(1.0, radius / MASK_SCALE)))
+    return mask.resize((size, size), Image.BILINEAR)
 
 
 def draw_m_logo_onto(img: Image.Image, size: int, color: tuple[int, int, int]) -> None:
@@ -49,12 +91,15 @@ def draw_m_logo_onto(img: Image.Image, size: int, color: tuple[int, int, int]) -
     margin = int(0.18 * w)
     bar_w = max(12, int(0.11 * w))
 
-    # Shadow layer
+    # Shadow: a blurred mask of the logo applied to black
     shadow_offset = int(max(2, size * 0.01))
+
+    def draw_shadow(draw: ImageDraw.ImageDraw, scale: float) -> None:
+        _draw_m_paths(draw, round(w * scale), round(h * scale), round(margin * scale),
+                      max(1, round(bar_w * scale)), 180)
+
     shadow = Image.new("RGBA", (size, size), (0, 0, 0, 0))
-    sdraw = ImageDraw.Draw(shadow)
-    _draw_m_paths(sdraw, w, h, margin, bar_w, (0, 0, 0, 180))
-    shadow = shadow.filter(ImageFilter.GaussianBlur(radius=int(max(1, size * 0.02))))
+    shadow.putalpha(soft_mask(size, draw_shadow, max(1, int(size * 0.02))))
 
     # Base layer
     base = Image.new("RGBA", (size, size), (0, 0, 0, 0))
@@ -66,7 +111,7 @@ def draw_m_logo_onto(img: Image.Image, size: int, color: tuple[int, int, int]) -
     img.alpha_composite(base)
 
 
-def _draw_m_paths(draw: ImageDraw.ImageDraw, w: int, h: int, margin: int, bar_w: int, fill_rgba: tuple[int, int, int, int]) -> None:
+def _draw_m_paths(draw: ImageDraw.ImageDraw, w: int, h: int, margin: int, bar_w: int, fill_rgba) -> None:
     # Vertical bars
     draw.rectangle([margin, margin, margin + bar_w, h - margin], fill=fill_rgba)
     draw.rectangle([w - margin - bar_w, margin, w - margin, h - margin], fill=fill_rgba)
@@ -81,66 +126,106 @@ def _draw_m_paths(draw: ImageDraw.ImageDraw, w: int, h: int, margin: int, bar_w:
     draw.line([apex_right, valley], fill=fill_rgba, width=bar_w, joint="curve")
 
 
-def generate_base_png(size: int = 1024) -> Image.Image:
+def generate_base_png(size: int = BASE_SIZE) -> Image.Image:
     # Cool blue gradient
     top = (96, 168, 255)   # #60A8FF
     bottom = (33, 58, 143) # #213A8F
     img = draw_gradient(size, top, bottom).convert("RGBA")
 
     # Subtle vignette
-    vignette = Image.new("L", (size, size), 0)
-    vg = ImageDraw.Draw(vignette)
-    vg.ellipse((-int(size*0.2), -int(size*0.2), int(size*1.2), int(size*1.2)), fill=255)
-    vignette = vignette.filter(ImageFilter.GaussianBlur(radius=int(size * 0.1)))
-    img.putalpha(255)
+    def draw_vignette(draw: ImageDraw.ImageDraw, scale: float) -> None:
+        s = size * scale
+        draw.ellipse((-int(s * 0.2), -int(s * 0.2), int(s * 1.2), int(s * 1.2)), fill=255)
+
+    vignette = soft_mask(size, draw_vignette, int(size * 0.1))
     dark = Image.new("RGBA", (size, size), (0, 0, 0, 120))
-    mask = ImageOps.invert(vignette)
-    img = Image.composite(dark, img, mask)
+    img = Image.composite(dark, img, ImageOps.invert(vignette))
 
     # Draw logo
     draw_m_logo_onto(img, size, (255, 255, 255))
     return img
 
 
-def save_iconset_from_base(base: Image.Image) -> None:
-    sizes = {
-        "icon_16x16.png": 16,
-        "icon_16x16@2x.png": 32,
-        "icon_32x32.png": 32,
-        "icon_32x32@2x.png": 64,
-        "icon_128x128.png": 128,
-        "icon_128x128@2x.png": 256,
-        "icon_256x256.png": 256,
-        "icon_256x256@2x.png": 512,
-        "icon_512x512.png": 512,
-        "icon_512x512@2x.png": 1024,
-    }
-    for name, size in sizes.items():
-        out = ICONSET_DIR / name
-        img = base.resize((size, size), Image.LANCZOS)
-        img.save(out, format="PNG")
+def resample_all(base: Image.Image, pool: ThreadPoolExecutor) -> dict[int, Image.Image]:
+    """The base image at every size any output needs, each size computed once."""
+    sizes = sorted(set(ICONSET_SIZES.values()) | set(ICNS_SIZES) | set(ICO_SIZES))
+
+    def resample(size: int) -> Image.Image:
+        return base if size == base.width else base.resize((size, size), Image.LANCZOS)
+
+    return dict(zip(sizes, pool.map(resample, sizes)))
+
+
+def _save(image: Image.Image, path: Path, append_images=(), **params) -> None:
+    # save() keeps its options on the Image (encoderinfo), and several jobs save the
+    # same resampled size; each job saves copies of its own so they cannot clash
+    image.copy().save(path, append_images=[im.copy() for im in append_images], **params)
 
 
-def build_icns() -> None:
-    # Use iconutil (macOS) to compile .iconset into .icns
-    os.system(f"iconutil -c icns '{ICONSET_DIR}' -o '{ICNS_PATH}'")
+def write_outputs(base: Image.Image) -> None:
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        images = resample_all(base, pool)
+        jobs = [pool.submit(_save, base, BASE_PNG, format="PNG")]
+        jobs += [pool.submit(_save, images[size], ICONSET_DIR / name, format="PNG")
+                 for name, size in ICONSET_SIZES.items()]
+        # Pillow writes .icns on every platform, so no iconutil is needed
+        jobs.append(pool.submit(_save, images[BASE_SIZE], ICNS_PATH, format="ICNS",
+                                append_images=[images[size] for size in ICNS_SIZES]))
+        jobs.append(pool.submit(_save, images[ICO_SIZES[0]], ICO_PATH, format="ICO",
+                                sizes=[(s, s) for s in ICO_SIZES],
+                                append_images=[images[size] for size in ICO_SIZES[1:]]))
+        for job in jobs:
+            job.result()
 
-def build_ico_from_base(base: Image.Image) -> None:
-    sizes = [256, 128, 64, 48, 32, 24, 16]
-    images = [base.resize((s, s), Image.LANCZOS) for s in sizes]
-    images[0].save(ICO_PATH, format='ICO', sizes=[(s, s) for s in sizes])
+
+def output_paths() -> list[Path]:
+    return [BASE_PNG, ICNS_PATH, ICO_PATH] + [ICONSET_DIR / name for name in ICONSET_SIZES]
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def inputs_digest() -> str:
+    return _digest(Path(__file__).read_bytes() + f"\0Pillow {PIL.__version__}".encode())
+
+
+def outputs_digests() -> dict[str, str] | None:
+    """Hash of every output by path relative to assets/, or None if one is missing."""
+    digests = {}
+    for path in output_paths():
+        try:
+            digests[path.relative_to(ASSETS_DIR).as_posix()] = _digest(path.read_bytes())
+        except OSError:
+            return None
+    return digests
+
+
+def is_up_to_date() -> bool:
+    try:
+        stamp = json.loads(STAMP_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return stamp.get("inputs") == inputs_digest() and stamp.get("outputs") == outputs_digests()
+
+
+def write_stamp() -> None:
+    stamp = {"inputs": inputs_digest(), "outputs": outputs_digests()}
+    STAMP_PATH.write_text(json.dumps(stamp, indent=1, sort_keys=True) + "\n", encoding="utf-8")
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate the MarkWrite app icons.")
+    parser.add_argument("--force", action="store_true", help="regenerate even if the outputs are up to date")
+    args = parser.parse_args()
+    if not args.force and is_up_to_date():
+        print(f"Up to date: {ICNS_PATH} and {ICO_PATH}")
+        return
     ensure_dirs()
-    base = generate_base_png(1024)
-    base.save(BASE_PNG)
-    save_iconset_from_base(base)
-    build_icns()
-    build_ico_from_base(base)
+    write_outputs(generate_base_png(BASE_SIZE))
+    write_stamp()
     print(f"Generated: {ICNS_PATH} and {ICO_PATH}")
 
 
 if __name__ == "__main__":
     main()
-